@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+答题事件与学习分析
+浏览器在一局游戏中记录每次点击选项（正确答案、所选选项、第几次尝试、距出题的毫秒数），
+游戏结束或离开页面时批量提交到 /api/events/answers。
+
+写入路径不占用答题请求的时间：接口只校验后放入内存队列并立即返回202，
+每个进程一个后台线程批量追加到只追加的 answer_events 表（一个事务写入一批）；
+队列满时丢弃新事件并计数，不阻塞请求。
+
+同一线程定期把新增事件汇总到 answer_item_stats / answer_confusions：
+以 answer_rollup_state 中的事件ID水位线增量汇总，汇总和水位线在同一个写事务中更新，
+多个worker同时汇总时由SQLite写锁串行化，不会重复计算。
+线程在进程启动时由 start() 启动（gunicorn 的 post_fork、ASGI lifespan、直接运行 app.py），
+没有调用 start() 的进程要等到首次提交事件才开始汇总。
+分析接口只读汇总表，按表达式索引取前N条，耗时与事件总数无关。
+
+指标（按游戏: chinese / english:<game_type>）:
+    questions           出现次数（第一次尝试的次数）
+    first_try_correct   第一次就答对的次数，accuracy = first_try_correct / questions
+    wrong_taps          答错的点击次数
+    solved / solve_time_ms  答对的次数和答对时的总用时，average_solve_ms = solve_time_ms / solved
+
+用法:
+    python answer_events.py                 # 立即汇总并打印最难的汉字
+    python answer_events.py --game english:word_matching --sort slowest
+"""
+
+import argparse
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from app_logging import get_logger, fields
+from metrics import ANSWER_EVENTS, timed_db
+import rollups
+
+logger = get_logger('answer_events')
+
+# 每次提交最多的事件数（一局10题，每题最多几次尝试）
+MAX_BATCH_EVENTS = 100
+
+# 单次作答用时上限（毫秒），超出的按上限记录，避免离开页面的时间拉高平均值
+MAX_LATENCY_MS = 10 * 60 * 1000
+
+SORTS = ('hardest', 'slowest', 'most_seen')
+
+_ORDER_BY = {
+    'hardest': 'first_try_correct * 1.0 / questions ASC, questions DESC',
+    'slowest': 'solve_time_ms * 1.0 / solved DESC, questions DESC',
+    'most_seen': 'questions DESC',
+}
+
+
+def ensure_schema(cursor):
+    """创建事件表、汇总表和水位线"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS answer_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_id TEXT,
+            game TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            chosen TEXT NOT NULL,
+            correct INTEGER NOT NULL,
+            attempt INTEGER NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS answer_item_stats (
+            game TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            questions INTEGER NOT NULL,
+            first_try_correct INTEGER NOT NULL,
+            wrong_taps INTEGER NOT NULL,
+            solved INTEGER NOT NULL,
+            solve_time_ms INTEGER NOT NULL,
+            PRIMARY KEY (game, answer)
+        )
+    ''')
+    # 表达式与 _ORDER_BY 中的排序完全一致，查询前N条直接走索引
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_item_stats_hardest
+        ON answer_item_stats (game, (first_try_correct * 1.0 / questions) ASC, questions DESC)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_item_stats_slowest
+        ON answer_item_stats (game, (solve_time_ms * 1.0 / solved) DESC, questions DESC)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_item_stats_seen
+        ON answer_item_stats (game, questions DESC)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS answer_confusions (
+            game TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            chosen TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (game, answer, chosen)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS answer_rollup_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+
+
+def stats_game(game):
+    """汇总使用的游戏：汉字游戏的各分类合并统计"""
+    return 'chinese' if game.startswith('chinese') else game
+
+
+def parse_events(data):
+    """
+    校验一次提交，返回可写入的事件元组列表；格式错误时返回None
+
+    提交格式: {'game', 'game_id', 'events': [{'answer', 'chosen', 'attempt', 'latency_ms'}, ...]}
+    是否答对由服务器根据 answer == chosen 判断
+    """
+    if not isinstance(data, dict):
+        return None
+    game = data.get('game') or rollups.DEFAULT_GAME
+    events = data.get('events')
+    if not rollups.is_valid_game(game) or not isinstance(events, list) or len(events) > MAX_BATCH_EVENTS:
+        return None
+    game_id = data.get('game_id')
+    if not isinstance(game_id, str) or len(game_id) > 64:
+        game_id = None
+
+    now = int(time.time())
+    rows = []
+    for event in events:
+        if not isinstance(event, dict):
+            return None
+        answer, chosen = event.get('answer'), event.get('chosen')
+        attempt, latency = event.get('attempt', 1), event.get('latency_ms', 0)
+        if not (isinstance(answer, str) and isinstance(chosen, str) and 0 < len(answer) <= 30
+                and 0 < len(chosen) <= 30):
+            return None
+        if not (isinstance(attempt, int) and isinstance(latency, (int, float)) and attempt >= 1):
+            return None
+        rows.append((game_id, game, answer, chosen, int(answer == chosen), min(attempt, 100),
+                     min(max(int(latency), 0), MAX_LATENCY_MS), now))
+    return rows
+
+
+class AnswerEventWriter:
+    """
+    答题事件的缓冲写入器，每个进程一个，后台线程在 start() 或首次提交时启动
+    只有启动了线程的进程才会定期汇总，没有答题提交的worker也应在启动时调用 start()
+
+    Args:
+        db_path: SQLite数据库路径
+        max_pending: 内存中最多缓存的事件数
+        flush_interval: 批量写入的最长间隔（秒）
+        batch_size: 每个事务最多写入的事件数
+        rollup_interval: 汇总间隔（秒），0表示不在后台汇总
+    """
+
+    def __init__(self, db_path, max_pending=10000, flush_interval=1.0, batch_size=500, rollup_interval=60):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.rollup_interval = rollup_interval
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+    def submit(self, rows):
+        """放入写入队列，不等待写入；返回接受的事件数"""
+        self._ensure_thread()
+        accepted = 0
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+                accepted += 1
+            except queue.Full:
+                break
+        ANSWER_EVENTS.inc(accepted, status='accepted')
+        if accepted < len(rows):
+            ANSWER_EVENTS.inc(len(rows) - accepted, status='dropped')
+            logger.warning('答题事件队列已满，丢弃事件', extra=fields(dropped=len(rows) - accepted))
+        return accepted
+
+    def start(self):
+        """启动本进程的写入和汇总线程（已启动时不做任何事）"""
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        # 按进程启动：gunicorn预加载应用后fork出的worker需要各自的写入线程
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(self._queue.maxsize)
+            self._thread = threading.Thread(target=self._run, name='answer-events', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        ensure_schema(conn.cursor())
+        next_rollup = time.monotonic() + self.rollup_interval
+        try:
+            while not self._stopping or not self._queue.empty():
+                batch = self._take_batch()
+                if batch:
+                    self._flush(conn, batch)
+                if self.rollup_interval and time.monotonic() >= next_rollup:
+                    next_rollup = time.monotonic() + self.rollup_interval
+                    try:
+                        rollup(conn)
+                    except sqlite3.Error:
+                        logger.exception('答题事件汇总失败')
+        finally:
+            conn.close()
+
+    def _take_batch(self):
+        """等待第一个事件，之后在flush_interval内尽量凑满一批"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, conn, batch):
+        try:
+            _insert_events(conn, batch)
+            ANSWER_EVENTS.inc(len(batch), status='written')
+        except sqlite3.Error:
+            ANSWER_EVENTS.inc(len(batch), status='failed')
+            logger.exception('答题事件写入失败', extra=fields(events=len(batch)))
+
+    def close(self, timeout=5.0):
+        """进程退出前写入队列中剩余的事件"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._stopping = True
+        thread.join(timeout)
+
+
+@timed_db('answer_events_insert')
+def _insert_events(conn, rows):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('''
+            INSERT INTO answer_events (game_id, game, answer, chosen, correct, attempt, latency_ms, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+@timed_db('answer_events_rollup')
+def rollup(conn):
+    """把水位线之后的新事件汇总到统计表，返回汇总的事件数（conn 需为自动提交模式）"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute("SELECT value FROM answer_rollup_state WHERE key = 'last_event_id'").fetchone()
+        last = row[0] if row else 0
+        high = conn.execute('SELECT MAX(id) FROM answer_events').fetchone()[0]
+        if high is None or high <= last:
+            conn.execute('ROLLBACK')
+            return 0
+
+        game = "CASE WHEN game LIKE 'chinese%' THEN 'chinese' ELSE game END"
+        conn.execute(f'''
+            INSERT INTO answer_item_stats
+                (game, answer, questions, first_try_correct, wrong_taps, solved, solve_time_ms)
+            SELECT {game}, answer,
+                   SUM(attempt = 1), SUM(attempt = 1 AND correct), SUM(NOT correct),
+                   SUM(correct), SUM(CASE WHEN correct THEN latency_ms ELSE 0 END)
+            FROM answer_events
+            WHERE id > ? AND id <= ?
+            GROUP BY 1, 2
+            ON CONFLICT (game, answer) DO UPDATE SET
+                questions = questions + excluded.questions,
+                first_try_correct = first_try_correct + excluded.first_try_correct,
+                wrong_taps = wrong_taps + excluded.wrong_taps,
+                solved = solved + excluded.solved,
+                solve_time_ms = solve_time_ms + excluded.solve_time_ms
+        ''', (last, high))
+        conn.execute(f'''
+            INSERT INTO answer_confusions (game, answer, chosen, count)
+            SELECT {game}, answer, chosen, COUNT(*)
+            FROM answer_events
+            WHERE id > ? AND id <= ? AND NOT correct
+            GROUP BY 1, 2, 3
+            ON CONFLICT (game, answer, chosen) DO UPDATE SET count = count + excluded.count
+        ''', (last, high))
+        conn.execute('''
+            INSERT INTO answer_rollup_state (key, value) VALUES ('last_event_id', ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        ''', (high,))
+        count = conn.execute('SELECT COUNT(*) FROM answer_events WHERE id > ? AND id <= ?', (last, high)).fetchone()[0]
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    logger.info('答题事件已汇总', extra=fields(events=count, last_event_id=high))
+    return count
+
+
+def _item(row):
+    answer, questions, first_try_correct, wrong_taps, solved, solve_time_ms = row
+    return {
+        'answer': answer,
+        'questions': questions,
+        'first_try_correct': first_try_correct,
+        'accuracy': round(first_try_correct / questions, 3) if questions else None,
+        'wrong_taps': wrong_taps,
+        'average_solve_ms': round(solve_time_ms / solved) if solved else None,
+    }
+
+
+_ITEM_COLUMNS = 'answer, questions, first_try_correct, wrong_taps, solved, solve_time_ms'
+
+
+@timed_db('answer_stats')
+def get_item_stats(cursor, game='chinese', sort='hardest', limit=20, min_questions=1):
+    """
+    按汇总表排序取前N条（hardest: 第一次答对率最低，slowest: 平均答对用时最长，most_seen: 出现最多）
+
+    min_questions 前的 + 使该条件不参与索引选择，查询始终按排序对应的表达式索引顺序读取
+    """
+    cursor.execute(f'''
+        SELECT {_ITEM_COLUMNS}
+        FROM answer_item_stats
+        WHERE game = ? AND +questions >= ?
+        ORDER BY {_ORDER_BY[sort]}
+        LIMIT ?
+    ''', (stats_game(game), max(min_questions, 1), limit))
+    return [_item(row) for row in cursor.fetchall()]
+
+
+@timed_db('answer_stats')
+def get_item_detail(cursor, answer, game='chinese', confusions=5):
+    """单个汉字/字母/单词的统计和最常被误选的选项，没有数据时返回None"""
+    game = stats_game(game)
+    cursor.execute(f'SELECT {_ITEM_COLUMNS} FROM answer_item_stats WHERE game = ? AND answer = ?', (game, answer))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    cursor.execute('''
+        SELECT chosen, count FROM answer_confusions
+        WHERE game = ? AND answer = ?
+        ORDER BY count DESC
+        LIMIT ?
+    ''', (game, answer, confusions))
+    return {**_item(row), 'confused_with': [{'chosen': chosen, 'count': count} for chosen, count in cursor.fetchall()]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='汇总答题事件并查看学习分析')
+    parser.add_argument('--db', default='leaderboard.db', help='数据库路径 (默认: leaderboard.db)')
+    parser.add_argument('--game', default='chinese', help='游戏 (默认: chinese)')
+    parser.add_argument('--sort', default='hardest', choices=SORTS, help='排序 (默认: hardest)')
+    parser.add_argument('--limit', type=int, default=20, help='显示条数 (默认: 20)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        ensure_schema(conn.cursor())
+        print(f"汇总事件: {rollup(conn)} 条")
+        for item in get_item_stats(conn.cursor(), args.game, args.sort, args.limit):
+            # 只有重试事件（questions 为0）或从未答对时没有答对率、平均用时
+            accuracy = '-' if item['accuracy'] is None else f"{item['accuracy']:.1%}"
+            solve_ms = '-' if item['average_solve_ms'] is None else f"{item['average_solve_ms']}ms"
+            print(f"{item['answer']:<12}出现 {item['questions']:>5}  第一次答对率 {accuracy:>6}  "
+                  f"答错 {item['wrong_taps']:>5}  平均用时 {solve_ms}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,221 +1,191 @@
-from flask import Flask, render_template, jsonify, request
-import json
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for
+import functools
+import hashlib
 import random
 import os
-import sqlite3
-from datetime import datetime
+import re
+import time
+from datetime import datetime, timedelta
+from json_provider import init_json_provider
+from app_logging import init_logging, get_logger, fields
+from metrics import init_metrics, timed_db, SCORE_SAVE_FAILURES, EXPORTED_ROWS
+from profiling import init_profiling
+from static_files import init_static
+from leaderboard_cache import LeaderboardCache
+import rollups
+from broadcaster import LeaderboardBroadcaster, event_stream
+import maintenance
+import image_replacer
+import answer_events
+import export
+import wordbank
+import game_ids
+import search
+import rooms
+from ratelimit import init_rate_limiter
+from storage import SqliteStorage, init_storage, SCORE_EXPORT_COLUMNS, FEEDBACK_EXPORT_COLUMNS
+from catalog import Catalog, KINDS as CATALOG_KINDS
 
 app = Flask(__name__)
+init_json_provider(app)
+init_logging(app)
+init_metrics(app)
+init_profiling(app)
+logger = get_logger('app')
+
+# 静态文件和预生成语音在最外层中间件中处理，不进入Flask
+static_files = init_static(app, wordbank.AUDIO_DIR)
+
+# 词库：启动时加载构建好的词库索引（python wordbank.py），分类分片按需加载；数据有问题时启动失败
+word_bank = wordbank.load(os.getenv('WORDBANK_DIR', wordbank.ARTIFACT_DIR),
+                          shard_cache_size=int(os.getenv('WORDBANK_SHARD_CACHE', '32')))
+# 题目目录：浏览器缓存后开始游戏只需下载精简题目
+game_catalog = Catalog(word_bank)
+
+# 写接口限流：超限的请求在访问数据库之前直接返回429
+rate_limiter = init_rate_limiter()
+
+# 成绩和反馈的存储后端：默认 leaderboard.db，设置 DATABASE_URL 时使用PostgreSQL，多个节点共享排行榜
+storage = init_storage()
 
 # 数据库初始化
 def init_database():
-    conn = sqlite3.connect('leaderboard.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS scores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nickname TEXT NOT NULL,
-            score INTEGER NOT NULL,
-            total_time INTEGER NOT NULL,
-            average_time INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            play_timestamp INTEGER NOT NULL,
-            UNIQUE(nickname, created_at)
-        )
-    ''')
-    
-    # 检查是否需要添加play_timestamp字段（用于现有数据库的迁移）
-    cursor.execute("PRAGMA table_info(scores)")
-    columns = [column[1] for column in cursor.fetchall()]
-    if 'play_timestamp' not in columns:
-        cursor.execute('ALTER TABLE scores ADD COLUMN play_timestamp INTEGER NOT NULL DEFAULT 0')
-    
-    # 创建反馈统计表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            character TEXT NOT NULL,
-            image_file TEXT NOT NULL,
-            feedback_count INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(character, image_file)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    if not isinstance(storage, SqliteStorage):
+        # 答题事件、维护任务和图片替换仍使用本机SQLite
+        SqliteStorage(storage.local_path).init_schema()
+    storage.init_schema()
+
+# 游戏ID：由 /api/game/start 签发，客户端提交成绩时带回，作为成绩的唯一键
+# 只接受本服务签发的ID（见 game_ids.py），其他玩家的ID无法猜出，迁移时分配的 legacy-<id> 也不接受
+game_id_signer = game_ids.init_signer()
+
+def new_game_id():
+    return game_id_signer.issue()
 
 # 保存成绩到数据库
-def save_score(nickname, score, total_time, average_time):
-    print(f"[SAVE_SCORE] 开始保存成绩 - 昵称: '{nickname}', 分数: {score}, 总时间: {total_time}ms, 平均时间: {average_time}ms")
+# 以 game_id 为冲突键的单条原子插入：同一局游戏重复提交（如网络重试）不会修改已保存的成绩
+# 返回 True 保存成功，None 该局成绩已保存过，False 保存失败
+@timed_db('save_score')
+def save_score(nickname, score, total_time, average_time, game=rollups.DEFAULT_GAME, game_id=None):
+    if game_id is None:
+        game_id = new_game_id()
+    logger.debug('开始保存成绩', extra=fields(nickname=nickname, score=score, total_time=total_time, average_time=average_time, game=game, game_id=game_id))
     
-    conn = sqlite3.connect('leaderboard.db')
-    cursor = conn.cursor()
     try:
-        # 生成当前UNIX时间戳
-        play_timestamp = int(datetime.now().timestamp())
-        print(f"[SAVE_SCORE] 生成时间戳: {play_timestamp}")
-        
-        print(f"[SAVE_SCORE] 尝试插入新记录...")
-        cursor.execute('''
-            INSERT INTO scores (nickname, score, total_time, average_time, play_timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (nickname, score, total_time, average_time, play_timestamp))
-        conn.commit()
-        print(f"[SAVE_SCORE] 新记录插入成功")
+        play_timestamp = storage.save_score(game_id, nickname, score, total_time, average_time, game)
+        if play_timestamp is None:
+            logger.info('重复提交的成绩已忽略', extra=fields(nickname=nickname, game_id=game_id))
+            return None
+        leaderboard_cache.on_score_saved(score, total_time)
+        leaderboard_broadcaster.notify()
+        logger.debug('成绩保存成功', extra=fields(nickname=nickname, game_id=game_id, play_timestamp=play_timestamp))
         return True
-    except sqlite3.IntegrityError as e:
-        print(f"[SAVE_SCORE] 检测到重复记录，尝试更新...")
-        # 如果昵称和时间重复，更新记录
-        play_timestamp = int(datetime.now().timestamp())
-        print(f"[SAVE_SCORE] 更新记录时间戳: {play_timestamp}")
-        
-        cursor.execute('''
-            UPDATE scores 
-            SET score = ?, total_time = ?, average_time = ?, play_timestamp = ?
-            WHERE nickname = ? AND created_at = CURRENT_TIMESTAMP
-        ''', (score, total_time, average_time, play_timestamp, nickname))
-        conn.commit()
-        print(f"[SAVE_SCORE] 记录更新成功")
-        return True
-    except Exception as e:
-        print(f"[SAVE_SCORE] 保存成绩失败: {e}")
-        print(f"[SAVE_SCORE] 异常类型: {type(e).__name__}")
-        import traceback
-        print(f"[SAVE_SCORE] 异常堆栈: {traceback.format_exc()}")
+    except Exception:
+        SCORE_SAVE_FAILURES.inc()
+        logger.exception('保存成绩失败', extra=fields(nickname=nickname, score=score, game_id=game_id))
         return False
-    finally:
-        conn.close()
-        print(f"[SAVE_SCORE] 数据库连接已关闭")
 
 # 获取排行榜
+@timed_db('get_leaderboard')
 def get_leaderboard(limit=20):
-    conn = sqlite3.connect('leaderboard.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT nickname, score, total_time, average_time, play_timestamp
-        FROM scores
-        ORDER BY score DESC, total_time ASC
-        LIMIT ?
-    ''', (limit,))
-    results = cursor.fetchall()
-    conn.close()
-    
-    leaderboard = []
-    for i, row in enumerate(results, 1):
-        
-        leaderboard.append({
-            'rank': i,
-            'nickname': row[0],
-            'score': row[1],
-            'total_time': row[2],
-            'average_time': row[3],
-            'play_timestamp': row[4]
-        })
-    return leaderboard
+    return storage.get_leaderboard(limit)
+
+# 常用长度的排行榜缓存（序列化后的JSON），新成绩能进入前N名时失效
+leaderboard_cache = LeaderboardCache(get_leaderboard, ttl=float(os.getenv('LEADERBOARD_CACHE_TTL', '5')))
+
+# 排行榜实时推送，所有SSE连接共享同一次查询
+leaderboard_broadcaster = LeaderboardBroadcaster(get_leaderboard)
+
+# 其他进程、其他节点写入成绩后，存储后端的写入通知使本进程的缓存失效并触发推送
+def on_scores_changed(change):
+    if change is None:
+        leaderboard_cache.clear()
+    else:
+        leaderboard_cache.on_score_saved(*change)
+    leaderboard_broadcaster.notify()
+
+storage.add_listener(on_scores_changed)
+
+# 答题事件在后台批量写入，不占用请求时间
+answer_writer = answer_events.AnswerEventWriter(
+    storage.local_path, rollup_interval=int(os.getenv('ANALYTICS_ROLLUP_SECONDS', '60')))
+
+# 获取分时段、分游戏的排行榜
+@timed_db('get_board')
+def get_board(window='all', game=rollups.ALL_GAMES, limit=20):
+    return storage.get_board(window, game, limit)
 
 # 获取用户排名
+@timed_db('get_user_rank')
 def get_user_rank(score, total_time):
-    conn = sqlite3.connect('leaderboard.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT COUNT(*) + 1 as rank
-        FROM scores
-        WHERE score > ? OR (score = ? AND total_time < ?)
-    ''', (score, score, total_time))
-    rank = cursor.fetchone()[0]
-    conn.close()
-    return rank
-
-# 提交反馈
+    return storage.get_user_rank(score, total_time)
+
+# 提交反馈：同一图片的反馈累加计数
+@timed_db('submit_feedback')
 def submit_feedback(character, image_file):
-    conn = sqlite3.connect('leaderboard.db')
-    cursor = conn.cursor()
     try:
-        # 尝试插入新记录
-        cursor.execute('''
-            INSERT INTO feedback (character, image_file, feedback_count)
-            VALUES (?, ?, 1)
-        ''', (character, image_file))
-        conn.commit()
+        storage.submit_feedback(character, image_file)
         return True
-    except sqlite3.IntegrityError:
-        # 如果记录已存在，更新计数
-        cursor.execute('''
-            UPDATE feedback 
-            SET feedback_count = feedback_count + 1,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE character = ? AND image_file = ?
-        ''', (character, image_file))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"提交反馈失败: {e}")
+    except Exception:
+        logger.exception('提交反馈失败', extra=fields(character=character, image_file=image_file))
         return False
-    finally:
-        conn.close()
 
 # 获取反馈统计
+@timed_db('get_feedback_stats')
 def get_feedback_stats():
-    conn = sqlite3.connect('leaderboard.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT character, image_file, feedback_count, updated_at
-        FROM feedback
-        ORDER BY feedback_count DESC, updated_at DESC
-    ''')
-    results = cursor.fetchall()
-    conn.close()
-    
-    feedback_stats = []
-    for row in results:
-        feedback_stats.append({
-            'character': row[0],
-            'image_file': row[1],
-            'feedback_count': row[2],
-            'updated_at': row[3]
-        })
-    return feedback_stats
+    return storage.get_feedback_stats()
 
 # 加载汉字数据
 def load_characters():
-    with open('data/characters.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return word_bank.characters_data
 
 # 加载英语字母数据
 def load_english_alphabet():
-    with open('data/english_alphabet.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return word_bank.alphabet_data
+
+# 出题函数的 rng 参数默认使用全局 random；固定种子的题目传入独立的 random.Random，结果可复现
+
+# 选择出题分类：指定分类不存在时随机选择，返回分类名
+def pick_category(category=None, rng=random):
+    if category and category in word_bank.category_characters:
+        return category
+    return rng.choice(word_bank.category_names)
+
+# 随机选择错误选项（只需要汉字本身，不加载分片），排除图片与正确答案相同或近似的汉字
+def sample_wrong_options(correct, count, rng=random):
+    names = word_bank.all_character_names
+    excluded = word_bank.similar_images.get(correct, frozenset())
+    picks = rng.sample(names, min(count + 1 + len(excluded), len(names)))
+    return [name for name in picks if name != correct and name not in excluded][:count]
+
+# 题目的预生成语音地址（未生成语音时为None，浏览器使用语音合成）
+def chinese_question_audio(char, common_words):
+    audio = char.get('audio')
+    if not audio:
+        return None
+    return {
+        'prompt': audio['prompt'],
+        'answer': audio['character'],
+        'common_words': [audio['common_words'].get(word) for word in common_words]
+    }
+
+def english_question_audio(letter, game_type, answer):
+    audio = letter.get('audio')
+    if not audio:
+        return None
+    return {
+        'prompt': audio['prompts'][game_type],
+        'answer': audio['words'].get(answer) if game_type == 'word_matching' else audio['letter' if game_type == 'letter_recognition' else 'lowercase'],
+        'words': [audio['words'].get(word) for word in letter['words']]
+    }
 
 # 生成游戏题目
-def generate_question(category=None, difficulty='easy'):
-    characters_data = load_characters()
-    
-    # 如果指定了分类，只从该分类选择
-    if category:
-        target_category = None
-        for cat in characters_data['basicChineseCharactersForKids']:
-            if cat['category'] == category:
-                target_category = cat
-                break
-        if not target_category:
-            # 如果找不到指定分类，随机选择一个
-            target_category = random.choice(characters_data['basicChineseCharactersForKids'])
-    else:
-        # 随机选择一个分类
-        target_category = random.choice(characters_data['basicChineseCharactersForKids'])
-    
-    # 从选中的分类中随机选择一个汉字
-    correct_char = random.choice(target_category['characters'])
+def generate_question(category=None, difficulty='easy', rng=random):
+    # 指定了分类时只从该分类选择，找不到时随机选择一个
+    target_category = pick_category(category, rng)
     
-    # 生成错误选项
-    all_chars = []
-    for cat in characters_data['basicChineseCharactersForKids']:
-        all_chars.extend(cat['characters'])
-    
-    # 排除正确答案
-    other_chars = [char for char in all_chars if char['character'] != correct_char['character']]
+    # 从选中的分类中随机选择一个汉字，只加载该分类的分片
+    correct_char = word_bank.get_character(rng.choice(word_bank.category_characters[target_category]))
     
     # 根据难度选择选项数量
     if difficulty == 'easy':
@@ -225,80 +195,55 @@ def generate_question(category=None, difficulty='easy'):
     else:  # hard
         num_options = 4
     
-    # 随机选择错误选项
-    wrong_options = random.sample(other_chars, min(num_options - 1, len(other_chars)))
+    # 随机选择错误选项（排除正确答案）
+    wrong_options = sample_wrong_options(correct_char['character'], num_options - 1, rng)
     
     # 组合所有选项
-    all_options = [correct_char] + wrong_options
-    random.shuffle(all_options)
+    all_options = [correct_char['character']] + wrong_options
+    rng.shuffle(all_options)
+    
+    # 使用词库中带内容哈希的图片地址
+    image_path = word_bank.image_url(correct_char)
     
-    # 使用JSON文件中的图片路径
-    image_path = f"/static/images/{correct_char['image_file']}" if 'image_file' in correct_char else None
+    # 随机选择最多4个常用词
+    common_words = correct_char.get('common_words', [])
+    common_words = rng.sample(common_words, min(4, len(common_words))) if common_words else []
     
     return {
         'image': image_path,
         'correctAnswer': correct_char['character'],
-        'options': [char['character'] for char in all_options],
-        'voiceText': f'请找出"{correct_char["character"]}"字',
+        'options': all_options,
+        'voiceText': wordbank.chinese_prompt(correct_char['character']),
         'pinyin': correct_char['pinyin'],
         'meaning': correct_char['meaning'],
-        'category': target_category['category'],
-        'common_words': random.sample(correct_char.get('common_words', []), min(4, len(correct_char.get('common_words', [])))) if correct_char.get('common_words', []) else []
+        'category': target_category,
+        'common_words': common_words,
+        'audio': chinese_question_audio(correct_char, common_words)
     }
 
 # 生成避免重复汉字的题目
-def generate_question_with_avoidance(category=None, difficulty='easy', used_characters=None):
-    characters_data = load_characters()
-    
+def generate_question_with_avoidance(category=None, difficulty='easy', used_characters=None, rng=random):
     if used_characters is None:
         used_characters = set()
     
-    # 如果指定了分类，只从该分类选择
-    if category:
-        target_category = None
-        for cat in characters_data['basicChineseCharactersForKids']:
-            if cat['category'] == category:
-                target_category = cat
-                break
-        if not target_category:
-            # 如果找不到指定分类，随机选择一个
-            target_category = random.choice(characters_data['basicChineseCharactersForKids'])
-    else:
-        # 随机选择一个分类
-        target_category = random.choice(characters_data['basicChineseCharactersForKids'])
+    # 指定了分类时只从该分类选择，找不到时随机选择一个
+    target_category = pick_category(category, rng)
     
     # 从选中的分类中过滤掉已使用的汉字
-    available_chars = [char for char in target_category['characters'] 
-                      if char['character'] not in used_characters]
+    available_chars = [char for char in word_bank.category_characters[target_category]
+                      if char not in used_characters]
     
     # 如果该分类中没有可用的汉字，则从所有分类中选择
     if not available_chars:
-        all_chars = []
-        for cat in characters_data['basicChineseCharactersForKids']:
-            all_chars.extend([char for char in cat['characters'] 
-                            if char['character'] not in used_characters])
-        if not all_chars:
+        available_chars = [char for char in word_bank.all_character_names
+                           if char not in used_characters]
+        if not available_chars:
             # 如果所有汉字都被使用过，清空已使用列表重新开始
             used_characters.clear()
-            all_chars = []
-            for cat in characters_data['basicChineseCharactersForKids']:
-                all_chars.extend(cat['characters'])
-        
-        if all_chars:
-            correct_char = random.choice(all_chars)
-        else:
-            # 最后的备用方案
-            correct_char = random.choice(characters_data['basicChineseCharactersForKids'][0]['characters'])
-    else:
-        correct_char = random.choice(available_chars)
+            available_chars = word_bank.all_character_names
     
-    # 生成错误选项
-    all_chars = []
-    for cat in characters_data['basicChineseCharactersForKids']:
-        all_chars.extend(cat['characters'])
-    
-    # 排除正确答案
-    other_chars = [char for char in all_chars if char['character'] != correct_char['character']]
+    # 只加载正确答案所在分类的分片
+    correct_char = word_bank.get_character(rng.choice(available_chars))
     
     # 根据难度选择选项数量
     if difficulty == 'easy':
@@ -308,38 +253,45 @@ def generate_question_with_avoidance(category=None, difficulty='easy', used_char
     else:  # hard
         num_options = 4
     
-    # 随机选择错误选项
-    wrong_options = random.sample(other_chars, min(num_options - 1, len(other_chars)))
+    # 随机选择错误选项（排除正确答案）
+    wrong_options = sample_wrong_options(correct_char['character'], num_options - 1, rng)
     
     # 组合所有选项
-    all_options = [correct_char] + wrong_options
-    random.shuffle(all_options)
+    all_options = [correct_char['character']] + wrong_options
+    rng.shuffle(all_options)
+    
+    # 使用词库中带内容哈希的图片地址
+    image_path = word_bank.image_url(correct_char)
     
-    # 使用JSON文件中的图片路径
-    image_path = f"/static/images/{correct_char['image_file']}" if 'image_file' in correct_char else None
+    # 随机选择最多4个常用词
+    common_words = correct_char.get('common_words', [])
+    common_words = rng.sample(common_words, min(4, len(common_words))) if common_words else []
     
     return {
         'image': image_path,
         'correctAnswer': correct_char['character'],
-        'options': [char['character'] for char in all_options],
-        'voiceText': f'请找出"{correct_char["character"]}"字',
+        'options': all_options,
+        'voiceText': wordbank.chinese_prompt(correct_char['character']),
         'pinyin': correct_char['pinyin'],
         'meaning': correct_char['meaning'],
-        'category': target_category['category'],
-        'common_words': random.sample(correct_char.get('common_words', []), min(4, len(correct_char.get('common_words', [])))) if correct_char.get('common_words', []) else []
+        'category': target_category,
+        'common_words': common_words,
+        'audio': chinese_question_audio(correct_char, common_words)
     }
 
 # 生成英语字母游戏题目
-def generate_english_question(game_type='letter_recognition', difficulty='easy'):
-    alphabet_data = load_english_alphabet()
+def generate_english_question(game_type='letter_recognition', difficulty='easy', rng=random):
+    letters = word_bank.letters
     
     if game_type == 'letter_recognition':
         # 字母识别游戏：显示图片，选择对应字母
-        correct_letter = random.choice(alphabet_data['englishAlphabet'])
+        correct_letter = rng.choice(letters)
         
         # 生成错误选项
-        other_letters = [letter for letter in alphabet_data['englishAlphabet'] 
-                        if letter['letter'] != correct_letter['letter']]
+        # 排除图片与正确答案相同或近似的字母
+        excluded = word_bank.similar_images.get(correct_letter['letter'], frozenset())
+        other_letters = [letter for letter in letters
+                        if letter['letter'] != correct_letter['letter'] and letter['letter'] not in excluded]
         
         # 根据难度选择选项数量
         if difficulty == 'easy':
@@ -350,29 +302,31 @@ def generate_english_question(game_type='letter_recognition', difficulty='easy')
             num_options = 4
         
         # 随机选择错误选项
-        wrong_options = random.sample(other_letters, min(num_options - 1, len(other_letters)))
+        wrong_options = rng.sample(other_letters, min(num_options - 1, len(other_letters)))
         
         # 组合所有选项
         all_options = [correct_letter] + wrong_options
-        random.shuffle(all_options)
+        rng.shuffle(all_options)
         
         return {
-            'image': f"/static/images/english/{correct_letter['image_file']}",
+            'image': word_bank.image_url(correct_letter),
             'correctAnswer': correct_letter['letter'],
             'options': [letter['letter'] for letter in all_options],
-            'voiceText': f'请找出字母"{correct_letter["letter"]}"',
+            'voiceText': wordbank.english_prompt('letter_recognition', correct_letter),
             'pronunciation': correct_letter['pronunciation'],
             'phonetic': correct_letter['phonetic'],
             'words': correct_letter['words'],
-            'description': correct_letter['description']
+            'description': correct_letter['description'],
+            'audio': english_question_audio(correct_letter, 'letter_recognition', correct_letter['letter']),
+            'letter': correct_letter['letter']
         }
     
     elif game_type == 'letter_pairing':
         # 大小写配对游戏
-        correct_letter = random.choice(alphabet_data['englishAlphabet'])
+        correct_letter = rng.choice(letters)
         
         # 生成错误选项
-        other_letters = [letter for letter in alphabet_data['englishAlphabet'] 
+        other_letters = [letter for letter in letters
                         if letter['letter'] != correct_letter['letter']]
         
         if difficulty == 'easy':
@@ -382,48 +336,196 @@ def generate_english_question(game_type='letter_recognition', difficulty='easy')
         else:
             num_options = 4
         
-        wrong_options = random.sample(other_letters, min(num_options - 1, len(other_letters)))
+        wrong_options = rng.sample(other_letters, min(num_options - 1, len(other_letters)))
         all_options = [correct_letter] + wrong_options
-        random.shuffle(all_options)
+        rng.shuffle(all_options)
         
         return {
-            'image': f"/static/images/english/{correct_letter['image_file']}",
+            'image': word_bank.image_url(correct_letter),
             'correctAnswer': correct_letter['lowercase'],
             'options': [letter['lowercase'] for letter in all_options],
-            'voiceText': f'请找出小写字母"{correct_letter["lowercase"]}"',
+            'voiceText': wordbank.english_prompt('letter_pairing', correct_letter),
             'pronunciation': correct_letter['pronunciation'],
             'phonetic': correct_letter['phonetic'],
             'words': correct_letter['words'],
-            'description': correct_letter['description']
+            'description': correct_letter['description'],
+            'audio': english_question_audio(correct_letter, 'letter_pairing', correct_letter['lowercase']),
+            'letter': correct_letter['letter']
         }
     
     elif game_type == 'word_matching':
         # 单词匹配游戏：显示字母，选择对应单词
-        correct_letter = random.choice(alphabet_data['englishAlphabet'])
-        correct_word = random.choice(correct_letter['words'])
+        correct_letter = rng.choice(letters)
+        correct_word = rng.choice(correct_letter['words'])
         
         # 生成错误单词选项
-        all_words = []
-        for letter in alphabet_data['englishAlphabet']:
-            all_words.extend(letter['words'])
-        
-        other_words = [word for word in all_words if word != correct_word]
-        wrong_words = random.sample(other_words, min(2, len(other_words)))
+        other_words = [word for word in word_bank.all_words if word != correct_word]
+        wrong_words = rng.sample(other_words, min(2, len(other_words)))
         
         all_word_options = [correct_word] + wrong_words
-        random.shuffle(all_word_options)
+        rng.shuffle(all_word_options)
         
         return {
-            'image': f"/static/images/english/{correct_letter['image_file']}",
+            'image': word_bank.image_url(correct_letter),
             'correctAnswer': correct_word,
             'options': all_word_options,
-            'voiceText': f'请找出以字母"{correct_letter["letter"]}"开头的单词',
+            'voiceText': wordbank.english_prompt('word_matching', correct_letter),
             'pronunciation': correct_letter['pronunciation'],
             'phonetic': correct_letter['phonetic'],
             'words': correct_letter['words'],
-            'description': correct_letter['description']
+            'description': correct_letter['description'],
+            'audio': english_question_audio(correct_letter, 'word_matching', correct_word),
+            'letter': correct_letter['letter']
         }
 
+# 生成一局汉字游戏（10题，避免与最近出现的汉字重复）
+def build_game(category=None, recent_words=None, rng=random):
+    questions = []
+    used_characters = set(recent_words or [])  # 记录已使用的汉字
+    
+    for _ in range(10):  # 生成10个题目
+        question = generate_question_with_avoidance(category, 'medium', used_characters, rng)
+        questions.append(question)
+        # 将正确答案添加到已使用列表中
+        used_characters.add(question['correctAnswer'])
+    
+    return {
+        'gameId': new_game_id(),
+        'questions': questions,
+        'totalQuestions': len(questions)
+    }
+
+# 生成一局英语字母游戏（10题）
+def build_english_game(game_type='letter_recognition', difficulty='easy', rng=random):
+    questions = []
+    for _ in range(10):  # 生成10个题目
+        question = generate_english_question(game_type, difficulty, rng)
+        questions.append(question)
+    
+    return {
+        'gameId': new_game_id(),
+        'questions': questions,
+        'totalQuestions': len(questions),
+        'gameType': game_type,
+        'difficulty': difficulty
+    }
+
+# 固定种子的题目：同一 (种子, 分类/游戏类型, 难度, 词库版本) 总是生成相同的题目，
+# 响应可以被浏览器和反向代理长期缓存，问题反馈也可以按种子原样重现
+SEED_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+def seeded_rng(*parts):
+    """由种子和出题参数得到独立的随机数生成器（字符串种子经SHA-512转换，不受进程哈希随机化影响）"""
+    return random.Random(':'.join(str(part) for part in (*parts, word_bank.version)))
+
+def daily_seed(now=None):
+    """每日挑战的种子，按服务器本地日期（与日榜一致）"""
+    return f"daily-{(now or datetime.now()).strftime('%Y%m%d')}"
+
+def seconds_until_tomorrow(now=None):
+    now = now or datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((tomorrow - now).total_seconds()))
+
+@functools.lru_cache(maxsize=int(os.getenv('SEEDED_GAME_CACHE', '256')))
+def seeded_game_body(kind, seed, option, difficulty, compact, version):
+    """
+    固定种子题目的JSON字节（kind: chinese / english；option: 汉字分类或英语游戏类型）
+    同一进程内重复请求直接返回缓存的字节；version 为生成时的词库版本，作为缓存键的一部分，
+    词库更新后不会返回旧词库生成的题目；gameId 为空，玩家提交成绩时由服务器分配
+    """
+    rng = seeded_rng(kind, seed, option or '', difficulty)
+    if kind == 'chinese':
+        game = build_game(option, rng=rng)
+    else:
+        game = build_english_game(option, difficulty, rng=rng)
+    game = {**game, 'gameId': None, 'seed': seed}
+    return serialize_json(game_catalog.respond(game, game_catalog.version if compact else None,
+                                               english=kind == 'english'))
+
+def seeded_game_response(kind, seed, option, difficulty):
+    """固定种子题目的响应：带词库版本 v 请求时内容不会变化，可长期缓存"""
+    compact = game_catalog.accepts(request.args.get('catalog_version'))
+    key = f'{kind}:{seed}:{option or ""}:{difficulty}:{word_bank.version}:{int(compact)}'
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(seeded_game_body(kind, seed, option, difficulty, compact, word_bank.version),
+                                      mimetype='application/json')
+    response.set_etag(etag)
+    if request.args.get('v') == word_bank.version:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def daily_redirect(endpoint):
+    """重定向到当天种子的题目地址（带词库版本），重定向本身缓存到当天结束"""
+    args = request.args.to_dict()
+    args['v'] = word_bank.version
+    response = redirect(url_for(endpoint, seed=daily_seed(), **args))
+    response.headers['Cache-Control'] = f'public, max-age={seconds_until_tomorrow()}'
+    return response
+
+# 课堂房间：每轮只为整个房间生成一局题目，序列化后的字节由全班共享
+def game_image_urls(game):
+    return list(dict.fromkeys(question['image'] for question in game['questions'] if question.get('image')))
+
+def serialize_json(data):
+    return app.json.dumps(data).encode('utf-8')
+
+room_registry = rooms.RoomRegistry(
+    build_game, game_image_urls,
+    ttl=float(os.getenv('ROOM_TTL_SECONDS', '7200')),
+    max_rooms=int(os.getenv('ROOM_MAX_ROOMS', '500'))
+)
+
+# 发布版本：deploy.sh 在平滑重启前写入 .release，健康检查据此确认新版本的worker已经接管
+RELEASE_FILE = os.getenv('RELEASE_FILE', '.release')
+STARTED_AT = time.time()
+
+def read_release():
+    try:
+        with open(RELEASE_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip() or 'dev'
+    except OSError:
+        return 'dev'
+
+RELEASE = read_release()
+
+# 启动预热：gunicorn预加载应用时在主进程中执行一次，fork出的worker直接共享预热结果，
+# 部署后的第一批请求不再承担建表迁移、加载分片和生成目录的开销
+def warmup():
+    start = time.perf_counter()
+    init_database()
+    # 加载所有分类分片（不超过分片缓存容量时全部常驻）
+    for name in word_bank.category_names[:word_bank.shard_cache_size]:
+        word_bank.get_category(name)
+    with app.app_context():
+        for kind in CATALOG_KINDS:
+            game_catalog.get_response_body(kind)
+    # 当天的每日挑战（完整和精简两份）
+    for compact in (False, True):
+        seeded_game_body('chinese', daily_seed(), None, 'medium', compact, word_bank.version)
+    # 排行榜查询把成绩表的索引页读入系统页缓存
+    get_leaderboard(20)
+    logger.info('预热完成', extra=fields(release=RELEASE, elapsed_ms=round((time.perf_counter() - start) * 1000, 1)))
+
+
+@app.route('/healthz')
+def healthz():
+    """健康检查：词库已加载且数据库可读时返回200，deploy.sh 据此确认新版本就绪"""
+    result = {'release': RELEASE, 'pid': os.getpid(), 'uptime': round(time.time() - STARTED_AT, 1),
+              'wordbank': word_bank.version}
+    error = storage.ping()
+    result['database'] = error or 'ok'
+    status = 503 if error else 200
+    response = jsonify({'status': 'ok' if status == 200 else 'unavailable', **result})
+    response.status_code = status
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 @app.route('/')
 def index():
@@ -434,12 +536,42 @@ def get_characters():
     """获取所有汉字数据"""
     return jsonify(load_characters())
 
+@app.route('/api/catalog/<kind>')
+def get_catalog(kind):
+    """获取题目目录（chinese / english），供浏览器缓存后还原精简题目"""
+    if kind not in CATALOG_KINDS:
+        return jsonify({'error': 'Catalog not found'}), 404
+    response = app.response_class(game_catalog.get_response_body(kind), mimetype='application/json')
+    # 带版本号请求的目录内容不会变化，可长期缓存
+    if request.args.get('v') == game_catalog.version:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/categories')
 def get_categories():
     """获取所有分类"""
-    characters_data = load_characters()
-    categories = [cat['category'] for cat in characters_data['basicChineseCharactersForKids']]
-    return jsonify(categories)
+    return jsonify(word_bank.category_names)
+
+@app.route('/api/search')
+def search_api():
+    """搜索汉字（字、拼音、释义、常用词）和英语字母/单词"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '搜索词不能为空'}), 400
+    if len(query) > 50:
+        return jsonify({'error': '搜索词过长'}), 400
+    doc_type = request.args.get('type')
+    if doc_type not in (None, 'character', 'letter', 'word'):
+        return jsonify({'error': '无效的搜索类型'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', search.DEFAULT_LIMIT)), 1), search.MAX_LIMIT)
+    except ValueError:
+        limit = search.DEFAULT_LIMIT
+    
+    results, total = word_bank.search_index.search(query, limit, doc_type)
+    return jsonify({'query': query, 'total': total, 'results': results})
 
 @app.route('/api/question')
 def get_question():
@@ -457,10 +589,9 @@ def get_question_by_category(category):
 @app.route('/api/characters/<category>')
 def get_characters_by_category(category):
     """获取指定分类的汉字"""
-    characters_data = load_characters()
-    for cat in characters_data['basicChineseCharactersForKids']:
-        if cat['category'] == category:
-            return jsonify(cat)
+    cat = word_bank.get_category(category)
+    if cat is not None:
+        return jsonify(cat)
     return jsonify({'error': 'Category not found'}), 404
 
 @app.route('/api/game/start', methods=['GET', 'POST'])
@@ -471,23 +602,28 @@ def start_game():
         data = request.get_json() or {}
         category = data.get('category') or request.args.get('category')
         recent_words = data.get('recent_words', [])
+        catalog_version = data.get('catalog_version')
     else:
         category = request.args.get('category')
         recent_words = []
+        catalog_version = request.args.get('catalog_version')
     
-    questions = []
-    used_characters = set(recent_words)  # 记录已使用的汉字
-    
-    for _ in range(10):  # 生成10个题目
-        question = generate_question_with_avoidance(category, 'medium', used_characters)
-        questions.append(question)
-        # 将正确答案添加到已使用列表中
-        used_characters.add(question['correctAnswer'])
-    
-    return jsonify({
-        'questions': questions,
-        'totalQuestions': len(questions)
-    })
+    return jsonify(game_catalog.respond(build_game(category, recent_words), catalog_version))
+
+@app.route('/api/game/seed/<seed>')
+def get_seeded_game(seed):
+    """按种子生成汉字游戏，相同种子和分类总是得到相同的题目"""
+    if not SEED_PATTERN.match(seed):
+        return jsonify({'error': '无效的种子'}), 400
+    category = request.args.get('category')
+    if category not in word_bank.category_characters:
+        category = None
+    return seeded_game_response('chinese', seed, category, 'medium')
+
+@app.route('/api/game/daily')
+def get_daily_game():
+    """每日挑战：重定向到当天种子的题目地址，所有人共享同一份缓存"""
+    return daily_redirect('get_seeded_game')
 
 @app.route('/api/game/submit', methods=['POST'])
 def submit_answer():
@@ -503,88 +639,246 @@ def submit_answer():
         'message': '真棒！答对了！' if is_correct else '再试试看！'
     })
 
+@app.route('/api/events/answers', methods=['POST'])
+@rate_limiter.limit('events')
+def submit_answer_events():
+    """批量提交答题事件，放入写入队列后立即返回"""
+    rows = answer_events.parse_events(request.get_json(force=True, silent=True))
+    if rows is None:
+        return jsonify({'error': '无效的答题事件'}), 400
+    return jsonify({'accepted': answer_writer.submit(rows)}), 202
+
+@app.route('/api/analytics/answers')
+def get_answer_analytics():
+    """学习分析：按第一次答对率、平均用时或出现次数排序的汉字/字母/单词"""
+    game = request.args.get('game', 'chinese')
+    sort = request.args.get('sort', 'hardest')
+    limit = request.args.get('limit', 20, type=int)
+    min_questions = request.args.get('min_questions', 1, type=int)
+    
+    if not rollups.is_valid_game(game):
+        return jsonify({'error': '无效的游戏类型'}), 400
+    if sort not in answer_events.SORTS:
+        return jsonify({'error': '无效的排序方式'}), 400
+    
+    items = storage.get_answer_stats(game, sort, max(1, min(limit, 100)), min_questions)
+    return jsonify({'game': answer_events.stats_game(game), 'sort': sort, 'items': items})
+
+@app.route('/api/analytics/answers/<answer>')
+def get_answer_detail(answer):
+    """单个汉字/字母/单词的统计和最常被误选的选项"""
+    game = request.args.get('game', 'chinese')
+    if not rollups.is_valid_game(game):
+        return jsonify({'error': '无效的游戏类型'}), 400
+    
+    item = storage.get_answer_detail(answer, game)
+    if item is None:
+        return jsonify({'error': '暂无统计数据'}), 404
+    return jsonify(item)
+
 @app.route('/api/leaderboard/submit', methods=['POST'])
+@rate_limiter.limit('scores')
 def submit_score():
     """提交成绩"""
     try:
-        # 记录请求开始
-        print(f"[LEADERBOARD_SUBMIT] 收到成绩提交请求")
-        
         data = request.get_json()
         if not data:
-            print(f"[LEADERBOARD_SUBMIT] 错误: 请求数据为空")
+            logger.info('成绩提交被拒绝: 请求数据为空')
             return jsonify({'error': '请求数据不能为空'}), 400
         
         nickname = data.get('nickname', '').strip()
         score = data.get('score', 0)
         total_time = data.get('total_time', 0)
         average_time = data.get('average_time', 0)
+        game = data.get('game', rollups.DEFAULT_GAME)
+        game_id = data.get('game_id')
         
-        # 记录接收到的数据
-        print(f"[LEADERBOARD_SUBMIT] 接收数据 - 昵称: '{nickname}', 分数: {score}, 总时间: {total_time}ms, 平均时间: {average_time}ms")
+        # 记录接收到的数据（高频事件，按比例采样）
+        logger.info('收到成绩提交', extra=fields(sample=0.1, nickname=nickname, score=score, total_time=total_time, average_time=average_time))
         
         # 验证昵称
         if not nickname:
-            print(f"[LEADERBOARD_SUBMIT] 错误: 昵称为空")
+            logger.info('成绩提交被拒绝: 昵称为空')
             return jsonify({'error': '昵称不能为空'}), 400
         
         # 验证数据有效性
         if not isinstance(score, int) or score < 0:
-            print(f"[LEADERBOARD_SUBMIT] 错误: 无效分数 {score}")
+            logger.info('成绩提交被拒绝: 无效分数', extra=fields(score=score))
             return jsonify({'error': '分数必须是非负整数'}), 400
         
         if not isinstance(total_time, int) or total_time < 0:
-            print(f"[LEADERBOARD_SUBMIT] 错误: 无效总时间 {total_time}")
+            logger.info('成绩提交被拒绝: 无效总时间', extra=fields(total_time=total_time))
             return jsonify({'error': '总时间必须是非负整数'}), 400
         
         if not isinstance(average_time, int) or average_time < 0:
-            print(f"[LEADERBOARD_SUBMIT] 错误: 无效平均时间 {average_time}")
+            logger.info('成绩提交被拒绝: 无效平均时间', extra=fields(average_time=average_time))
             return jsonify({'error': '平均时间必须是非负整数'}), 400
         
+        if not rollups.is_valid_game(game):
+            logger.info('成绩提交被拒绝: 无效游戏类型', extra=fields(game=game))
+            return jsonify({'error': '无效的游戏类型'}), 400
+        
+        if game_id is not None and not game_id_signer.verify(game_id):
+            logger.info('成绩提交被拒绝: 无效游戏ID', extra=fields(game_id=game_id))
+            return jsonify({'error': '无效的游戏ID'}), 400
+        
         # 尝试保存成绩
-        print(f"[LEADERBOARD_SUBMIT] 开始保存成绩到数据库...")
-        save_result = save_score(nickname, score, total_time, average_time)
+        save_result = save_score(nickname, score, total_time, average_time, game, game_id)
+        
+        if save_result is None:
+            return jsonify({'error': '该局成绩已经提交过了'}), 409
         
         if save_result:
-            print(f"[LEADERBOARD_SUBMIT] 成绩保存成功")
-            
             # 获取用户排名
-            print(f"[LEADERBOARD_SUBMIT] 计算用户排名...")
             rank = get_user_rank(score, total_time)
-            print(f"[LEADERBOARD_SUBMIT] 用户排名: 第{rank}名")
+            logger.debug('成绩保存成功', extra=fields(nickname=nickname, score=score, rank=rank))
             
             response_data = {
                 'success': True,
                 'rank': rank,
                 'message': f'恭喜！您获得了第{rank}名！'
             }
-            
-            print(f"[LEADERBOARD_SUBMIT] 成功响应: {response_data}")
             return jsonify(response_data)
         else:
-            print(f"[LEADERBOARD_SUBMIT] 错误: 保存成绩失败")
+            logger.error('保存成绩失败', extra=fields(nickname=nickname, score=score))
             return jsonify({'error': '保存成绩失败'}), 500
             
-    except Exception as e:
-        print(f"[LEADERBOARD_SUBMIT] 异常: {str(e)}")
-        print(f"[LEADERBOARD_SUBMIT] 异常类型: {type(e).__name__}")
-        import traceback
-        print(f"[LEADERBOARD_SUBMIT] 异常堆栈: {traceback.format_exc()}")
+    except Exception:
+        logger.exception('成绩提交处理异常')
         return jsonify({'error': '服务器内部错误'}), 500
 
 @app.route('/api/leaderboard')
 def get_leaderboard_api():
     """获取排行榜"""
     limit = request.args.get('limit', 20, type=int)
-    leaderboard = get_leaderboard(limit)
-    return jsonify({'leaderboard': leaderboard})
+    body = leaderboard_cache.get_response_body(limit)
+    return app.response_class(body, mimetype='application/json')
+
+@app.route('/api/leaderboard/stream')
+def leaderboard_stream():
+    """排行榜实时推送（Server-Sent Events）"""
+    return Response(
+        event_stream(leaderboard_broadcaster),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/leaderboard/board')
+def get_board_api():
+    """获取日榜/周榜/总榜，可按游戏筛选"""
+    window = request.args.get('window', 'all')
+    game = request.args.get('game', rollups.ALL_GAMES)
+    limit = request.args.get('limit', 20, type=int)
+    
+    if window not in rollups.WINDOWS:
+        return jsonify({'error': '无效的榜单类型'}), 400
+    if game != rollups.ALL_GAMES and not rollups.is_valid_game(game):
+        return jsonify({'error': '无效的游戏类型'}), 400
+    
+    return jsonify(get_board(window, game, max(1, min(limit, 100))))
 
 @app.route('/leaderboard')
 def leaderboard_page():
     """排行榜页面"""
     return render_template('leaderboard.html')
 
+@app.route('/room')
+@app.route('/room/<code>')
+def room_page(code=None):
+    """课堂房间页面（老师创建房间、开始新一轮、查看房间排行榜）"""
+    return render_template('room.html')
+
+@app.route('/api/rooms', methods=['POST'])
+@rate_limiter.limit('rooms')
+def create_room():
+    """创建课堂房间，返回房间号和老师令牌"""
+    data = request.get_json(silent=True) or {}
+    category = data.get('category') or None
+    if category is not None and category not in word_bank.category_names:
+        return jsonify({'error': '无效的分类'}), 400
+    
+    room = room_registry.create(category)
+    if room is None:
+        return jsonify({'error': '房间数量已达上限，请稍后再试'}), 503
+    return jsonify({
+        'code': room.code,
+        'token': room.token,
+        'round': room.round,
+        'category': category,
+        'join_url': f'/?room={room.code}',
+        'expires_in': int(room_registry.ttl)
+    }), 201
+
+@app.route('/api/rooms/<code>/round', methods=['POST'])
+@rate_limiter.limit('rooms')
+def next_room_round(code):
+    """老师开始新一轮，房间内所有学生收到 round 事件"""
+    room = room_registry.get(code)
+    if room is None:
+        return jsonify({'error': '房间不存在或已过期'}), 404
+    data = request.get_json(silent=True) or {}
+    if not room_registry.check_token(room, data.get('token')):
+        return jsonify({'error': '无权操作该房间'}), 403
+    return jsonify({'code': room.code, 'round': room_registry.next_round(room)})
+
+@app.route('/api/rooms/<code>/game')
+def get_room_game(code):
+    """房间本轮题目：同一轮所有学生共享同一份序列化结果"""
+    room = room_registry.get(code)
+    if room is None:
+        return jsonify({'error': '房间不存在或已过期'}), 404
+    status, body, headers = room.game_response(game_catalog, serialize_json,
+                                               request.args.get('catalog_version'),
+                                               request.headers.get('If-None-Match'))
+    return app.response_class(body, status=status, headers=headers, mimetype='application/json')
+
+@app.route('/api/rooms/<code>/scores', methods=['POST'])
+@rate_limiter.limit('scores')
+def submit_room_score(code):
+    """提交房间本轮成绩"""
+    room = room_registry.get(code)
+    if room is None:
+        return jsonify({'error': '房间不存在或已过期'}), 404
+    data = request.get_json(silent=True) or {}
+    nickname = str(data.get('nickname', '')).strip()
+    score = data.get('score')
+    total_time = data.get('total_time')
+    round_number = data.get('round')
+    
+    if not nickname or len(nickname) > 20:
+        return jsonify({'error': '昵称不能为空且不能超过20个字符'}), 400
+    if not isinstance(score, int) or score < 0:
+        return jsonify({'error': '分数必须是非负整数'}), 400
+    if not isinstance(total_time, int) or total_time < 0:
+        return jsonify({'error': '总时间必须是非负整数'}), 400
+    
+    rank = room.submit(nickname, score, total_time, round_number)
+    if rank is None:
+        return jsonify({'error': '本轮已结束'}), 409
+    return jsonify({'success': True, 'rank': rank, 'message': f'恭喜！您在本轮获得了第{rank}名！'})
+
+@app.route('/api/rooms/<code>/leaderboard')
+def get_room_leaderboard(code):
+    """房间本轮排行榜"""
+    room = room_registry.get(code)
+    if room is None:
+        return jsonify({'error': '房间不存在或已过期'}), 404
+    return app.response_class(room.board_body(serialize_json), mimetype='application/json')
+
+@app.route('/api/rooms/<code>/stream')
+def room_stream(code):
+    """房间实时推送（Server-Sent Events）"""
+    room = room_registry.get(code)
+    if room is None:
+        return jsonify({'error': '房间不存在或已过期'}), 404
+    return Response(
+        event_stream(room),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/feedback', methods=['POST'])
+@rate_limiter.limit('feedback')
 def submit_feedback_api():
     """提交反馈"""
     data = request.get_json()
@@ -606,6 +900,58 @@ def get_feedback_stats_api():
     stats = get_feedback_stats()
     return jsonify({'feedback_stats': stats})
 
+# 批量导出：按批读取、编码并压缩，内存占用与表的大小无关
+def export_response(table, columns, batches, fmt):
+    chunks = export.ENCODERS[fmt](columns, export.counted(batches, lambda n: EXPORTED_ROWS.inc(n, table=table)))
+    headers = {
+        'Content-Disposition': f"attachment; filename={table}-{datetime.now().strftime('%Y%m%d')}.{fmt}",
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.accept_encodings['gzip']:
+        chunks = export.gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    logger.info('开始导出', extra=fields(table=table, format=fmt, ip=request.remote_addr))
+    return Response(chunks, content_type=export.FORMATS[fmt], headers=headers)
+
+# 导出接口只对管理员开放：在限流和读取数据库之前校验管理令牌
+def require_admin_token(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = export.bearer_token(request.headers.get('Authorization'))
+        if token is None:
+            return jsonify({'error': '需要管理令牌'}), 401, {'WWW-Authenticate': 'Bearer'}
+        if not export.check_token(token):
+            logger.warning('导出令牌无效', extra=fields(ip=request.remote_addr))
+            return jsonify({'error': '无权导出'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/export/scores')
+@require_admin_token
+@rate_limiter.limit('export')
+def export_scores():
+    """导出成绩（CSV/NDJSON），可按游戏时间 start/end 筛选"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': '无效的导出格式'}), 400
+    try:
+        start = export.parse_time(request.args.get('start'))
+        end = export.parse_time(request.args.get('end'), end=True)
+    except ValueError:
+        return jsonify({'error': '无效的时间范围'}), 400
+    return export_response('scores', SCORE_EXPORT_COLUMNS, storage.iter_scores(start, end), fmt)
+
+@app.route('/api/export/feedback')
+@require_admin_token
+@rate_limiter.limit('export')
+def export_feedback():
+    """导出图片反馈（CSV/NDJSON）"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': '无效的导出格式'}), 400
+    return export_response('feedback', FEEDBACK_EXPORT_COLUMNS, storage.iter_feedback(), fmt)
+
 # 英语字母游戏路由
 @app.route('/english')
 def english_alphabet_page():
@@ -631,21 +977,29 @@ def start_english_game():
         data = request.get_json() or {}
         game_type = data.get('game_type', 'letter_recognition')
         difficulty = data.get('difficulty', 'easy')
+        catalog_version = data.get('catalog_version')
     else:
         game_type = request.args.get('game_type', 'letter_recognition')
         difficulty = request.args.get('difficulty', 'easy')
+        catalog_version = request.args.get('catalog_version')
     
-    questions = []
-    for _ in range(10):  # 生成10个题目
-        question = generate_english_question(game_type, difficulty)
-        questions.append(question)
-    
-    return jsonify({
-        'questions': questions,
-        'totalQuestions': len(questions),
-        'gameType': game_type,
-        'difficulty': difficulty
-    })
+    return jsonify(game_catalog.respond(build_english_game(game_type, difficulty), catalog_version, english=True))
+
+@app.route('/api/english/game/seed/<seed>')
+def get_seeded_english_game(seed):
+    """按种子生成英语字母游戏，相同种子、游戏类型和难度总是得到相同的题目"""
+    game_type = request.args.get('game_type', 'letter_recognition')
+    difficulty = request.args.get('difficulty', 'easy')
+    if not SEED_PATTERN.match(seed):
+        return jsonify({'error': '无效的种子'}), 400
+    if game_type not in wordbank.ENGLISH_PROMPTS or difficulty not in DIFFICULTIES:
+        return jsonify({'error': '无效的游戏类型或难度'}), 400
+    return seeded_game_response('english', seed, game_type, difficulty)
+
+@app.route('/api/english/game/daily')
+def get_daily_english_game():
+    """英语字母游戏的每日挑战"""
+    return daily_redirect('get_seeded_english_game')
 
 @app.route('/api/english/abc-song')
 def get_abc_song():
@@ -658,7 +1012,14 @@ def get_abc_song():
 
 if __name__ == '__main__':
     # 初始化数据库
-    init_database()
+    warmup()
+    
+    # 按配置启动成绩表定期维护，接收其他进程的成绩写入通知
+    maintenance.start_scheduler('leaderboard.db')
+    storage.start_watcher()
+    image_replacer.start_worker('leaderboard.db')
+    answer_writer.start()
+    word_bank.start_watcher()
     
     # 创建templates目录
     os.makedirs('templates', exist_ok=True)
@@ -676,5 +1037,5 @@ if __name__ == '__main__':
         shutil.move('script.js', 'static/script.js')
     
     PORT = os.getenv('PORT', 8080)
-    print(f"Starting server on port {PORT}")
+    logger.info('Starting server', extra=fields(port=PORT))
     app.run(debug=True, host='0.0.0.0', port=PORT)
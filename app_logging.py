@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+日志系统
+- 按级别输出，热路径上的调试信息默认不格式化
+- 请求线程只把日志记录放入队列，由后台线程格式化并写出
+- 每条日志输出为一行JSON，自动附带请求ID
+- 支持对高频事件按比例采样
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+LOGGER_NAME = 'syword'
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# 日志记录中不作为结构化字段输出的标准属性
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'sample_rate'}
+
+
+def get_logger(name=None):
+    """获取应用日志器，name为子模块名"""
+    return logging.getLogger(f'{LOGGER_NAME}.{name}' if name else LOGGER_NAME)
+
+
+def fields(sample=None, **kwargs):
+    """
+    构造结构化日志字段，用法: logger.info('消息', extra=fields(score=10))
+
+    Args:
+        sample: 采样比例（0-1），仅保留该比例的日志，用于高频事件
+    """
+    extra = dict(kwargs)
+    if sample is not None:
+        extra['sample_rate'] = sample
+    return extra
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """在请求线程中为日志记录附加请求ID，并按采样比例丢弃记录"""
+
+    def filter(self, record):
+        sample_rate = getattr(record, 'sample_rate', None)
+        if sample_rate is not None and random.random() >= sample_rate:
+            return False
+        if has_request_context():
+            record.request_id = g.get('request_id')
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    非阻塞的队列日志处理器
+    后台写出线程在首次使用时启动，fork后的子进程（如gunicorn worker）会重新启动自己的线程
+    """
+
+    def __init__(self, target, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        # fork时父进程的写出线程可能正持有队列的锁，子进程换用新的队列
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.queue = queue.Queue(self.maxsize)
+        self._listener = None
+        self._pid = None
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+        self._listener.start()
+
+    def prepare(self, record):
+        # 在请求线程中只合并消息参数和异常文本，JSON格式化留给后台线程
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # 队列满时丢弃日志，绝不阻塞请求
+            self.dropped += 1
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+
+def _build_target_handler():
+    """日志写出目标：设置 LOG_FILE 时写文件，否则写标准输出（由 deploy.sh 重定向到日志文件）"""
+    log_file = os.getenv('LOG_FILE')
+    if log_file:
+        handler = logging.handlers.WatchedFileHandler(log_file, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def init_logging(app):
+    """
+    初始化日志系统并为每个请求分配请求ID
+
+    环境变量:
+        LOG_LEVEL: 日志级别，默认 INFO
+        LOG_FILE: 日志文件路径，默认输出到标准输出
+    """
+    logger = get_logger()
+    if not any(isinstance(h, AsyncQueueHandler) for h in logger.handlers):
+        handler = AsyncQueueHandler(_build_target_handler())
+        handler.addFilter(RequestContextFilter())
+        logger.addHandler(handler)
+        logger.propagate = False
+        atexit.register(handler.stop)
+    logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex[:16]
+
+    @app.after_request
+    def expose_request_id(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+    return logger
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+ASGI服务模式
+长连接和高并发接口在事件循环中原生处理，其余路由通过线程池转交给原有的Flask应用。
+
+原生处理的接口:
+    GET       /api/leaderboard/stream   排行榜实时推送，空闲连接只占用一个asyncio队列
+    GET/POST  /api/game/start           汉字游戏生成
+    GET/POST  /api/english/game/start   英语游戏生成
+    GET       /api/leaderboard          排行榜（SQLite查询在线程中执行，不阻塞事件循环）
+    GET       /api/rooms/<code>/game    课堂房间本轮题目（共享的序列化字节）
+    GET       /api/rooms/<code>/stream  课堂房间实时推送
+    GET/HEAD  /static/*  /audio/*       静态文件（见 static_files.py），不占用WSGI线程
+
+出题、排行榜查询等会读文件或数据库的工作在线程中执行，事件循环只负责收发，SSE推送不会被慢请求卡住。
+原生路由与Flask路由一样返回 X-Request-ID、记录请求数/耗时/处理中请求数指标；
+不经过Flask的钩子，因此不做性能分析（profiling.py），线程中输出的日志也不带请求ID。
+
+启动方式（需要安装 uvicorn）:
+    gunicorn -c gunicorn.conf.py            部署方式（deploy.sh），预热和平滑重启见 gunicorn.conf.py / draining_worker.py
+    uvicorn asgi:application --host 0.0.0.0 --port 8083 --workers 4
+"""
+
+import asyncio
+import io
+import json
+import os
+import queue
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from app import (answer_writer, app, build_english_game, build_game, game_catalog, leaderboard_broadcaster,
+                 leaderboard_cache, room_registry, serialize_json, static_files, storage, warmup, word_bank)
+from app_logging import REQUEST_ID_HEADER, get_logger
+from broadcaster import SUBSCRIBER_BACKLOG
+import maintenance
+import image_replacer
+from metrics import REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, STATIC_RESPONSES, registry
+from static_files import CHUNK_SIZE
+
+logger = get_logger('asgi')
+
+# SSE心跳间隔（秒）
+HEARTBEAT_INTERVAL = 15.0
+
+# 课堂房间的原生路由 /api/rooms/<code>/game 和 /api/rooms/<code>/stream
+ROOM_ROUTE = re.compile(r'^/api/rooms/([A-Za-z0-9]{1,16})/(game|stream)$')
+
+
+class AsyncLeaderboardHub:
+    """
+    把 LeaderboardBroadcaster 的推送转发给事件循环内的所有SSE连接
+    整个进程只向广播器订阅一次，由一个执行器线程等待消息
+    """
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.listeners = set()
+        self.latest = None
+        self._task = None
+
+    def subscribe(self):
+        listener = asyncio.Queue(SUBSCRIBER_BACKLOG)
+        self.listeners.add(listener)
+        if self.latest is not None:
+            listener.put_nowait(self.latest)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._pump())
+        return listener
+
+    def unsubscribe(self, listener):
+        self.listeners.discard(listener)
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        subscription = self.broadcaster.subscribe()
+        try:
+            while self.listeners:
+                try:
+                    message = await loop.run_in_executor(None, subscription.get, True, 1.0)
+                except queue.Empty:
+                    continue
+                self.latest = message
+                for listener in list(self.listeners):
+                    if listener.full():
+                        listener.get_nowait()
+                    listener.put_nowait(message)
+        finally:
+            self.broadcaster.unsubscribe(subscription)
+            self.latest = None
+            self._task = None
+
+
+class LoopListener:
+    """
+    房间推送的订阅者：房间在请求线程中调用 put_nowait，消息转入事件循环中的asyncio队列
+    队列已满时丢弃最旧的一条（与 broadcaster.offer 一致）
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_BACKLOG)
+
+    def put_nowait(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+async def read_body(receive):
+    """读取完整请求体，客户端断开时返回None"""
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+async def send_response(send, status, body, content_type='application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *headers
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def with_request_id(scope, send):
+    """在响应头中附加请求ID（沿用客户端传入的 X-Request-ID，与 app_logging 一致）"""
+    name = REQUEST_ID_HEADER.lower().encode('latin-1')
+    value = next((v for n, v in scope.get('headers', []) if n.lower() == name), None) or uuid.uuid4().hex[:16].encode()
+
+    async def send_with_request_id(message):
+        if message['type'] == 'http.response.start':
+            message = {**message, 'headers': [*message.get('headers', []), (name, value)]}
+        await send(message)
+    return send_with_request_id
+
+
+def dumps(payload):
+    return app.json.dumps(payload, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class AsgiApplication:
+    """ASGI入口：原生异步路由 + Flask(WSGI)回退"""
+
+    def __init__(self, wsgi_app, max_workers=32):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='wsgi')
+        self.hub = AsyncLeaderboardHub(leaderboard_broadcaster)
+        # 平滑重启时置位，正在进行的SSE推送随即结束，客户端重连到新worker
+        self.draining = asyncio.Event()
+        self.routes = {
+            ('GET', '/api/leaderboard/stream'): self.leaderboard_stream,
+            ('GET', '/api/game/start'): self.start_game,
+            ('POST', '/api/game/start'): self.start_game,
+            ('GET', '/api/english/game/start'): self.start_english_game,
+            ('POST', '/api/english/game/start'): self.start_english_game,
+            ('GET', '/api/leaderboard'): self.leaderboard,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if static_files.match(scope['path']) is not None and await self.static(scope, send):
+            return
+
+        route = (scope['method'], scope['path'])
+        handler = self.routes.get(route)
+        if handler is None and scope['method'] == 'GET' and (match := ROOM_ROUTE.match(scope['path'])):
+            route = ('GET', f'/api/rooms/<code>/{match.group(2)}')
+            handler = self.room_game if match.group(2) == 'game' else self.room_stream
+        if handler is None:
+            await self.call_wsgi(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            status = await handler(scope, receive, with_request_id(scope, send))
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+        REQUEST_LATENCY.observe(time.perf_counter() - start, method=route[0], route=route[1])
+        REQUEST_COUNT.inc(method=route[0], route=route[1], status=status)
+        registry.maybe_flush()
+
+    def drain(self):
+        """结束所有SSE推送（由 draining_worker 在worker退出前调用）"""
+        self.draining.set()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await asyncio.to_thread(warmup)
+                maintenance.start_scheduler('leaderboard.db')
+                image_replacer.start_worker('leaderboard.db')
+                storage.start_watcher()
+                answer_writer.start()
+                word_bank.start_watcher()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ---- 原生路由 ----
+
+    async def static(self, scope, send):
+        """发送静态文件，文件不存在时返回False交给Flask处理（404）"""
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+        plan = static_files.resolve(scope['method'], scope['path'], scope.get('query_string', b'').decode('latin-1'),
+                                    headers)
+        if plan is None:
+            return False
+        STATIC_RESPONSES.inc(mount=plan.mount.name, status=plan.status)
+        await send({
+            'type': 'http.response.start',
+            'status': plan.status,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in plan.headers],
+        })
+        if plan.path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return True
+
+        with open(plan.path, 'rb') as f:
+            if 'http.response.zerocopysend' in (scope.get('extensions') or {}):
+                await send({'type': 'http.response.zerocopysend', 'file': f.fileno(),
+                            'offset': plan.offset, 'count': plan.length})
+                return True
+            # 图片和语音都经过压缩（约百KB以内），通常在页缓存中，直接读取不会明显阻塞事件循环
+            f.seek(plan.offset)
+            remaining = plan.length
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining > 0 or plan.length == 0:
+                await send({'type': 'http.response.body', 'body': b''})
+        return True
+
+    async def leaderboard_stream(self, scope, receive, send):
+        listener = self.hub.subscribe()
+        try:
+            return await self._event_stream(listener, receive, send)
+        finally:
+            self.hub.unsubscribe(listener)
+
+    async def _event_stream(self, listener, receive, send):
+        """把asyncio队列中的SSE消息发送给客户端，空闲时发送心跳，直到客户端断开或worker退出"""
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        draining = asyncio.ensure_future(self.draining.wait())
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while True:
+                getter = asyncio.ensure_future(listener.get())
+                done, _ = await asyncio.wait({getter, disconnected, draining}, timeout=HEARTBEAT_INTERVAL,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    chunk = getter.result()
+                else:
+                    getter.cancel()
+                    if disconnected in done or draining in done:
+                        break
+                    chunk = ': keep-alive\n\n'
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            draining.cancel()
+        return 200
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _game_params(self, scope, receive):
+        query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        params = {key: values[0] for key, values in query.items()}
+        body = await read_body(receive)
+        if scope['method'] == 'POST' and body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = None
+            if isinstance(data, dict):
+                params.update({key: value for key, value in data.items() if value})
+        return params
+
+    async def start_game(self, scope, receive, send):
+        params = await self._game_params(scope, receive)
+        recent_words = params.get('recent_words', []) if scope['method'] == 'POST' else []
+        # 出题可能读取词库分片文件，在线程中执行
+        body = await asyncio.to_thread(self._game_body, params.get('category'), recent_words,
+                                       params.get('catalog_version'))
+        await send_response(send, 200, body)
+        return 200
+
+    @staticmethod
+    def _game_body(category, recent_words, catalog_version):
+        return dumps(game_catalog.respond(build_game(category, recent_words), catalog_version))
+
+    async def start_english_game(self, scope, receive, send):
+        params = await self._game_params(scope, receive)
+        body = await asyncio.to_thread(self._english_game_body, params.get('game_type', 'letter_recognition'),
+                                       params.get('difficulty', 'easy'), params.get('catalog_version'))
+        await send_response(send, 200, body)
+        return 200
+
+    @staticmethod
+    def _english_game_body(game_type, difficulty, catalog_version):
+        payload = build_english_game(game_type, difficulty)
+        return dumps(game_catalog.respond(payload, catalog_version, english=True))
+
+    async def room_game(self, scope, receive, send):
+        room = room_registry.get(ROOM_ROUTE.match(scope['path']).group(1))
+        if room is None:
+            await send_response(send, 404, dumps({'error': '房间不存在或已过期'}))
+            return 404
+        query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        if_none_match = next((value.decode('latin-1') for name, value in scope.get('headers', [])
+                              if name.lower() == b'if-none-match'), None)
+        status, body, headers = room.game_response(game_catalog, serialize_json,
+                                                   query.get('catalog_version', [None])[0], if_none_match)
+        await send_response(send, status, body,
+                            headers=[(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers])
+        return status
+
+    async def room_stream(self, scope, receive, send):
+        room = room_registry.get(ROOM_ROUTE.match(scope['path']).group(1))
+        if room is None:
+            await send_response(send, 404, dumps({'error': '房间不存在或已过期'}))
+            return 404
+        listener = LoopListener(asyncio.get_running_loop())
+        room.subscribe(listener)
+        try:
+            return await self._event_stream(listener.queue, receive, send)
+        finally:
+            room.unsubscribe(listener)
+
+    async def leaderboard(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        try:
+            limit = int(query.get('limit', ['20'])[0])
+        except ValueError:
+            limit = 20
+        body = await asyncio.to_thread(self._leaderboard_body, limit)
+        await send_response(send, 200, body)
+        return 200
+
+    @staticmethod
+    def _leaderboard_body(limit):
+        with app.app_context():
+            return leaderboard_cache.get_response_body(limit)
+
+    # ---- WSGI回退 ----
+
+    async def call_wsgi(self, scope, receive, send):
+        body = await read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        status, headers, chunks, stream = await loop.run_in_executor(self.executor, self._run_wsgi, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if stream is not None:
+            # 流式响应（如数据导出）：每次从执行器中取一块发送，不在内存中攒下整个响应体
+            try:
+                iterator = iter(stream)
+                while (chunk := await loop.run_in_executor(self.executor, next, iterator, None)) is not None:
+                    if chunk:
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                if hasattr(stream, 'close'):
+                    await loop.run_in_executor(self.executor, stream.close)
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def _run_wsgi(self, environ):
+        """执行WSGI应用；没有 Content-Length 的响应（生成器响应）不在这里读取，作为流返回"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return lambda data: chunks.append(data)
+
+        chunks = []
+        result = self.wsgi_app(environ, start_response)
+        if not any(name == b'content-length' for name, _ in response['headers']):
+            return response['status'], response['headers'], chunks, result
+        try:
+            for chunk in result:
+                if chunk:
+                    chunks.append(chunk)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks, None
+
+
+def build_environ(scope, body):
+    """根据ASGI scope构造WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    path = scope.get('root_path', '') + scope['path']
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'RAW_URI': path,
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key == 'CONTENT_LENGTH':
+            continue
+        else:
+            key = f'HTTP_{key}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+application = AsgiApplication(app, max_workers=int(os.getenv('ASGI_WSGI_THREADS', '32')))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WSGI / ASGI 并发基准测试
+分别启动 gunicorn(gthread) 和 uvicorn，先建立大量空闲的排行榜SSE连接，
+再在这些连接保持期间并发请求 /api/game/start，比较两种模式能维持的连接数和出题延迟。
+
+--check: 负载检查，按部署配置（gunicorn.conf.py）启动服务，建立N个SSE连接后
+轮流请求出题、排行榜和健康检查（Flask路由），有连接未建立或请求失败时以状态码1退出
+
+需要安装 gunicorn 和 uvicorn
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVERS = {
+    'wsgi': lambda port, threads: [
+        sys.executable, '-m', 'gunicorn', '-k', 'gthread', '-w', '1', '--threads', str(threads),
+        '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'
+    ],
+    'asgi': lambda port, threads: [
+        sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+        '--port', str(port), '--log-level', 'warning'
+    ],
+    'deploy': lambda port, threads: [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}',
+        '-p', os.path.join(tempfile.gettempdir(), f'syword-bench-{port}.pid'), '--log-level', 'warning'
+    ],
+}
+
+# 负载检查轮流请求的接口：原生异步路由和转交Flask的路由
+CHECK_PATHS = ('/api/game/start', '/api/leaderboard', '/healthz')
+
+
+async def wait_ready(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise SystemExit(f'服务未能在{timeout}秒内启动 (端口 {port})')
+
+
+async def open_stream(port, timeout):
+    """建立一个SSE连接，收到响应头即视为成功，返回连接（保持打开）"""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /api/leaderboard/stream HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n')
+        await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        if b'200' in status:
+            return writer
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        pass
+    return None
+
+
+async def timed_get(port, path, timeout):
+    """请求一次，返回耗时（毫秒）；超时、连接失败或状态码不是200时返回None"""
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+    if response.split(b' ', 2)[1:2] != [b'200']:
+        return None
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_case(mode, port, streams, requests, concurrency, threads, timeout, paths=('/api/game/start',)):
+    process = subprocess.Popen(SERVERS[mode](port, threads), cwd=os.path.dirname(os.path.abspath(__file__)),
+                               env={**os.environ, 'LOG_LEVEL': 'WARNING'})
+    try:
+        await wait_ready(port)
+        writers = await asyncio.gather(*(open_stream(port, timeout) for _ in range(streams)))
+        open_writers = [w for w in writers if w is not None]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(path):
+            async with semaphore:
+                return await timed_get(port, path, timeout)
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one(paths[i % len(paths)]) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        ok = sorted(l for l in latencies if l is not None)
+
+        for writer in open_writers:
+            writer.close()
+
+        result = {
+            'streams': len(open_writers),
+            'ok': len(ok),
+            'rps': len(ok) / elapsed if elapsed else 0,
+            'p50': statistics.median(ok) if ok else float('nan'),
+            'p99': ok[min(len(ok) - 1, int(len(ok) * 0.99))] if ok else float('nan'),
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            # gunicorn会等待长连接优雅退出，基准测试中直接结束
+            process.kill()
+            process.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比WSGI与ASGI模式在大量空闲长连接下的表现')
+    parser.add_argument('--streams', type=int, default=500, help='空闲SSE连接数 (默认: 500)')
+    parser.add_argument('--requests', type=int, default=200, help='出题请求数 (默认: 200)')
+    parser.add_argument('--concurrency', type=int, default=20, help='出题请求并发数 (默认: 20)')
+    parser.add_argument('--threads', type=int, default=64, help='gunicorn线程数 (默认: 64)')
+    parser.add_argument('--timeout', type=float, default=5.0, help='单个请求超时秒数 (默认: 5)')
+    parser.add_argument('--port', type=int, default=8931)
+    parser.add_argument('--check', action='store_true', help='按部署配置做负载检查，失败时退出码为1')
+    args = parser.parse_args()
+
+    from app import init_database
+    init_database()
+
+    if args.check:
+        r = asyncio.run(run_case('deploy', args.port, args.streams, args.requests, args.concurrency,
+                                 args.threads, args.timeout, CHECK_PATHS))
+        print(f"SSE连接: {r['streams']}/{args.streams}，成功请求: {r['ok']}/{args.requests}，"
+              f"p50 {r['p50']:.1f}ms，p99 {r['p99']:.1f}ms")
+        if r['streams'] < args.streams or r['ok'] < args.requests:
+            print('负载检查失败：SSE连接占满后接口无法正常响应')
+            sys.exit(1)
+        return
+
+    print(f"空闲SSE连接: {args.streams}，出题请求: {args.requests}（并发 {args.concurrency}）")
+    print(f"{'模式':<8}{'已建立连接':>12}{'成功请求':>10}{'请求/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+    print("-" * 60)
+    for offset, mode in enumerate(('wsgi', 'asgi')):
+        r = asyncio.run(run_case(mode, args.port + offset, args.streams, args.requests,
+                                 args.concurrency, args.threads, args.timeout))
+        print(f"{mode:<8}{r['streams']:>12}{r['ok']:>10}{r['rps']:>10.1f}{r['p50']:>10.1f}{r['p99']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON序列化基准测试
+以Flask自带的DefaultJSONProvider为基线，测量FastJSONProvider默认配置（orjson + ASCII转义）和原始UTF-8输出
+在真实API负载上的序列化耗时，并校验默认配置的输出与基线逐字节一致
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import app, get_characters, start_game
+from json_provider import FastJSONProvider, orjson
+
+
+def sample_leaderboard(size=20):
+    """构造与 get_leaderboard_api 返回结构相同的排行榜数据"""
+    nicknames = ['小明', '小红', '豆豆', '乐乐', '天天', '甜甜', 'Tom', '妞妞']
+    leaderboard = []
+    for i in range(1, size + 1):
+        leaderboard.append({
+            'rank': i,
+            'nickname': f'{random.choice(nicknames)}{i}',
+            'score': 10 - i // 3,
+            'total_time': 20000 + i * 731,
+            'average_time': 2000 + i * 73,
+            'play_timestamp': 1700000000 + i * 3600
+        })
+    return {'leaderboard': leaderboard}
+
+
+def collect_payloads():
+    """从路由函数获取真实的响应数据"""
+    with app.test_request_context('/api/game/start?category=自然与宇宙'):
+        game = start_game().get_json()
+    with app.test_request_context('/api/characters'):
+        characters = get_characters().get_json()
+    return {
+        'start_game': game,
+        'get_leaderboard_api': sample_leaderboard(),
+        'get_characters': characters,
+    }
+
+
+def raw_utf8_provider():
+    """JSON_RAW_UTF8=1 时的配置：中文原样输出，走orjson路径"""
+    provider = FastJSONProvider(app)
+    provider.ensure_ascii = False
+    return provider
+
+
+def report(name, size, timings):
+    baseline = timings['baseline']
+    print(f"{name:<22}{size:>10}" + ''.join(f"{ms:>12.3f}" for ms in timings.values())
+          + f"{baseline / timings['default']:>9.1f}x{baseline / timings['raw_utf8']:>9.1f}x")
+
+
+def print_header(title, number):
+    print(f"\n{title}，每项重复 {number} 次")
+    print(f"{'负载':<22}{'字节数':>10}{'baseline':>12}{'default':>12}{'raw_utf8':>12}{'默认加速':>8}{'UTF-8加速':>8}")
+    print("-" * 86)
+
+
+def check(name, bodies):
+    """默认配置必须与基线逐字节一致；原始UTF-8输出解析后必须与基线相同"""
+    if bodies['default'] != bodies['baseline']:
+        raise SystemExit(f"✗ {name}: 默认输出与DefaultJSONProvider不一致")
+    if json.loads(bodies['raw_utf8']) != json.loads(bodies['baseline']):
+        raise SystemExit(f"✗ {name}: 原始UTF-8输出的内容与DefaultJSONProvider不一致")
+
+
+def bench(payloads, number, debug):
+    """jsonify 使用的 response()：基线为Flask自带的DefaultJSONProvider"""
+    app.debug = debug
+    providers = {
+        'baseline': DefaultJSONProvider(app),
+        'default': FastJSONProvider(app),
+        'raw_utf8': raw_utf8_provider(),
+    }
+    print_header(f"response() {'缩进(debug)' if debug else '紧凑'}", number)
+    for name, payload in payloads.items():
+        bodies = {}
+        timings = {}
+        with app.app_context():
+            for label, provider in providers.items():
+                bodies[label] = provider.response(payload).get_data()
+                timings[label] = timeit.timeit(lambda: provider.response(payload), number=number) / number * 1000
+        check(name, bodies)
+        report(name, len(bodies['baseline']), timings)
+
+
+def bench_dumps(payloads, number):
+    """
+    不带参数的 app.json.dumps(data)（题目目录、固定种子题目、课堂房间使用）：
+    FastJSONProvider默认紧凑输出，基线为DefaultJSONProvider的紧凑形式
+    """
+    app.debug = False
+    providers = {
+        'baseline': lambda payload, provider=DefaultJSONProvider(app): provider.dumps(payload, separators=(',', ':')),
+        'default': FastJSONProvider(app).dumps,
+        'raw_utf8': raw_utf8_provider().dumps,
+    }
+    print_header('app.json.dumps(data)', number)
+    for name, payload in payloads.items():
+        bodies = {}
+        timings = {}
+        for label, dumps in providers.items():
+            bodies[label] = dumps(payload).encode('utf-8')
+            timings[label] = timeit.timeit(lambda: dumps(payload), number=number) / number * 1000
+        check(name, bodies)
+        report(name, len(bodies['baseline']), timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比DefaultJSONProvider与FastJSONProvider的序列化性能')
+    parser.add_argument('--number', '-n', type=int, default=500,
+                        help='每个负载的重复次数 (默认: 500)')
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("未安装orjson，FastJSONProvider将回退到标准库，结果仅用于校验一致性")
+
+    payloads = collect_payloads()
+    bench(payloads, args.number, debug=False)
+    bench(payloads, args.number, debug=True)
+    bench_dumps(payloads, args.number)
+    print("\n✓ 默认输出与DefaultJSONProvider逐字节一致，原始UTF-8输出内容一致")
+    print("  加速比: baseline / default（默认配置）、baseline / raw_utf8（JSON_RAW_UTF8=1）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+题目负载基准测试
+通过真实路由分别请求完整题目和精简题目，统计每局的字节数（原始/gzip）和目录的一次性下载量，
+并按浏览器的还原逻辑（static/script.js、static/english_script.js 的 expandQuestions）
+校验精简题目 + 目录能逐字段还原出完整题目
+"""
+
+import argparse
+import gzip
+import random
+import statistics
+
+from app import app, game_catalog
+
+GAMES = [
+    ('chinese', '/api/game/start', {}),
+    ('letter_recognition', '/api/english/game/start', {'game_type': 'letter_recognition'}),
+    ('letter_pairing', '/api/english/game/start', {'game_type': 'letter_pairing'}),
+    ('word_matching', '/api/english/game/start', {'game_type': 'word_matching'}),
+]
+
+
+def expand_chinese(question, catalog):
+    entry = catalog['characters'][question['id']]
+    common_words = [entry['common_words'][i] for i in question['words']]
+    audio = entry['audio']
+    return {
+        'image': entry['image'],
+        'correctAnswer': question['id'],
+        'options': question['options'],
+        'voiceText': catalog['prompt'].replace('{character}', question['id']),
+        'pinyin': entry['pinyin'],
+        'meaning': entry['meaning'],
+        'common_words': common_words,
+        'audio': {
+            'prompt': audio['prompt'],
+            'answer': audio['character'],
+            'common_words': [audio['common_words'].get(word) for word in common_words],
+        } if audio else None,
+    }
+
+
+def expand_english(question, catalog, game_type):
+    entry = catalog['letters'][question['id']]
+    answer = {'letter_recognition': question['id'], 'letter_pairing': entry['lowercase']}.get(
+        game_type, question.get('answer'))
+    audio = entry['audio']
+    if audio:
+        answer_audio = audio['words'].get(answer) if game_type == 'word_matching' else audio[
+            'letter' if game_type == 'letter_recognition' else 'lowercase']
+    return {
+        'image': entry['image'],
+        'correctAnswer': answer,
+        'options': question['options'],
+        'voiceText': catalog['prompts'][game_type].replace('{letter}', question['id'])
+                                                  .replace('{lowercase}', entry['lowercase']),
+        'pronunciation': entry['pronunciation'],
+        'phonetic': entry['phonetic'],
+        'words': entry['words'],
+        'description': entry['description'],
+        'letter': question['id'],
+        'audio': {
+            'prompt': audio['prompts'][game_type],
+            'answer': answer_audio,
+            'words': [audio['words'].get(word) for word in entry['words']],
+        } if audio else None,
+    }
+
+
+def start(client, path, params, catalog_version, seed):
+    """固定随机种子请求一局，完整和精简两次请求得到同一局题目"""
+    random.seed(seed)
+    response = client.post(path, json={**params, 'catalog_version': catalog_version})
+    return response.get_data(), response.get_json()
+
+
+def bench(rounds):
+    client = app.test_client()
+    catalogs = {}
+    for kind in ('chinese', 'english'):
+        body = client.get(f'/api/catalog/{kind}').get_data()
+        catalogs[kind] = (body, client.get(f'/api/catalog/{kind}').get_json())
+
+    print(f"每种游戏 {rounds} 局，字节数为每局平均值")
+    print(f"{'游戏':<20}{'完整':>10}{'完整gzip':>10}{'精简':>10}{'精简gzip':>10}{'缩减':>8}{'回本局数':>10}")
+    print("-" * 78)
+    for name, path, params in GAMES:
+        kind = 'chinese' if name == 'chinese' else 'english'
+        catalog_body, catalog = catalogs[kind]
+        sizes = {'full': [], 'full_gz': [], 'compact': [], 'compact_gz': []}
+        for seed in range(rounds):
+            full_body, full = start(client, path, params, None, seed)
+            compact_body, compact = start(client, path, params, game_catalog.version, seed)
+            if full.get('compact') or not compact.get('compact'):
+                raise SystemExit(f"✗ {name}: 目录版本处理错误")
+            for full_question, question in zip(full['questions'], compact['questions']):
+                if name == 'chinese':
+                    expanded = expand_chinese(question, catalog)
+                    full_question = {k: v for k, v in full_question.items() if k != 'category'}
+                else:
+                    expanded = expand_english(question, catalog, name)
+                if expanded != full_question:
+                    raise SystemExit(f"✗ {name}: 精简题目无法还原\n{expanded}\n{full_question}")
+            sizes['full'].append(len(full_body))
+            sizes['full_gz'].append(len(gzip.compress(full_body)))
+            sizes['compact'].append(len(compact_body))
+            sizes['compact_gz'].append(len(gzip.compress(compact_body)))
+
+        mean = {key: statistics.mean(values) for key, values in sizes.items()}
+        saved_gz = mean['full_gz'] - mean['compact_gz']
+        break_even = len(gzip.compress(catalog_body)) / saved_gz if saved_gz > 0 else float('inf')
+        print(f"{name:<20}{mean['full']:>10.0f}{mean['full_gz']:>10.0f}{mean['compact']:>10.0f}"
+              f"{mean['compact_gz']:>10.0f}{1 - mean['compact_gz'] / mean['full_gz']:>8.0%}{break_even:>10.1f}")
+
+    print()
+    for kind, (body, _) in catalogs.items():
+        print(f"目录 {kind}: {len(body)} 字节，gzip {len(gzip.compress(body))} 字节（每个词库版本下载一次）")
+    print("\n✓ 所有精简题目均可由目录还原为完整题目")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比完整题目与精简题目的每局字节数')
+    parser.add_argument('--rounds', '-n', type=int, default=50, help='每种游戏的局数 (默认: 50)')
+    args = parser.parse_args()
+    bench(args.rounds)
+
+
+if __name__ == '__main__':
+    main()
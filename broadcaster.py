@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+排行榜实时推送
+每个进程只有一个后台线程查询排行榜，结果序列化一次后分发给所有订阅者（SSE连接），
+N个观看者只产生一次数据库读取。
+
+跨进程、跨节点通知：由存储后端的写入通知（storage.py，SQLite 轮询版本号 / PostgreSQL LISTEN）调用 notify()；
+本进程内的 save_score 也直接调用 notify() 立即唤醒线程。
+"""
+
+import json
+import queue
+import threading
+
+from app_logging import get_logger
+
+logger = get_logger('broadcaster')
+
+# 每个订阅者最多积压的消息数，超出时丢弃最旧的消息（客户端只关心最新榜单）
+SUBSCRIBER_BACKLOG = 4
+
+
+class LeaderboardBroadcaster:
+    """
+    排行榜变更广播器
+
+    Args:
+        loader: 排行榜查询函数，签名同 get_leaderboard(limit)
+        limit: 推送的排行榜长度
+        poll_interval: 没有写入通知时检查订阅者是否全部断开的间隔（秒）
+    """
+
+    def __init__(self, loader, limit=20, poll_interval=0.5):
+        self.loader = loader
+        self.limit = limit
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._message = None
+
+    def subscribe(self):
+        """注册订阅者，返回消息队列；已有榜单时立即放入当前榜单"""
+        subscriber = queue.Queue(SUBSCRIBER_BACKLOG)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._message is not None:
+                subscriber.put_nowait(self._message)
+            if self._thread is None:
+                self._snapshot = None
+                self._message = None
+                self._thread = threading.Thread(target=self._run, name='leaderboard-broadcaster', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def notify(self):
+        """成绩写入后调用（本进程写入或存储后端的写入通知），立即触发一次推送检查"""
+        if self._thread is not None:
+            self._wake.set()
+
+    def _run(self):
+        # 线程启动时先推送一次当前榜单
+        self._wake.set()
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            if self._wake.is_set():
+                self._wake.clear()
+                try:
+                    self._publish()
+                except Exception:
+                    logger.exception('排行榜推送失败')
+            self._wake.wait(self.poll_interval)
+
+    def _publish(self):
+        leaderboard = self.loader(self.limit)
+        previous = {self._entry_key(e): e['rank'] for e in self._snapshot or []}
+        if self._snapshot is not None and [self._entry_key(e) for e in leaderboard] == list(previous):
+            return
+
+        changes = []
+        for entry in leaderboard:
+            previous_rank = previous.get(self._entry_key(entry))
+            if previous_rank != entry['rank']:
+                changes.append({**entry, 'previous_rank': previous_rank})
+        self._snapshot = leaderboard
+        payload = json.dumps({'leaderboard': leaderboard, 'changes': changes}, ensure_ascii=False, separators=(',', ':'))
+        message = f'event: leaderboard\ndata: {payload}\n\n'
+
+        with self._lock:
+            self._message = message
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            offer(subscriber, message)
+
+    @staticmethod
+    def _entry_key(entry):
+        return (entry['nickname'], entry['score'], entry['total_time'], entry['play_timestamp'])
+
+
+def offer(subscriber, message):
+    """向订阅者队列放入消息；慢速客户端的队列已满时丢弃最旧的一条后放入最新消息"""
+    try:
+        subscriber.put_nowait(message)
+    except queue.Full:
+        try:
+            subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            subscriber.put_nowait(message)
+        except queue.Full:
+            pass
+
+
+def event_stream(broadcaster, heartbeat=15.0):
+    """SSE响应体生成器：转发广播消息，空闲时发送注释行保持连接"""
+    subscriber = broadcaster.subscribe()
+    try:
+        # 建议客户端断线后3秒重连
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                yield subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+    finally:
+        broadcaster.unsubscribe(subscriber)
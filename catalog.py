@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+题目目录与精简题目
+一局游戏的10道题都会重复携带拼音、释义、常用词、图片地址、提示语和语音地址，
+而这些内容只随词库版本变化。浏览器把题目目录（按汉字/字母索引的词条）缓存在localStorage中，
+开始游戏时带上目录版本 catalog_version：
+    版本与当前词库一致  -> 返回精简题目，只有汉字/字母、选项和常用词序号，由浏览器从目录还原
+    版本不一致或未提供  -> 返回完整题目（原有格式），浏览器随后按响应中的 catalogVersion 更新目录
+
+目录接口: /api/catalog/chinese 和 /api/catalog/english
+精简格式（compact 为 true）:
+    汉字  {'id': 汉字, 'options': [汉字, ...], 'words': [常用词在目录中的序号, ...]}
+    英语  {'id': 字母, 'options': [选项, ...], 'answer': 正确单词（仅单词匹配）}
+"""
+
+import threading
+
+from flask import current_app
+
+import wordbank
+
+KINDS = ('chinese', 'english')
+
+
+class Catalog:
+    """
+    题目目录，内容在词库版本内不变，首次请求时生成并缓存序列化后的字节
+    版本跟随词库，worker重新加载词库后按新版本重新生成
+
+    Args:
+        word_bank: 运行时词库
+    """
+
+    def __init__(self, word_bank):
+        self.word_bank = word_bank
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.word_bank.version
+
+    def chinese(self):
+        characters = {}
+        for name in self.word_bank.category_names:
+            for char in self.word_bank.get_category(name)['characters']:
+                characters[char['character']] = {
+                    'pinyin': char['pinyin'],
+                    'meaning': char['meaning'],
+                    'common_words': char.get('common_words', []),
+                    'image': self.word_bank.image_url(char),
+                    'audio': char.get('audio'),
+                }
+        return {'version': self.version, 'prompt': wordbank.CHINESE_PROMPT, 'characters': characters}
+
+    def english(self):
+        letters = {
+            letter['letter']: {
+                'lowercase': letter['lowercase'],
+                'pronunciation': letter['pronunciation'],
+                'phonetic': letter['phonetic'],
+                'words': letter['words'],
+                'description': letter['description'],
+                'image': self.word_bank.image_url(letter),
+                'audio': letter.get('audio'),
+            }
+            for letter in self.word_bank.letters
+        }
+        return {'version': self.version, 'prompts': wordbank.ENGLISH_PROMPTS, 'letters': letters}
+
+    def get_response_body(self, kind):
+        """返回目录的JSON字节（kind: chinese / english）"""
+        body = self._bodies.get((kind, self.version))
+        if body is None:
+            data = self.chinese() if kind == 'chinese' else self.english()
+            body = current_app.json.dumps(data).encode('utf-8')
+            with self._lock:
+                # 只保留当前版本的目录
+                self._bodies = {key: value for key, value in self._bodies.items() if key[1] == data['version']}
+                self._bodies[(kind, data['version'])] = body
+        return body
+
+    def accepts(self, catalog_version):
+        """浏览器缓存的目录与当前词库一致时才能使用精简题目"""
+        return bool(catalog_version) and catalog_version == self.version
+
+    def compact_game(self, game):
+        """把 build_game 的完整题目转为精简题目"""
+        questions = []
+        for question in game['questions']:
+            common_words = self.word_bank.get_character(question['correctAnswer']).get('common_words', [])
+            questions.append({
+                'id': question['correctAnswer'],
+                'options': question['options'],
+                'words': [common_words.index(word) for word in question['common_words']],
+            })
+        return {**game, 'questions': questions, 'compact': True, 'catalogVersion': self.version}
+
+    def compact_english_game(self, game):
+        """把 build_english_game 的完整题目转为精简题目"""
+        questions = []
+        for question in game['questions']:
+            compact = {'id': question['letter'], 'options': question['options']}
+            if game['gameType'] == 'word_matching':
+                compact['answer'] = question['correctAnswer']
+            questions.append(compact)
+        return {**game, 'questions': questions, 'compact': True, 'catalogVersion': self.version}
+
+    def respond(self, game, catalog_version, english=False):
+        """目录版本一致时返回精简题目，否则返回带当前版本的完整题目"""
+        if not self.accepts(catalog_version):
+            return {**game, 'catalogVersion': self.version}
+        return self.compact_english_game(game) if english else self.compact_game(game)
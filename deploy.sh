@@ -18,8 +18,14 @@ PROJECT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 VENV_DIR="$PROJECT_DIR/.venv"
 PID_FILE="$PROJECT_DIR/syword.pid"
 LOG_FILE="$PROJECT_DIR/syword.log"
+RELEASE_FILE="$PROJECT_DIR/.release"
 PORT=8083
 HOST="0.0.0.0"
+HEALTH_URL="http://127.0.0.1:$PORT/healthz"
+# 等待新版本通过健康检查的最长时间（秒）
+READY_TIMEOUT=60
+# 旧worker处理完进行中请求的最长时间（秒），与 gunicorn.conf.py 中的 graceful_timeout 一致
+GRACEFUL_TIMEOUT=30
 
 # 日志函数
 log_info() {
@@ -63,9 +69,21 @@ create_venv() {
 install_dependencies() {
     log_info "安装项目依赖..."
     uv pip install -r requirements.txt
+    # 使用PostgreSQL存储时还需要 psycopg
+    if [ -n "$DATABASE_URL" ]; then
+        uv pip install -r requirements-postgres.txt
+    fi
     log_info "依赖安装完成"
 }
 
+# 校验词库并生成词库文件（数据有问题时直接失败，不会停掉正在运行的服务）
+build_wordbank() {
+    log_info "校验并构建词库..."
+    uv run python wordbank.py
+    log_info "生成静态文件预压缩版本..."
+    uv run python static_files.py
+}
+
 # 检查服务是否运行
 is_running() {
     if [ -f "$PID_FILE" ]; then
@@ -80,7 +98,41 @@ is_running() {
     return 1
 }
 
-# 启动服务
+# 写入本次发布的版本号（git提交 + 时间），健康检查返回该版本说明新代码已经接管
+write_release() {
+    local rev
+    rev=$(git -C "$PROJECT_DIR" rev-parse --short HEAD 2>/dev/null || echo "local")
+    RELEASE="${rev}-$(date +%s)"
+    echo "$RELEASE" > "$RELEASE_FILE"
+}
+
+# 等待 /healthz 返回200且发布版本为 $1
+wait_ready() {
+    local expected=$1
+    local deadline=$((SECONDS + READY_TIMEOUT))
+    while [ $SECONDS -lt $deadline ]; do
+        if curl -fsS --max-time 2 "$HEALTH_URL" 2>/dev/null | grep -q "\"release\":\"$expected\""; then
+            return 0
+        fi
+        sleep 1
+    done
+    return 1
+}
+
+# 等待进程 $1 退出，最多 $2 秒
+wait_exit() {
+    local pid=$1
+    local deadline=$((SECONDS + $2))
+    while [ $SECONDS -lt $deadline ]; do
+        if ! ps -p "$pid" > /dev/null 2>&1; then
+            return 0
+        fi
+        sleep 1
+    done
+    return 1
+}
+
+# 启动服务（gunicorn，配置见 gunicorn.conf.py，主进程PID由gunicorn写入PID文件）
 start_service() {
     if is_running; then
         log_warn "服务已在运行中 (PID: $(cat $PID_FILE))"
@@ -88,19 +140,17 @@ start_service() {
     fi
     
     log_info "启动 $PROJECT_NAME 服务..."
+    write_release
     
-    # 激活虚拟环境并启动应用
     export PORT=$PORT
-    nohup uv run python app.py > "$LOG_FILE" 2>&1 &
-    local pid=$!
-    echo $pid > "$PID_FILE"
+    export HOST=$HOST
+    nohup uv run gunicorn -c gunicorn.conf.py > "$LOG_FILE" 2>&1 &
     
-    # 等待服务启动
-    sleep 2
-    
-    if is_running; then
+    # 等待预热完成并通过健康检查
+    if wait_ready "$RELEASE"; then
         log_info "服务启动成功!"
-        log_info "PID: $pid"
+        log_info "PID: $(cat $PID_FILE)"
+        log_info "版本: $RELEASE"
         log_info "端口: $PORT"
         log_info "访问地址: http://$HOST:$PORT"
         log_info "日志文件: $LOG_FILE"
@@ -110,7 +160,7 @@ start_service() {
     fi
 }
 
-# 停止服务
+# 停止服务（TERM：gunicorn等待进行中的请求完成后退出）
 stop_service() {
     if ! is_running; then
         log_warn "服务未运行"
@@ -120,22 +170,70 @@ stop_service() {
     local pid=$(cat "$PID_FILE")
     log_info "停止服务 (PID: $pid)..."
     
-    kill "$pid"
-    rm -f "$PID_FILE"
+    kill -TERM "$pid"
     
-    # 等待进程完全停止
-    sleep 2
-    
-    if ! is_running; then
+    if wait_exit "$pid" $((GRACEFUL_TIMEOUT + 5)); then
         log_info "服务已停止"
     else
         log_warn "服务可能仍在运行，尝试强制停止..."
         kill -9 "$pid" 2>/dev/null || true
-        rm -f "$PID_FILE"
     fi
+    rm -f "$PID_FILE"
 }
 
-# 重启服务
+# 平滑重启（零停机）：
+# USR2 让gunicorn重新执行自身，新主进程继承监听socket、预热并启动新worker；
+# 健康检查返回新版本后再让旧主进程优雅退出，新版本启动失败时旧版本继续服务
+reload_service() {
+    if ! is_running; then
+        start_service
+        return
+    fi
+    
+    local old_pid=$(cat "$PID_FILE")
+    if ! ps -p "$old_pid" -o args= | grep -q gunicorn; then
+        log_warn "当前服务不是由gunicorn启动的，执行一次普通重启"
+        stop_service
+        start_service
+        return
+    fi
+    
+    write_release
+    log_info "平滑重启: 主进程 (PID: $old_pid) 启动新版本 $RELEASE ..."
+    kill -USR2 "$old_pid"
+    
+    # 新主进程的PID写在 $PID_FILE.2 中，旧主进程退出后由gunicorn改名为 $PID_FILE
+    if ! wait_ready "$RELEASE"; then
+        log_error "新版本未在 ${READY_TIMEOUT} 秒内通过健康检查，旧版本继续服务，请检查日志: $LOG_FILE"
+        local new_pid=$(cat "$PID_FILE.2" 2>/dev/null)
+        if [ -n "$new_pid" ]; then
+            kill -TERM "$new_pid" 2>/dev/null || true
+            wait_exit "$new_pid" $((GRACEFUL_TIMEOUT + 5)) || kill -9 "$new_pid" 2>/dev/null || true
+        fi
+        echo "$old_pid" > "$PID_FILE"
+        rm -f "$PID_FILE.2"
+        exit 1
+    fi
+    
+    local new_pid=$(cat "$PID_FILE.2" 2>/dev/null)
+    log_info "新版本已就绪 (PID: $new_pid)，等待旧worker处理完进行中的请求..."
+    kill -TERM "$old_pid"
+    if ! wait_exit "$old_pid" $((GRACEFUL_TIMEOUT + 5)); then
+        log_warn "旧主进程未按时退出，强制停止"
+        kill -9 "$old_pid" 2>/dev/null || true
+    fi
+    # 等待新主进程接管PID文件
+    local deadline=$((SECONDS + 10))
+    while [ -f "$PID_FILE.2" ] && [ $SECONDS -lt $deadline ]; do
+        sleep 1
+    done
+    if [ -f "$PID_FILE.2" ]; then
+        mv "$PID_FILE.2" "$PID_FILE"
+    fi
+    log_info "平滑重启完成 (PID: $(cat $PID_FILE))"
+}
+
+# 重启服务（先停止再启动，有短暂的停机）
 restart_service() {
     log_info "重启服务..."
     stop_service
@@ -148,6 +246,7 @@ status_service() {
     if is_running; then
         local pid=$(cat "$PID_FILE")
         log_info "服务正在运行 (PID: $pid)"
+        [ -f "$RELEASE_FILE" ] && log_info "版本: $(cat $RELEASE_FILE)"
         log_info "端口: $PORT"
         log_info "访问地址: http://$HOST:$PORT"
         
@@ -181,7 +280,8 @@ show_help() {
     echo "命令:"
     echo "  start     启动服务"
     echo "  stop      停止服务"
-    echo "  restart   重启服务"
+    echo "  restart   平滑重启 (零停机，新版本通过健康检查后替换旧版本)"
+    echo "  cold-restart  停止后重新启动 (有短暂停机)"
     echo "  status    查看服务状态"
     echo "  logs      查看实时日志"
     echo "  deploy    完整部署 (创建环境 + 安装依赖 + 启动服务)"
@@ -200,6 +300,7 @@ deploy() {
     check_uv
     create_venv
     install_dependencies
+    build_wordbank
     start_service
     log_info "部署完成!"
 }
@@ -212,13 +313,22 @@ main() {
         "start")
             check_uv
             install_dependencies
+            build_wordbank
             start_service
             ;;
         "stop")
             stop_service
             ;;
-        "restart")
+        "restart"|"reload")
             check_uv
+            install_dependencies
+            build_wordbank
+            reload_service
+            ;;
+        "cold-restart")
+            check_uv
+            install_dependencies
+            build_wordbank
             restart_service
             ;;
         "status")
@@ -13,6 +13,7 @@ import time
 from urllib.parse import quote
 from pathlib import Path
 from config import PIXABAY_API_KEY, IMAGES_DIR, REQUEST_DELAY
+import image_dedup
 
 class ImageDownloader:
     def __init__(self, json_file_path, images_dir=None):
@@ -27,6 +28,9 @@ class ImageDownloader:
         self.images_dir = Path(images_dir or IMAGES_DIR)
         self.images_dir.mkdir(exist_ok=True)
         
+        # 图片哈希索引，用于检查新下载的图片是否与已有图片重复
+        self.image_index = image_dedup.open_index(os.path.dirname(json_file_path) or '.', str(self.images_dir))
+        
         # Pixabay API配置
         self.pixabay_api_key = PIXABAY_API_KEY
         self.pixabay_base_url = "https://pixabay.com/api/"
@@ -172,6 +176,13 @@ class ImageDownloader:
                 f.write(response.content)
             
             print(f"下载成功: {character} -> {filename}")
+            
+            # 与已有图片相同或近似时提示：看图选字时孩子无法区分
+            result = self.image_index.check(str(filepath))
+            for other in result['duplicates']:
+                print(f"⚠️  与已有图片内容相同: {other}")
+            for other, d in result['similar']:
+                print(f"⚠️  与已有图片近似 (距离 {d}): {other}")
             return filename
             
         except Exception as e:
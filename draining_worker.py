@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+平滑重启用的 gunicorn worker（gunicorn.conf.py 中的 worker_class）
+
+DrainingUvicornWorker（默认）: 在事件循环中运行 asgi:application，SSE长连接只占用一个asyncio队列，
+    不占线程，一个教室的几十个推送连接不会挤掉其他接口；其余路由由 asgi.py 转交线程池中的Flask处理。
+DrainingThreadWorker: 纯WSGI（gthread）模式，SSE长连接各占一个线程，
+    gunicorn -c gunicorn.conf.py -k draining_worker.DrainingThreadWorker app:app
+
+两种worker收到 TERM 后都不会直接关闭已经 accept 但请求数据还没读到的连接（否则平滑重启时总有少量请求失败）：
+先停止接受新连接（新连接由新worker接受），等这些连接的请求都开始处理后（最多 DRAIN_SECONDS 秒）再退出，
+之后仍按原逻辑等待进行中的请求。ASGI模式下同时结束SSE推送，客户端按 retry 间隔重连到新worker。
+"""
+
+import asyncio
+import sys
+import time
+import warnings
+
+from gunicorn.arbiter import Arbiter
+from gunicorn.workers.gthread import ThreadWorker
+
+with warnings.catch_warnings():
+    # uvicorn 0.30 起提示改用独立的 uvicorn-worker 包，接口相同
+    warnings.simplefilter('ignore', DeprecationWarning)
+    from uvicorn.main import Server
+    from uvicorn.workers import UvicornWorker
+
+# worker 收到 TERM 后等待已接受的连接发来请求的最长时间（秒）
+DRAIN_SECONDS = 2.0
+
+
+class DrainingThreadWorker(ThreadWorker):
+
+    _drain_deadline = None
+
+    def handle_exit(self, sig, frame):
+        # 信号处理函数中不操作事件循环，由主循环每轮调用的 notify 完成
+        if self._drain_deadline is None:
+            self._drain_deadline = time.monotonic() + DRAIN_SECONDS
+
+    def notify(self):
+        super().notify()
+        if self._drain_deadline is None:
+            return
+        with self._lock:
+            for sock in self.sockets:
+                try:
+                    self.poller.unregister(sock)
+                except (KeyError, ValueError):
+                    pass
+            # 事件循环中除空闲的keep-alive连接外，剩下的都是还没读到请求的新连接
+            pending = len(self.poller.get_map()) - len(self._keep)
+        if pending <= 0 or time.monotonic() >= self._drain_deadline:
+            self.alive = False
+
+
+class DrainingServer(Server):
+    """uvicorn服务器：退出前先停止接受连接、等待已接受的连接发来请求，并通知应用结束SSE推送"""
+
+    def __init__(self, config, application):
+        super().__init__(config)
+        self.application = application
+
+    async def shutdown(self, sockets=None):
+        for server in self.servers:
+            server.close()
+        deadline = time.monotonic() + DRAIN_SECONDS
+        # 还没读到任何请求的连接 cycle 为空；空闲的keep-alive连接由 uvicorn 照常关闭
+        while (any(connection.cycle is None for connection in self.server_state.connections)
+               and time.monotonic() < deadline):
+            await asyncio.sleep(0.05)
+        drain = getattr(self.application, 'drain', None)
+        if drain is not None:
+            drain()
+        await super().shutdown(sockets)
+        # uvicorn 退出时会重新发出收到的 TERM，gunicorn 下的默认处理会让已经正常退出的worker被信号杀死
+        self._captured_signals.clear()
+
+
+class DrainingUvicornWorker(UvicornWorker):
+    # 预热和后台任务由 gunicorn.conf.py 的钩子完成，不再通过ASGI lifespan 在每个worker中重复执行
+    CONFIG_KWARGS = {'loop': 'auto', 'http': 'auto', 'lifespan': 'off'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = self.cfg.graceful_timeout
+
+    async def _serve(self):
+        self.config.app = self.wsgi
+        server = DrainingServer(self.config, self.wsgi)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
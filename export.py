@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+成绩和反馈的批量导出（CSV / NDJSON）
+数据库按批读取（storage.iter_scores / iter_feedback），每批编码后立即压缩并发送给客户端：
+整个导出过程中内存里只有一批行和压缩器的窗口，与表的大小无关。
+客户端接受gzip时边生成边压缩（Content-Encoding: gzip，浏览器下载后自动解压）。
+
+接口:
+    GET /api/export/scores?format=csv&start=2026-09-01&end=2026-09-30
+        start / end: 日期（服务器本地时间，end 当天包含在内）或UNIX时间戳（end 不包含）
+    GET /api/export/feedback?format=ndjson
+导出内容包含所有玩家的昵称，请求需带管理令牌: Authorization: Bearer <ADMIN_TOKEN>
+    未带令牌返回401，令牌错误或服务器未设置 ADMIN_TOKEN（导出关闭）时返回403
+
+环境变量:
+    ADMIN_TOKEN: 管理令牌，默认不设置
+"""
+
+import csv
+import hmac
+import io
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# 导出接口的管理令牌，未设置时不接受任何导出请求
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# 单元格以这些字符开头时会被表格软件当作公式执行，导出时加单引号前缀（昵称由用户输入）
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def bearer_token(authorization):
+    """从 Authorization 头中取出 Bearer 令牌，没有时返回None"""
+    scheme, _, token = (authorization or '').partition(' ')
+    return (token.strip() or None) if scheme.lower() == 'bearer' else None
+
+
+def check_token(token, expected=None):
+    """令牌与 ADMIN_TOKEN 一致时返回True（常数时间比较）；未设置 ADMIN_TOKEN 时总是False"""
+    expected = ADMIN_TOKEN if expected is None else expected
+    return bool(expected) and isinstance(token, str) and hmac.compare_digest(token, expected)
+
+
+def parse_time(value, end=False):
+    """
+    解析时间范围参数：UNIX时间戳或 YYYY-MM-DD 日期
+
+    Args:
+        end: 作为结束时间时，日期表示包含当天（返回次日零点）
+    Returns:
+        int: UNIX时间戳，参数为空时返回None
+    Raises:
+        ValueError: 格式无效
+    """
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    day = datetime.strptime(value, '%Y-%m-%d')
+    if end:
+        day += timedelta(days=1)
+    return int(day.timestamp())
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def encode_csv(columns, batches):
+    """CSV编码：表头和每批行各产出一段字节"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # UTF-8 BOM：Excel据此识别编码，中文昵称不会乱码
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def encode_ndjson(columns, batches):
+    """NDJSON编码：每行一个JSON对象，每批产出一段字节"""
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False, separators=(',', ':')) + '\n'
+                      for row in batch).encode('utf-8')
+
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+
+def counted(batches, counter):
+    """统计导出的行数，counter 为每批调用一次的函数"""
+    for batch in batches:
+        counter(len(batch))
+        yield batch
+
+
+def gzip_stream(chunks, level=6):
+    """流式gzip压缩：压缩器只保留滑动窗口，每段输入的压缩结果立即产出"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
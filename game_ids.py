@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+游戏ID的签发和校验
+/api/game/start 签发的游戏ID带HMAC签名，提交成绩时只接受本服务签发的ID，
+其他ID（如迁移旧数据时分配的 legacy-<id>）一律拒绝，客户端无法猜出或伪造其他玩家的游戏ID。
+同一ID只能写入一条成绩（成绩表以 game_id 为唯一键），再次提交不会修改已有成绩。
+
+格式: 32位十六进制随机数 + 16位十六进制签名（HMAC-SHA256的前8字节）
+
+密钥:
+    GAME_ID_SECRET: 签名密钥；多个节点共享排行榜时必须设置为相同的值
+    未设置时使用 GAME_ID_SECRET_FILE（默认 .game_id_secret）中保存的密钥，文件不存在时生成，
+    重启和平滑重启后签发过的ID仍然有效
+"""
+
+import hashlib
+import hmac
+import os
+import re
+import secrets
+
+_NONCE_HEX = 32
+_SIGNATURE_HEX = 16
+_PATTERN = re.compile(rf'^[0-9a-f]{{{_NONCE_HEX + _SIGNATURE_HEX}}}$')
+
+
+class GameIdSigner:
+    """签发和校验游戏ID"""
+
+    def __init__(self, secret):
+        self._key = secret.encode('utf-8') if isinstance(secret, str) else secret
+
+    def _signature(self, nonce):
+        return hmac.new(self._key, nonce.encode('ascii'), hashlib.sha256).hexdigest()[:_SIGNATURE_HEX]
+
+    def issue(self):
+        """签发一个新的游戏ID"""
+        nonce = secrets.token_hex(_NONCE_HEX // 2)
+        return nonce + self._signature(nonce)
+
+    def verify(self, game_id):
+        """是否为本服务签发的游戏ID"""
+        if not isinstance(game_id, str) or not _PATTERN.match(game_id):
+            return False
+        nonce, signature = game_id[:_NONCE_HEX], game_id[_NONCE_HEX:]
+        return hmac.compare_digest(signature, self._signature(nonce))
+
+
+def load_secret(path):
+    """读取保存的密钥，不存在时生成（只有所有者可读）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    secret = secrets.token_hex(32)
+    # 先写入临时文件再硬链接到目标路径：其他进程要么读不到文件，要么读到完整的密钥
+    tmp = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(secret)
+    try:
+        os.link(tmp, path)
+    except FileExistsError:
+        # 其他进程同时生成了密钥，以先写入的为准
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    finally:
+        os.remove(tmp)
+    return secret
+
+
+def init_signer():
+    """按环境变量创建签名器"""
+    secret = os.getenv('GAME_ID_SECRET') or load_secret(os.getenv('GAME_ID_SECRET_FILE', '.game_id_secret'))
+    return GameIdSigner(secret)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置（deploy.sh 使用）: gunicorn -c gunicorn.conf.py
+
+worker 在事件循环中运行 asgi:application（见 asgi.py、draining_worker.py）：排行榜和课堂房间的SSE推送
+不占用线程，大量推送连接不影响其他接口；其余路由在 ASGI_WSGI_THREADS 个线程中交给Flask处理。
+
+平滑重启（零停机部署）:
+    主进程预加载应用并完成预热（建表迁移、词库分片、题目目录、每日挑战），worker fork后直接共享。
+    deploy.sh 向主进程发送 USR2：gunicorn 重新执行自身，新的主进程继承同一个监听socket
+    （不存在端口关闭的窗口），加载新代码、预热并启动新的worker；/healthz 返回新的发布版本后
+    deploy.sh 再向旧主进程发送 TERM，旧worker处理完正在进行的请求后退出。
+
+环境变量:
+    HOST / PORT: 监听地址，默认 0.0.0.0:8083
+    GUNICORN_WORKERS: worker进程数，默认 1
+        课堂房间保存在进程内存中，多个worker时需要按房间号的粘性路由；
+        多worker部署时同时设置 METRICS_DIR 和 RATE_LIMIT_DB 以汇总指标、共享限流状态
+    DATABASE_URL: 多个节点共享排行榜和反馈时使用的PostgreSQL连接串（见 storage.py），默认使用本机 leaderboard.db
+    GAME_ID_SECRET: 游戏ID的签名密钥（见 game_ids.py），多个节点共享排行榜时必须相同，默认保存在 .game_id_secret
+    ADMIN_TOKEN: 成绩和反馈导出接口的管理令牌（见 export.py），不设置时导出关闭
+    ASGI_WSGI_THREADS: 每个worker中处理Flask路由的线程数，默认 32（SSE推送不占用）
+    GUNICORN_GRACEFUL_TIMEOUT: 旧worker等待进行中请求完成的最长时间（秒），默认 30
+"""
+
+import os
+
+import image_replacer
+import maintenance
+import metrics
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8083')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+wsgi_app = 'asgi:application'
+# 收到 TERM 后先取走已接受的连接、结束SSE推送再退出，见 draining_worker.py
+worker_class = 'draining_worker.DrainingUvicornWorker'
+
+# 预加载：应用在主进程中导入一次，USR2 重新执行时新的主进程加载新代码
+preload_app = True
+pidfile = 'syword.pid'
+
+# 排行榜SSE是长连接：超时只针对卡住的worker，优雅退出时最多等待 graceful_timeout
+timeout = 60
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+accesslog = None
+errorlog = '-'
+
+
+def on_starting(server):
+    """主进程启动时预热（在fork worker之前，只执行一次）"""
+    from app import warmup
+    warmup()
+
+
+def post_fork(server, worker):
+    """每个worker启动后台任务；多个worker之间通过数据库中的运行记录保证只有一个真正执行"""
+    from app import answer_writer, storage, word_bank
+    # 主进程预热时记录的请求数、缓存命中等不计入worker，否则每个worker都会重复上报一份
+    metrics.registry.reset()
+    maintenance.start_scheduler('leaderboard.db')
+    image_replacer.start_worker('leaderboard.db')
+    # 每个worker各自接收其他进程、其他节点的成绩写入通知
+    storage.start_watcher()
+    # 答题事件的写入线程同时负责定期汇总，不等到本worker收到第一次答题提交
+    answer_writer.start()
+    # 图片替换等重新生成词库后，各worker自行切换到新索引
+    word_bank.start_watcher()
+
+
+def child_exit(server, worker):
+    """worker退出后（主进程中）把它的指标并入汇总文件，METRICS_DIR 中不积累已退出进程的文件"""
+    metrics.registry.mark_process_dead(worker.pid)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片去重
+为 static/images 下的所有图片计算内容哈希（sha256）和感知哈希（64位dHash），保存在 data/image_index.json：
+- 内容完全相同的图片只保留一份，词库中的 image_file 都指向保留的文件；
+  backup 目录中与现有图片完全相同的备份直接删除
+- 感知哈希接近（汉明距离不超过 NEAR_DISTANCE）的图片标记为近似重复：
+  看图选字时两个选项的图片几乎一样会让孩子困惑，构建词库时记录这些汉字，出题时不会同时作为选项
+
+索引是增量的：文件大小和修改时间不变时直接使用已保存的哈希；
+内容哈希按值索引，感知哈希按8个8位分段建立桶（距离不超过7的两个哈希至少有一段完全相同），
+检查一张新图片只需查找固定数量的桶，不需要与所有图片比较。
+
+用法:
+    python image_dedup.py                     # 报告完全相同和近似重复的图片
+    python image_dedup.py --apply             # 合并完全相同的图片并更新词库源数据
+    python image_dedup.py --check 新图片.jpg   # 检查一张图片是否与已有图片重复
+
+依赖: Pillow（未安装时只计算内容哈希）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+INDEX_FILE = 'image_index.json'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+# 近似重复的最大汉明距离（64位dHash）
+NEAR_DISTANCE = 6
+
+# 感知哈希分为8段，每段8位
+_BANDS = 8
+
+
+def dhash(path):
+    """64位差值哈希：缩放为9x8灰度图，比较每行相邻像素的明暗；无法计算时返回None"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as img:
+            pixels = list(img.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except OSError:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f'{value:016x}'
+
+
+def distance(a, b):
+    """两个dHash的汉明距离"""
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def _bands(value):
+    number = int(value, 16)
+    return [(i, (number >> (8 * i)) & 0xff) for i in range(_BANDS)]
+
+
+class ImageIndex:
+    """
+    图片哈希索引
+
+    Args:
+        image_dir: 图片根目录，索引中的路径相对于该目录
+        path: 索引文件路径
+    """
+
+    def __init__(self, image_dir, path):
+        self.image_dir = image_dir
+        self.path = path
+        self.images = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.images = json.load(f).get('images', {})
+        self._changed = False
+        self._rebuild_lookup()
+
+    def _rebuild_lookup(self):
+        self.by_content = {}
+        self.buckets = {}
+        for relative, info in sorted(self.images.items()):
+            self._add_lookup(relative, info)
+
+    def _add_lookup(self, relative, info):
+        self.by_content.setdefault(info['sha256'], []).append(relative)
+        if info.get('dhash'):
+            for band in _bands(info['dhash']):
+                self.buckets.setdefault(band, set()).add(relative)
+
+    @staticmethod
+    def hash_file(path):
+        with open(path, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        return {'sha256': sha256, 'dhash': dhash(path)}
+
+    def refresh(self):
+        """扫描图片目录，只为新增或变化的文件计算哈希；返回重新计算的文件数"""
+        seen = set()
+        hashed = 0
+        for root, _, files in os.walk(self.image_dir):
+            for name in files:
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.image_dir).replace(os.sep, '/')
+                seen.add(relative)
+                stat = os.stat(path)
+                info = self.images.get(relative)
+                if info and info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns:
+                    continue
+                self.images[relative] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, **self.hash_file(path)}
+                hashed += 1
+        removed = set(self.images) - seen
+        for relative in removed:
+            del self.images[relative]
+        if hashed or removed:
+            self._changed = True
+            self._rebuild_lookup()
+        return hashed
+
+    def save(self):
+        if not self._changed:
+            return
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'images': self.images}, f, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self._changed = False
+
+    def similar(self, info, exclude=None, max_distance=NEAR_DISTANCE):
+        """与给定哈希近似的图片 [(相对路径, 距离)]，只查找共享分段的桶"""
+        if not info.get('dhash'):
+            return []
+        candidates = set()
+        for band in _bands(info['dhash']):
+            candidates.update(self.buckets.get(band, ()))
+        matches = []
+        for relative in candidates:
+            if relative == exclude:
+                continue
+            d = distance(info['dhash'], self.images[relative]['dhash'])
+            if d <= max_distance:
+                matches.append((relative, d))
+        return sorted(matches, key=lambda item: (item[1], item[0]))
+
+    def check(self, path):
+        """
+        检查一张图片（可以不在索引中）
+
+        Returns:
+            dict: {'duplicates': [内容相同的图片], 'similar': [(近似图片, 距离)]}
+        """
+        info = self.hash_file(path)
+        relative = os.path.relpath(path, self.image_dir).replace(os.sep, '/')
+        duplicates = [other for other in self.by_content.get(info['sha256'], []) if other != relative]
+        similar = [(other, d) for other, d in self.similar(info, exclude=relative) if other not in duplicates]
+        return {'duplicates': duplicates, 'similar': similar}
+
+
+def open_index(data_dir, image_dir):
+    """打开并增量更新图片索引"""
+    index = ImageIndex(image_dir, os.path.join(data_dir, INDEX_FILE))
+    index.refresh()
+    index.save()
+    return index
+
+
+def similar_groups(index, owners, max_distance=NEAR_DISTANCE):
+    """
+    图片完全相同或近似的词条
+
+    Args:
+        owners: [(词条, 图片相对路径)]
+    Returns:
+        dict: 词条 -> 图片与其近似的其他词条列表
+    """
+    by_image = {}
+    for owner, relative in owners:
+        by_image.setdefault(relative, []).append(owner)
+    result = {}
+
+    def link(a, b):
+        if a != b:
+            result.setdefault(a, set()).add(b)
+            result.setdefault(b, set()).add(a)
+
+    for relative, group in by_image.items():
+        info = index.images.get(relative)
+        if info is None:
+            continue
+        others = [other for other in index.by_content.get(info['sha256'], []) if other != relative]
+        others += [other for other, _ in index.similar(info, exclude=relative, max_distance=max_distance)]
+        for a in group:
+            for b in group:
+                link(a, b)
+            for other in others:
+                for b in by_image.get(other, ()):
+                    link(a, b)
+    return {owner: sorted(others) for owner, others in sorted(result.items())}
+
+
+def _load_sources(data_dir):
+    paths = {
+        'chinese': os.path.join(data_dir, 'characters.json'),
+        'english': os.path.join(data_dir, 'english_alphabet.json'),
+    }
+    sources = {}
+    for kind, path in paths.items():
+        with open(path, 'r', encoding='utf-8') as f:
+            sources[kind] = json.load(f)
+    return paths, sources
+
+
+def _entries(sources):
+    """所有带图片的词条 (名称, 图片相对路径, 词条数据)"""
+    for cat in sources['chinese'].get('basicChineseCharactersForKids', []):
+        for char in cat.get('characters', []):
+            if char.get('image_file'):
+                yield char['character'], char['image_file'], char
+    for letter in sources['english'].get('englishAlphabet', []):
+        if letter.get('image_file'):
+            yield letter['letter'], f"english/{letter['image_file']}", letter
+
+
+def dedupe(data_dir='data', image_dir='static/images', apply=False):
+    """
+    合并内容完全相同的图片
+
+    同一目录中内容相同的图片保留第一个被引用的文件，其他词条的 image_file 改为指向它，
+    不再被引用的重复文件删除；backup 中与现有图片内容相同的备份删除。
+
+    Returns:
+        dict: {'merged': [(词条, 原文件, 保留的文件)], 'removed': [删除的文件], 'saved_bytes': 节省的字节数}
+    """
+    index = open_index(data_dir, image_dir)
+    paths, sources = _load_sources(data_dir)
+    entries = list(_entries(sources))
+    referenced = {relative for _, relative, _ in entries}
+
+    canonical = {}  # (目录, sha256) -> 保留的文件
+    merged = []
+    for name, relative, entry in entries:
+        info = index.images.get(relative)
+        if info is None:
+            continue
+        key = (os.path.dirname(relative), info['sha256'])
+        keep = canonical.setdefault(key, relative)
+        if keep != relative:
+            merged.append((name, relative, keep))
+            if apply:
+                entry['image_file'] = os.path.basename(keep)
+
+    still_referenced = referenced - {relative for _, relative, _ in merged} | {keep for _, _, keep in merged}
+    live = {info['sha256'] for relative, info in index.images.items() if relative in still_referenced}
+    removed = []
+    for relative, info in sorted(index.images.items()):
+        if relative in still_referenced:
+            continue
+        is_backup = '/backup/' in f'/{relative}'
+        if (relative in referenced or is_backup) and info['sha256'] in live:
+            removed.append(relative)
+    saved = sum(index.images[relative]['size'] for relative in removed)
+
+    if apply:
+        if merged:
+            for kind, path in paths.items():
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(sources[kind], f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, path)
+        for relative in removed:
+            os.remove(os.path.join(image_dir, relative))
+        index.refresh()
+        index.save()
+    return {'merged': merged, 'removed': removed, 'saved_bytes': saved}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='图片去重：合并完全相同的图片，报告近似重复的图片')
+    parser.add_argument('--data-dir', default='data', help='源数据目录 (默认: data)')
+    parser.add_argument('--image-dir', default='static/images', help='图片目录 (默认: static/images)')
+    parser.add_argument('--apply', action='store_true', help='合并完全相同的图片并更新源数据')
+    parser.add_argument('--check', metavar='FILE', help='检查一张图片是否与已有图片重复')
+    parser.add_argument('--distance', type=int, default=NEAR_DISTANCE,
+                        help=f'近似重复的最大汉明距离 (默认: {NEAR_DISTANCE})')
+    args = parser.parse_args()
+
+    if Image is None:
+        print('未安装Pillow，只检查内容完全相同的图片', file=sys.stderr)
+
+    if args.check:
+        index = open_index(args.data_dir, args.image_dir)
+        result = index.check(args.check)
+        for other in result['duplicates']:
+            print(f'内容相同: {other}')
+        for other, d in result['similar']:
+            print(f'近似 (距离 {d}): {other}')
+        sys.exit(1 if result['duplicates'] or result['similar'] else 0)
+
+    report = dedupe(args.data_dir, args.image_dir, apply=args.apply)
+    for name, relative, keep in report['merged']:
+        print(f'{name}: {relative} -> {keep}')
+    for relative in report['removed']:
+        print(f'{"删除" if args.apply else "可删除"}: {relative}')
+
+    index = open_index(args.data_dir, args.image_dir)
+    _, sources = _load_sources(args.data_dir)
+    groups = similar_groups(index, [(name, relative) for name, relative, _ in _entries(sources)], args.distance)
+    for owner, others in groups.items():
+        print(f'近似图片: {owner} ~ {" ".join(others)}')
+
+    print(f"\n合并: {len(report['merged'])} 个词条，{'删除' if args.apply else '可删除'}: {len(report['removed'])} 个文件"
+          f"（{report['saved_bytes'] / 1024:.1f}KB），近似图片的词条: {len(groups)} 个")
+    if report['merged'] and not args.apply:
+        print('使用 --apply 合并，然后重新构建词库: python wordbank.py')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+反馈触发的图片替换
+后台定期读取反馈统计（feedback 表），某张图片的"图片不合适"反馈达到阈值时，
+用下载时相同的关键词重新搜索Pixabay，取排名下一位的结果（原图是第1位，每替换一次往后一位），
+下载后用 compress_image 压缩为JPEG，按内容命名另存为新文件（<名称>-<内容哈希>.jpg），
+源数据中该词条改用新文件，原文件保留不动。
+随后重新构建词库：新图片是新的文件和地址，浏览器不会继续使用长期缓存的旧图；
+各worker检测到词库索引变化后重新加载（见 wordbank.WordBank.start_watcher），在此之前继续使用原文件。
+
+替换记录保存在 image_replacements 表，已处理的反馈计数清零（处理期间新增的反馈保留）。
+所有网络请求都在后台线程或命令行中进行并按 REQUEST_DELAY 限速，不在请求路径中。
+
+用法:
+    python image_replacer.py                   # 处理一轮后退出
+    python image_replacer.py --dry-run         # 只列出达到阈值的图片
+或设置 IMAGE_REPLACE_INTERVAL_MINUTES 在应用中后台运行（多个worker只会有一个实际执行）
+
+环境变量:
+    PIXABAY_API_KEY: Pixabay API密钥，未设置时读取 config.py
+    IMAGE_FEEDBACK_THRESHOLD: 触发替换的反馈数，默认 3
+    IMAGE_REPLACE_INTERVAL_MINUTES: 后台运行间隔（分钟），未设置时不启动
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+
+from app_logging import get_logger, fields
+from compress_images import compress_image
+import maintenance
+import wordbank
+
+logger = get_logger('image_replacer')
+
+PIXABAY_URL = 'https://pixabay.com/api/'
+
+# 搜索返回的结果数，与 download_images.py 相同；替换次数用完后不再处理该图片
+SEARCH_RESULTS = 5
+
+# 每轮最多替换的图片数
+MAX_PER_RUN = 5
+
+# 网络请求间隔（秒），与 download_images.py 的 REQUEST_DELAY 相同
+REQUEST_DELAY = 2
+
+# 替换后的文件名中内容哈希的长度；再次替换时去掉旧的哈希后缀
+HASH_LENGTH = 10
+_HASH_SUFFIX = re.compile(rf'-[0-9a-f]{{{HASH_LENGTH}}}$')
+
+
+def _api_key():
+    key = os.getenv('PIXABAY_API_KEY')
+    if key:
+        return key
+    try:
+        from config import PIXABAY_API_KEY
+    except ImportError:
+        return None
+    return PIXABAY_API_KEY if PIXABAY_API_KEY != 'YOUR_PIXABAY_API_KEY' else None
+
+
+class PixabaySearcher:
+    """
+    Pixabay图片搜索，参数与 download_images.py 一致
+
+    Args:
+        api_key: API密钥
+    """
+
+    def __init__(self, api_key, base_url=PIXABAY_URL):
+        self.api_key = api_key
+        self.base_url = base_url
+
+    def search(self, keyword, english=False):
+        """返回按排名排列的图片地址列表"""
+        params = {
+            'key': self.api_key,
+            'q': keyword,
+            'image_type': 'photo',
+            'orientation': 'horizontal',
+            'safesearch': 'true',
+            'per_page': SEARCH_RESULTS,
+            'min_width': 640,
+            'min_height': 480,
+        }
+        if english:
+            params['category'] = 'animals,backgrounds,people'
+        response = requests.get(self.base_url, params=params, timeout=10)
+        response.raise_for_status()
+        return [hit['largeImageURL'] for hit in response.json().get('hits', [])]
+
+
+def fetch(url):
+    """下载图片内容"""
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    """原子写入源数据，格式与 download_images.py 相同"""
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+def ensure_schema(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS image_replacements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            character TEXT NOT NULL,
+            image_file TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            source_url TEXT NOT NULL,
+            feedback_count INTEGER NOT NULL,
+            backup_file TEXT NOT NULL,
+            replaced_at INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_image_replacements_file
+        ON image_replacements (image_file, character)
+    ''')
+
+
+class ImageReplacer:
+    """
+    根据反馈替换图片
+
+    Args:
+        db_path: SQLite数据库路径
+        searcher: 提供 search(keyword, english) -> [图片地址] 的对象
+        fetcher: 下载函数 url -> bytes
+        threshold: 触发替换的反馈数
+        delay: 网络请求间隔（秒）
+        max_per_run: 每轮最多替换的图片数
+        rebuild: 替换后是否重新构建词库
+    """
+
+    def __init__(self, db_path, searcher, fetcher=fetch, data_dir=wordbank.DATA_DIR, image_dir=wordbank.IMAGE_DIR,
+                 artifact_dir=wordbank.ARTIFACT_DIR, threshold=3, delay=REQUEST_DELAY, max_per_run=MAX_PER_RUN,
+                 rebuild=True):
+        self.db_path = db_path
+        self.searcher = searcher
+        self.fetcher = fetcher
+        self.data_dir = data_dir
+        self.image_dir = image_dir
+        self.artifact_dir = artifact_dir
+        self.threshold = threshold
+        self.delay = delay
+        self.max_per_run = max_per_run
+        self.rebuild = rebuild
+        self._last_request = 0.0
+
+    def _throttle(self):
+        wait = self._last_request + self.delay - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+
+    def candidates(self, cursor):
+        """反馈数达到阈值的图片 [(character, image_file, feedback_count)]"""
+        cursor.execute('''
+            SELECT character, image_file, feedback_count FROM feedback
+            WHERE feedback_count >= ?
+            ORDER BY feedback_count DESC, updated_at ASC
+        ''', (self.threshold,))
+        return cursor.fetchall()
+
+    def locate(self, character, image_file):
+        """
+        在源数据中找到图片对应的词条
+
+        Returns:
+            dict: {'path', 'keyword', 'english', 'name', 'entry', 'source', 'source_path', 'shared'}，
+                  找不到时返回None；shared 表示去重后还有其他词条引用同一文件（新文件按词条命名）
+        """
+        source_path = os.path.join(self.data_dir, 'characters.json')
+        source = _read_json(source_path)
+        chars = [char for cat in source.get('basicChineseCharactersForKids', []) for char in cat.get('characters', [])
+                 if char.get('image_file') == image_file]
+        for char in chars:
+            if char.get('character') == character:
+                return {'path': os.path.join(self.image_dir, image_file), 'keyword': char['meaning'],
+                        'english': False, 'name': character, 'entry': char, 'source': source,
+                        'source_path': source_path, 'shared': len(chars) > 1}
+
+        source_path = os.path.join(self.data_dir, 'english_alphabet.json')
+        source = _read_json(source_path)
+        letters = [letter for letter in source.get('englishAlphabet', []) if letter.get('image_file') == image_file]
+        # 英语游戏反馈的是正确答案（大写、小写字母或单词）
+        owners = [letter for letter in letters
+                  if character in (letter['letter'], letter['lowercase'], *letter.get('words', []))]
+        for letter in owners or letters[:1]:
+            words = letter.get('words') or [letter['letter']]
+            return {'path': os.path.join(self.image_dir, 'english', image_file), 'keyword': words[0].lower(),
+                    'english': True, 'name': letter['letter'].lower(), 'entry': letter, 'source': source,
+                    'source_path': source_path, 'shared': len(letters) > 1}
+        return None
+
+    def replace(self, conn, character, image_file, feedback_count):
+        """
+        替换一张图片
+
+        Returns:
+            str: replaced / exhausted / not_found / no_result
+        """
+        target = self.locate(character, image_file)
+        if target is None or not os.path.exists(target['path']):
+            return 'not_found'
+        # 每次替换后文件名都会变化，按词条累计已用过的搜索结果
+        rank = conn.execute('SELECT COUNT(*) FROM image_replacements WHERE character = ?',
+                            (character,)).fetchone()[0] + 1
+        if rank >= SEARCH_RESULTS:
+            return 'exhausted'
+
+        self._throttle()
+        urls = self.searcher.search(target['keyword'], target['english'])
+        if len(urls) <= rank:
+            return 'no_result'
+        self._throttle()
+        content = self.fetcher(urls[rank])
+
+        directory = os.path.dirname(target['path'])
+        # 去重后多个词条共用这张图片时按词条命名，其他词条继续使用原文件
+        base = target['name'] if target['shared'] else _HASH_SUFFIX.sub('', os.path.splitext(image_file)[0])
+        # 原文件不覆盖：未重新加载词库的worker和浏览器缓存中的旧地址仍对应旧图片
+        backup_file = '' if target['shared'] else target['path']
+
+        # 临时文件与目标在同一目录，os.replace 为原子操作，读取方只会看到完整的文件
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            raw = os.path.join(tmp, 'download')
+            compressed = os.path.join(tmp, 'compressed.jpg')
+            with open(raw, 'wb') as f:
+                f.write(content)
+            if not compress_image(raw, compressed):
+                raise ValueError(f'图片压缩失败: {urls[rank]}')
+            # compress_image 总是输出JPEG，扩展名与内容一致
+            with open(compressed, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:HASH_LENGTH]
+            new_file = f'{base}-{digest}.jpg'
+            os.replace(compressed, os.path.join(directory, new_file))
+        target['entry']['image_file'] = new_file
+        _write_json(target['source_path'], target['source'])
+
+        with conn:
+            conn.execute('''
+                INSERT INTO image_replacements
+                    (character, image_file, rank, source_url, feedback_count, backup_file, replaced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (character, image_file, rank, urls[rank], feedback_count, backup_file, int(time.time())))
+            # 只减去本次处理的反馈数，替换期间新增的反馈针对的是新图片，予以保留
+            conn.execute('''
+                UPDATE feedback SET feedback_count = feedback_count - ?, updated_at = CURRENT_TIMESTAMP
+                WHERE character = ? AND image_file = ?
+            ''', (feedback_count, character, image_file))
+            conn.execute('DELETE FROM feedback WHERE character = ? AND image_file = ? AND feedback_count <= 0',
+                         (character, image_file))
+        logger.info('图片已替换', extra=fields(character=character, image_file=image_file, new_file=new_file,
+                                               rank=rank, feedback_count=feedback_count))
+        return 'replaced'
+
+    def run_once(self, dry_run=False):
+        """
+        处理一轮
+
+        Returns:
+            dict: 各结果的数量，dry_run时返回达到阈值的图片列表
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            ensure_schema(conn.cursor())
+            conn.commit()
+            candidates = self.candidates(conn.cursor())
+            if dry_run:
+                return {'candidates': candidates}
+            stats = {'replaced': 0, 'exhausted': 0, 'not_found': 0, 'no_result': 0, 'failed': 0}
+            for character, image_file, feedback_count in candidates:
+                if stats['replaced'] + stats['no_result'] + stats['failed'] >= self.max_per_run:
+                    break
+                try:
+                    result = self.replace(conn, character, image_file, feedback_count)
+                except (requests.RequestException, OSError, ValueError):
+                    logger.exception('图片替换失败', extra=fields(character=character, image_file=image_file))
+                    result = 'failed'
+                stats[result] += 1
+        finally:
+            conn.close()
+
+        if stats['replaced'] and self.rebuild:
+            # 重新构建词库，图片地址的内容哈希随之更新
+            wordbank.write(wordbank.build(self.data_dir, self.image_dir), self.artifact_dir)
+        return stats
+
+
+def start_worker(db_path='leaderboard.db'):
+    """按环境变量启动后台替换线程，未设置间隔或没有API密钥时不启动"""
+    minutes = os.getenv('IMAGE_REPLACE_INTERVAL_MINUTES')
+    if not minutes:
+        return None
+    api_key = _api_key()
+    if not api_key:
+        logger.warning('未配置 PIXABAY_API_KEY，图片替换未启动')
+        return None
+    interval = int(float(minutes) * 60)
+    replacer = ImageReplacer(db_path, PixabaySearcher(api_key),
+                             threshold=int(os.getenv('IMAGE_FEEDBACK_THRESHOLD', '3')))
+
+    def loop():
+        while True:
+            try:
+                conn = sqlite3.connect(db_path, timeout=30)
+                try:
+                    maintenance.ensure_state_table(conn)
+                    claimed = maintenance.claim_run(conn, interval, key='image_replacer_last_run')
+                finally:
+                    conn.close()
+                if claimed:
+                    stats = replacer.run_once()
+                    if stats['replaced'] or stats['failed']:
+                        logger.info('图片替换完成', extra=fields(**stats))
+            except Exception:
+                logger.exception('图片替换失败')
+            time.sleep(min(interval, 3600))
+
+    thread = threading.Thread(target=loop, name='image-replacer', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据反馈替换不合适的图片')
+    parser.add_argument('--db', default='leaderboard.db', help='数据库路径 (默认: leaderboard.db)')
+    parser.add_argument('--threshold', type=int, default=int(os.getenv('IMAGE_FEEDBACK_THRESHOLD', '3')),
+                        help='触发替换的反馈数 (默认: 3)')
+    parser.add_argument('--max', type=int, default=MAX_PER_RUN, help=f'最多替换的图片数 (默认: {MAX_PER_RUN})')
+    parser.add_argument('--dry-run', action='store_true', help='只列出达到阈值的图片')
+    args = parser.parse_args()
+
+    api_key = _api_key()
+    if not api_key and not args.dry_run:
+        print('错误: 请设置 PIXABAY_API_KEY 环境变量或在 config.py 中配置')
+        return
+    replacer = ImageReplacer(args.db, PixabaySearcher(api_key), threshold=args.threshold, max_per_run=args.max)
+    stats = replacer.run_once(dry_run=args.dry_run)
+    if args.dry_run:
+        for character, image_file, count in stats['candidates']:
+            print(f'{character}  {image_file}  反馈 {count} 次')
+        return
+    print(f"替换: {stats['replaced']}，已无更多结果: {stats['exhausted']}，未找到词条: {stats['not_found']}，"
+          f"搜索无结果: {stats['no_result']}，失败: {stats['failed']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+JSON序列化
+默认由orjson序列化（未安装时使用标准库json），输出与Flask自带的DefaultJSONProvider逐字节一致（中文转义为 \\uXXXX）；
+设置环境变量 JSON_RAW_UTF8=1 时中文按UTF-8原样输出，体积约为转义形式的一半
+
+与标准库的差异只在本项目不出现的数据上: 带指数的浮点数（1e16 输出为 1e16 而不是 1e+16）、NaN/Infinity 输出为 null
+"""
+
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    使用orjson的JSON提供器
+
+    保留DefaultJSONProvider的 ensure_ascii / sort_keys / compact 配置语义，
+    orjson不支持的参数或数据（如自定义cls、超过64位的整数）自动回退到标准库
+
+    未指定缩进的 dumps 默认紧凑输出，直接调用 app.json.dumps(data) 与 response 使用同一条路径；
+    orjson只能输出原始UTF-8，ensure_ascii 开启（默认）时用C实现的 backslashreplace 编码转义为 \\uXXXX，
+    少数无法这样转义的输出（BMP以外的字符、含反斜杠或DEL的字符串）交给标准库
+    """
+
+    # dumps 未指定 indent 和 separators 时使用的分隔符
+    separators = (',', ':')
+
+    def _orjson_option(self, indent=None):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _orjson_dumps(self, obj, indent=None):
+        """orjson序列化，返回str；无法处理时返回None交由标准库处理"""
+        try:
+            data = orjson.dumps(obj, default=self.default, option=self._orjson_option(indent))
+        except TypeError:
+            return None
+        if not self.ensure_ascii:
+            return data.decode('utf-8')
+        return _escape_non_ascii(data)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', self.separators)
+        if orjson is not None and self._can_use_orjson(kwargs):
+            text = self._orjson_dumps(obj, kwargs.get('indent'))
+            if text is not None:
+                return text
+        return super().dumps(obj, **kwargs)
+
+    @staticmethod
+    def _can_use_orjson(kwargs):
+        """只有紧凑输出或2空格缩进这两种形式能与标准库保持一致"""
+        indent = kwargs.get('indent')
+        separators = kwargs.get('separators')
+        if set(kwargs) - {'indent', 'separators'}:
+            return False
+        if indent is None:
+            return separators == (',', ':')
+        return indent == 2 and separators in (None, (',', ': '))
+
+
+def _escape_non_ascii(data):
+    """
+    把orjson输出的UTF-8转义成与标准库 ensure_ascii 相同的形式，不能逐字节一致时返回None
+
+    backslashreplace 把 U+0080~U+00FF 写成 \\xNN（改为 \\u00NN），BMP以外的字符写成 \\UNNNNNNNN（标准库为代理对）；
+    原有的反斜杠会与这些转义混淆，标准库还会转义DEL，这几种情况都交给标准库
+    """
+    if b'\\\\' in data or b'\x7f' in data:
+        return None
+    if data.isascii():
+        return data.decode('ascii')
+    text = data.decode('utf-8').encode('ascii', 'backslashreplace')
+    if b'\\U' in text:
+        return None
+    return text.replace(b'\\x', b'\\u00').decode('ascii')
+
+
+def init_json_provider(app):
+    """为Flask应用安装JSON提供器"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    if os.getenv('JSON_RAW_UTF8', '0') == '1':
+        app.json.ensure_ascii = False
+    return app.json
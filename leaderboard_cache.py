@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+排行榜缓存
+常用的前N名排行榜以序列化好的JSON字节缓存，命中时不查询数据库也不重新序列化。
+只有能进入前N名的新成绩才会使对应缓存失效：本进程的写入直接调用 on_score_saved，
+其他进程、其他节点的写入由存储后端的写入通知触发（storage.py）。
+缓存同时带有较短的过期时间，通知丢失时其他进程写入的成绩最多延迟一个过期周期可见。
+"""
+
+import threading
+import time
+
+from flask import current_app
+
+from metrics import record_cache
+
+# 缓存的排行榜长度（/api/leaderboard 的常用 limit）
+DEFAULT_LIMITS = (10, 20, 50)
+
+
+class _Entry:
+    __slots__ = ('body', 'expires_at', 'size', 'last')
+
+    def __init__(self, body, expires_at, size, last):
+        self.body = body
+        self.expires_at = expires_at
+        self.size = size
+        # 第N名的 (score, total_time)，用于判断新成绩能否上榜
+        self.last = last
+
+
+class LeaderboardCache:
+    """
+    前N名排行榜缓存
+
+    Args:
+        loader: 排行榜查询函数，签名同 get_leaderboard(limit)
+        limits: 需要缓存的排行榜长度
+        ttl: 缓存有效期（秒）
+    """
+
+    def __init__(self, loader, limits=DEFAULT_LIMITS, ttl=5.0):
+        self.loader = loader
+        self.limits = frozenset(limits)
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # 每次失效递增，避免失效前开始的查询把旧结果写回缓存
+        self._generation = 0
+
+    def get_response_body(self, limit):
+        """返回 {'leaderboard': [...]} 的JSON字节"""
+        if limit not in self.limits:
+            record_cache('leaderboard', False)
+            return self._serialize(self.loader(limit))
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(limit)
+            generation = self._generation
+        if entry is not None and entry.expires_at > now:
+            record_cache('leaderboard', True)
+            return entry.body
+
+        record_cache('leaderboard', False)
+        leaderboard = self.loader(limit)
+        body = self._serialize(leaderboard)
+        last = (leaderboard[-1]['score'], leaderboard[-1]['total_time']) if leaderboard else None
+        with self._lock:
+            if generation == self._generation:
+                self._entries[limit] = _Entry(body, now + self.ttl, len(leaderboard), last)
+        return body
+
+    def on_score_saved(self, score, total_time):
+        """新成绩写入后调用：只让新成绩能够进入的前N名缓存失效"""
+        with self._lock:
+            self._generation += 1
+            for limit, entry in list(self._entries.items()):
+                if self._enters_top(entry, limit, score, total_time):
+                    del self._entries[limit]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    @staticmethod
+    def _enters_top(entry, limit, score, total_time):
+        if entry.size < limit or entry.last is None:
+            return True
+        last_score, last_time = entry.last
+        # 排序规则与 get_leaderboard 一致：分数降序，总时间升序；同分同时的情况保守地视为上榜
+        return score > last_score or (score == last_score and total_time <= last_time)
+
+    @staticmethod
+    def _serialize(leaderboard):
+        return current_app.json.response({'leaderboard': leaderboard}).get_data()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成绩表维护
+- 归档：早于保留期的成绩写入按月分组的压缩文件 archive/scores-YYYY-MM.ndjson.gz 后从热表删除，
+  每个昵称在每个游戏中的最好成绩、总榜和各游戏排行前N名的成绩始终保留在热表中，
+  排行榜和根据成绩表重建的汇总榜结果不受影响
+- 清理：删除过期的日榜/周榜汇总数据，以及已汇总到学习分析统计表的旧答题事件
+- 整理：增量VACUUM回收空闲页，ANALYZE更新查询统计
+
+每批归档在一个短事务中完成，期间排行榜照常读写。
+
+首次运行时需要把数据库切换到增量自动清理模式（一次完整VACUUM，期间锁住整个数据库），
+只由命令行执行；后台定时任务不做切换，未切换时增量整理不回收空间。
+设置 DATABASE_URL（成绩和汇总榜在PostgreSQL中）时跳过归档和汇总清理，只清理本机的答题事件。
+
+用法:
+    python maintenance.py --days 90 --archive-dir archive
+或在应用中设置 MAINTENANCE_INTERVAL_HOURS 定期后台执行（多个worker只会有一个实际执行）
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from app_logging import get_logger, fields
+import answer_events
+
+logger = get_logger('maintenance')
+
+# 每批归档的行数，控制单个写事务的持锁时间
+BATCH_SIZE = 2000
+
+# 每次增量VACUUM回收的最大页数
+VACUUM_PAGES = 2000
+
+
+def ensure_state_table(conn):
+    """后台任务的状态表（上次运行时间等），其他定时任务也使用"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    conn.commit()
+
+
+def ensure_schema(conn, convert_auto_vacuum=False):
+    """
+    维护任务的状态表；convert_auto_vacuum 为真时把数据库切换到增量自动清理模式
+
+    切换需要一次完整VACUUM，期间持有整个数据库的排他锁，只在命令行中执行
+    """
+    ensure_state_table(conn)
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return
+    if convert_auto_vacuum:
+        logger.info('切换数据库到增量自动清理模式')
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    else:
+        logger.warning('数据库未使用增量自动清理模式，增量整理不会回收空间，请执行一次 python maintenance.py')
+
+
+def scores_in_sqlite():
+    """成绩和汇总榜是否保存在本机SQLite中（设置 DATABASE_URL 时在PostgreSQL中）"""
+    return not os.getenv('DATABASE_URL')
+
+
+def claim_run(conn, interval, key='last_run'):
+    """在写事务中检查并登记本次运行，避免多个进程同时执行同一任务；返回是否获得执行权"""
+    now = int(time.time())
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute("SELECT value FROM maintenance_state WHERE key = ?", (key,)).fetchone()
+        if interval and row and now - int(row[0]) < interval:
+            conn.rollback()
+            return False
+        conn.execute('''
+            INSERT INTO maintenance_state (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        ''', (key, str(now)))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def archive_scores(conn, cutoff, archive_dir, keep_top=100, batch_size=BATCH_SIZE):
+    """
+    归档早于cutoff（UNIX时间戳）的成绩
+
+    每个昵称在每个游戏中的最好成绩不归档，rollups.rebuild 重建的各游戏总榜不变
+
+    Args:
+        keep_top: 总榜和每个游戏排行前N名的成绩不归档
+    Returns:
+        int: 归档的行数
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    # 候选行在写事务之外一次选出（排名需要排序整张表），放入临时表（独立的临时库，不占用成绩库的写锁）；
+    # 之后插入的成绩只会让这些行排得更靠后，候选仍然可以归档
+    conn.execute('DROP TABLE IF EXISTS temp.archive_candidates')
+    conn.execute('''
+        CREATE TEMP TABLE archive_candidates AS
+        SELECT id FROM scores AS s
+        WHERE play_timestamp < ?
+          AND id NOT IN (
+              SELECT id FROM scores ORDER BY score DESC, total_time ASC LIMIT ?
+          )
+          AND id NOT IN (
+              SELECT id FROM (
+                  SELECT id, ROW_NUMBER() OVER (
+                      PARTITION BY game ORDER BY score DESC, total_time ASC, id
+                  ) AS game_rank
+                  FROM scores
+              ) WHERE game_rank <= ?
+          )
+          AND EXISTS (
+              SELECT 1 FROM scores AS b
+              WHERE b.nickname = s.nickname
+                AND b.game = s.game
+                AND (b.score > s.score
+                     OR (b.score = s.score AND b.total_time < s.total_time)
+                     OR (b.score = s.score AND b.total_time = s.total_time AND b.id < s.id))
+          )
+    ''', (cutoff, keep_top, keep_top))
+    archived = 0
+    last_id = -1
+    try:
+        while True:
+            ids = [row[0] for row in conn.execute(
+                'SELECT id FROM temp.archive_candidates WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, batch_size))]
+            if not ids:
+                return archived
+            last_id = ids[-1]
+            placeholders = ', '.join('?' * len(ids))
+            # 写事务中只按id读取和删除
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(f'''
+                    SELECT id, nickname, score, total_time, average_time, created_at, play_timestamp, game
+                    FROM scores WHERE id IN ({placeholders}) ORDER BY id
+                ''', ids).fetchall()
+                if rows:
+                    # 先把归档写入磁盘，再在同一事务中删除
+                    _write_archive(archive_dir, rows)
+                    conn.executemany('DELETE FROM scores WHERE id = ?', [(row[0],) for row in rows])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            archived += len(rows)
+    finally:
+        conn.execute('DROP TABLE IF EXISTS temp.archive_candidates')
+
+
+def _write_archive(archive_dir, rows):
+    """按月追加写入gzip压缩的NDJSON（gzip允许多个成员拼接）"""
+    by_month = {}
+    for row in rows:
+        month = datetime.fromtimestamp(row[6]).strftime('%Y-%m')
+        by_month.setdefault(month, []).append({
+            'id': row[0],
+            'nickname': row[1],
+            'score': row[2],
+            'total_time': row[3],
+            'average_time': row[4],
+            'created_at': row[5],
+            'play_timestamp': row[6],
+            'game': row[7]
+        })
+    for month, records in by_month.items():
+        path = os.path.join(archive_dir, f'scores-{month}.ndjson.gz')
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def prune_rollups(conn, cutoff):
+    """删除早于cutoff的日榜/周榜汇总（总榜保留）"""
+    daily = datetime.fromtimestamp(cutoff).strftime('%Y-%m-%d')
+    year, week, _ = datetime.fromtimestamp(cutoff).isocalendar()
+    weekly = f'{year}-W{week:02d}'
+    with conn:
+        deleted = 0
+        for window, period in (('daily', daily), ('weekly', weekly)):
+            deleted += conn.execute('DELETE FROM leaderboard_rollups WHERE "window" = ? AND period < ?',
+                                    (window, period)).rowcount
+    return deleted
+
+
+def prune_answer_events(conn, cutoff, batch_size=BATCH_SIZE):
+    """删除早于cutoff且已汇总的答题事件（汇总表不受影响）"""
+    answer_events.ensure_schema(conn.cursor())
+    row = conn.execute("SELECT value FROM answer_rollup_state WHERE key = 'last_event_id'").fetchone()
+    if row is None:
+        return 0
+    deleted = 0
+    while True:
+        with conn:
+            count = conn.execute('''
+                DELETE FROM answer_events WHERE id IN (
+                    SELECT id FROM answer_events WHERE id <= ? AND created_at < ? ORDER BY id LIMIT ?
+                )
+            ''', (row[0], cutoff, batch_size)).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def compact(conn, pages=VACUUM_PAGES):
+    """增量回收空闲页并更新统计信息"""
+    freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # incremental_vacuum 每一步回收一页，需要把语句执行完
+    conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+    conn.execute('ANALYZE')
+    conn.commit()
+    return min(freelist, pages)
+
+
+def run_maintenance(db_path='leaderboard.db', days=90, archive_dir='archive', keep_top=100, interval=0,
+                    convert_auto_vacuum=False):
+    """
+    执行一次完整维护
+
+    Args:
+        days: 热表保留的天数
+        interval: 距上次运行不足该秒数时跳过（用于多进程定时任务），0表示总是执行
+        convert_auto_vacuum: 需要时切换到增量自动清理模式（完整VACUUM，只在命令行中使用）
+    Returns:
+        dict: 统计信息；跳过时返回None
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        ensure_schema(conn, convert_auto_vacuum)
+        if not claim_run(conn, interval):
+            return None
+        cutoff = int(time.time()) - days * 86400
+        start = time.perf_counter()
+        stats = {'archived': 0, 'rollups_pruned': 0}
+        # 成绩在PostgreSQL中时，本机SQLite只有空的成绩表，不做归档
+        if scores_in_sqlite():
+            stats['archived'] = archive_scores(conn, cutoff, archive_dir, keep_top)
+            stats['rollups_pruned'] = prune_rollups(conn, cutoff)
+        stats['answer_events_pruned'] = prune_answer_events(conn, cutoff)
+        stats['pages_reclaimed'] = compact(conn)
+        stats['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info('成绩表维护完成', extra=fields(**stats))
+        return stats
+    finally:
+        conn.close()
+
+
+def start_scheduler(db_path='leaderboard.db'):
+    """
+    按环境变量启动后台定时维护线程
+
+    环境变量:
+        MAINTENANCE_INTERVAL_HOURS: 维护间隔（小时），未设置时不启动
+        SCORES_RETENTION_DAYS: 热表保留天数，默认 90
+        SCORES_ARCHIVE_DIR: 归档目录，默认 archive
+    """
+    hours = os.getenv('MAINTENANCE_INTERVAL_HOURS')
+    if not hours:
+        return None
+    interval = int(float(hours) * 3600)
+    days = int(os.getenv('SCORES_RETENTION_DAYS', '90'))
+    archive_dir = os.getenv('SCORES_ARCHIVE_DIR', 'archive')
+
+    def loop():
+        while True:
+            try:
+                run_maintenance(db_path, days, archive_dir, interval=interval)
+            except Exception:
+                logger.exception('成绩表维护失败')
+            time.sleep(min(interval, 3600))
+
+    thread = threading.Thread(target=loop, name='scores-maintenance', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='归档旧成绩并整理数据库')
+    parser.add_argument('--db', default='leaderboard.db', help='数据库路径 (默认: leaderboard.db)')
+    parser.add_argument('--days', type=int, default=90, help='热表保留天数 (默认: 90)')
+    parser.add_argument('--archive-dir', default='archive', help='归档目录 (默认: archive)')
+    parser.add_argument('--keep-top', type=int, default=100, help='始终保留的总榜前N名 (默认: 100)')
+    args = parser.parse_args()
+
+    if not scores_in_sqlite():
+        print("已设置 DATABASE_URL：成绩在PostgreSQL中，跳过归档，只清理本机的答题事件")
+    stats = run_maintenance(args.db, args.days, args.archive_dir, args.keep_top, convert_auto_vacuum=True)
+    print(f"归档成绩: {stats['archived']} 条")
+    print(f"清理汇总: {stats['rollups_pruned']} 条")
+    print(f"清理答题事件: {stats['answer_events_pruned']} 条")
+    print(f"回收页数: {stats['pages_reclaimed']}")
+    print(f"耗时: {stats['duration_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
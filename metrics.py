@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标
+- 请求中间件：按路由统计延迟直方图、状态码计数和处理中请求数
+- 数据库调用耗时、成绩保存失败次数、缓存命中率
+- /metrics 以Prometheus文本格式输出
+
+多进程（gunicorn多个worker）部署时设置 METRICS_DIR，各进程定期把自己的指标写入
+该目录下的 <pid>.json，输出时汇总所有进程的数据；已退出进程的计数保留，仪表值忽略。
+gunicorn主进程在worker退出时调用 mark_process_dead，把该进程的计数并入 dead.json 后删除其文件，
+目录中的文件数不随worker重启次数增长
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, request
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# 多进程模式下各进程写出指标的最小间隔（秒）
+FLUSH_INTERVAL = 5.0
+
+# 已退出进程的计数合并后保存的文件
+DEAD_FILE = 'dead.json'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = registry.lock
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [各分桶计数..., 总和, 总次数]，分桶计数非累积，输出时再累加
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(value)] for key, value in self._values.items()]
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """上下文管理器：记录代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    """指标注册表，负责多进程数据的写出与汇总"""
+
+    def __init__(self, directory=None):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.directory = directory
+        self._last_flush = 0.0
+
+    def _register(self, cls, name, documentation, labelnames=(), **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(self, name, documentation, labelnames, **kwargs)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def reset(self):
+        """清空本进程的所有指标（fork之后调用，worker不继承主进程预热时记录的数据）"""
+        for metric in self.metrics.values():
+            metric.clear()
+        self._last_flush = 0.0
+
+    def maybe_flush(self, force=False):
+        """多进程模式下把本进程的指标写入共享目录（原子替换），未到写出间隔时跳过"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def mark_process_dead(self, pid):
+        """把已退出进程的计数和直方图并入 dead.json 并删除其文件（由gunicorn主进程调用，只有一个写入者）"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'{pid}.json')
+        dead_path = os.path.join(self.directory, DEAD_FILE)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            data = {}
+        try:
+            with open(dead_path, encoding='utf-8') as f:
+                merged = json.load(f)
+        except (OSError, ValueError):
+            merged = {}
+        for name, samples in data.items():
+            metric = self.metrics.get(name)
+            if metric is None or metric.kind == 'gauge':
+                continue
+            target = {tuple(labels): value for labels, value in merged.get(name, [])}
+            _merge_samples(metric, target, samples)
+            merged[name] = [[list(key), value] for key, value in target.items()]
+        tmp_path = f'{dead_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False)
+        os.replace(tmp_path, dead_path)
+        os.remove(path)
+
+    def collect(self):
+        """汇总所有进程的指标，返回 {name: {labels_tuple: value}}"""
+        if not self.directory:
+            return {name: {tuple(k): v for k, v in samples} for name, samples in self.snapshot().items()}
+
+        self.maybe_flush(force=True)
+        merged = {name: {} for name in self.metrics}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            alive = _pid_alive(filename[:-len('.json')])
+            try:
+                with open(os.path.join(self.directory, filename), encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in data.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                _merge_samples(metric, merged[name], samples)
+        return merged
+
+    def render(self):
+        """按Prometheus文本格式输出所有指标"""
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            samples = collected.get(name, {})
+            if not samples and not metric.labelnames and metric.kind != 'histogram':
+                samples = {(): 0}
+            for key, value in sorted(samples.items()):
+                labels = dict(zip(metric.labelnames, key))
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(labels, le=_format_value(bound))} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(labels, le="+Inf")} {value[-1]}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge_samples(metric, target, samples):
+    """把一个进程的样本累加到 target（{labels_tuple: value}）"""
+    for labels, value in samples:
+        key = tuple(labels)
+        if metric.kind == 'histogram':
+            current = target.get(key)
+            target[key] = value if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(labels, **extra):
+    items = {**labels, **extra}
+    if not items:
+        return ''
+    parts = []
+    for key, value in items.items():
+        escaped = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return '{' + ','.join(parts) + '}'
+
+
+registry = Registry(os.getenv('METRICS_DIR'))
+
+REQUEST_LATENCY = registry.histogram(
+    'syword_http_request_duration_seconds', '请求处理耗时', ('method', 'route'))
+REQUEST_COUNT = registry.counter(
+    'syword_http_requests_total', '请求数（按状态码）', ('method', 'route', 'status'))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    'syword_http_requests_in_flight', '正在处理的请求数')
+DB_LATENCY = registry.histogram(
+    'syword_db_query_duration_seconds', '数据库调用耗时', ('operation',))
+SCORE_SAVE_FAILURES = registry.counter(
+    'syword_score_save_failures_total', 'save_score 写入失败的次数')
+CACHE_REQUESTS = registry.counter(
+    'syword_cache_requests_total', '缓存访问次数', ('cache', 'result'))
+STATIC_RESPONSES = registry.counter(
+    'syword_static_responses_total', '静态文件中间件的响应次数', ('mount', 'status'))
+ANSWER_EVENTS = registry.counter(
+    'syword_answer_events_total', '答题事件数（accepted/dropped/written/failed）', ('status',))
+RATE_LIMITED = registry.counter(
+    'syword_rate_limited_total', '被限流拒绝的请求数', ('scope',))
+ACTIVE_ROOMS = registry.gauge(
+    'syword_active_rooms', '当前进程中的课堂房间数')
+EXPORTED_ROWS = registry.counter(
+    'syword_exported_rows_total', '批量导出的行数', ('table',))
+
+
+def timed_db(operation):
+    """装饰器：记录数据库函数的调用耗时"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with DB_LATENCY.time(operation=operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache, hit):
+    """记录一次缓存访问"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def init_metrics(app):
+    """注册请求中间件和 /metrics 路由"""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        REQUESTS_IN_FLIGHT.dec()
+        # 使用路由模板而不是实际路径，避免标签基数失控
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = g.pop('metrics_status', 500)
+        REQUEST_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route)
+        REQUEST_COUNT.inc(method=request.method, route=route, status=status)
+        registry.maybe_flush()
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Prometheus指标"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return registry
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+请求性能分析
+在cProfile下运行单个请求，只保留最慢的N份分析结果供下载（可用 snakeviz / pstats 查看）
+
+默认关闭；关闭时不注册任何钩子，对请求没有额外开销。
+SSE长连接（text/event-stream）不做分析；其他响应体照常流式发送，服务器关闭响应时保存结果。
+Python 3.12 起cProfile基于 sys.monitoring，同一时间只能有一个分析器：同时命中的请求只分析第一个，
+其余照常处理、不做分析；分析器只在开始分析的线程中开关（ASGI模式下响应体可能在其他线程中生成）。
+
+环境变量:
+    PROFILE_ENABLED: 设为 1 开启
+    PROFILE_ALLOWLIST: 允许通过请求头 X-Profile: 1 或查询参数 _profile=1 触发分析、
+                       以及下载结果的IP，逗号分隔，默认 127.0.0.1
+    PROFILE_SAMPLE_RATE: 按比例对所有请求随机采样分析，默认 0
+    PROFILE_DIR: 分析结果目录，默认 profiles
+    PROFILE_KEEP: 保留最慢的请求数，默认 20
+"""
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+from flask import abort, jsonify, request, send_from_directory
+
+from app_logging import get_logger, fields
+
+logger = get_logger('profiling')
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY = '_profile=1'
+
+# 文件名: <耗时微秒，补零便于排序>_<时间戳>_<路径>.prof
+_FILENAME = re.compile(r'^(\d{12})_\d+_[\w.-]*\.prof$')
+
+# 同一时间只分析一个请求，从开始分析到响应关闭期间持有
+_profile_lock = threading.Lock()
+
+
+def _enable(profiler):
+    """开启分析器，已有其他分析工具在运行时返回False"""
+    try:
+        profiler.enable()
+    except ValueError:
+        return False
+    return True
+
+
+class ProfilingMiddleware:
+    """WSGI中间件：对触发条件命中的请求进行cProfile分析"""
+
+    def __init__(self, wsgi_app, directory, allowlist, sample_rate=0.0, keep=20):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.allowlist = allowlist
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _should_profile(self, environ):
+        requested = environ.get(PROFILE_HEADER) == '1' or PROFILE_QUERY in environ.get('QUERY_STRING', '')
+        if requested and environ.get('REMOTE_ADDR') in self.allowlist:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self._should_profile(environ) or not _profile_lock.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        profiler = cProfile.Profile()
+        if not _enable(profiler):
+            _profile_lock.release()
+            logger.info('其他分析工具正在运行，跳过本次性能分析', extra=fields(sample=0.1))
+            return self.wsgi_app(environ, start_response)
+
+        event_stream = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            content_type = next((value for name, value in headers if name.lower() == 'content-type'), '')
+            if content_type.startswith('text/event-stream'):
+                event_stream.append(True)
+            return start_response(status, headers, exc_info)
+
+        start = time.perf_counter()
+        try:
+            result = self.wsgi_app(environ, capture_start_response)
+        except BaseException:
+            profiler.disable()
+            _profile_lock.release()
+            raise
+        profiler.disable()
+        # SSE长连接可能持续数小时，耗时没有意义，不做分析
+        if event_stream:
+            _profile_lock.release()
+            return result
+        path = environ.get('PATH_INFO', '')
+        return ProfiledBody(result, profiler, lambda: self._store(profiler, time.perf_counter() - start, path))
+
+    def _store(self, profiler, duration, path):
+        """保存分析结果，超出保留数量时删除最快的一份"""
+        micros = min(int(duration * 1_000_000), 10 ** 12 - 1)
+        slug = re.sub(r'[^\w.-]+', '-', path).strip('-')[:60] or 'root'
+        filename = f'{micros:012d}_{int(time.time())}_{slug}.prof'
+        with self._lock:
+            existing = list_profiles(self.directory)
+            if len(existing) >= self.keep and existing[-1] >= filename:
+                return
+            profiler.dump_stats(os.path.join(self.directory, filename))
+            for stale in list_profiles(self.directory)[self.keep:]:
+                try:
+                    os.remove(os.path.join(self.directory, stale))
+                except FileNotFoundError:
+                    pass
+        logger.info('已保存请求性能分析', extra=fields(path=path, duration_ms=round(duration * 1000, 2), profile=filename))
+
+
+class ProfiledBody:
+    """
+    包装响应体：逐块生成时开启分析器，服务器关闭响应时保存结果并释放 _profile_lock
+    不把响应体读入内存，流式导出等大响应照常边生成边发送；在其他线程中生成的部分不做分析
+    """
+
+    def __init__(self, result, profiler, on_close):
+        self.result = result
+        self.profiler = profiler
+        self.on_close = on_close
+        self._thread = threading.get_ident()
+        self._iterator = None
+        self._closed = False
+
+    def __iter__(self):
+        self._iterator = iter(self.result)
+        return self
+
+    def _run(self, func, *args):
+        """在开始分析的线程中调用时开启分析器"""
+        enabled = threading.get_ident() == self._thread and _enable(self.profiler)
+        try:
+            return func(*args)
+        finally:
+            if enabled:
+                self.profiler.disable()
+
+    def __next__(self):
+        return self._run(next, self._iterator)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self.result, 'close'):
+                self._run(self.result.close)
+        finally:
+            try:
+                self.on_close()
+            finally:
+                _profile_lock.release()
+
+
+def list_profiles(directory):
+    """按耗时从慢到快列出分析结果文件名"""
+    try:
+        names = [name for name in os.listdir(directory) if _FILENAME.match(name)]
+    except FileNotFoundError:
+        return []
+    return sorted(names, reverse=True)
+
+
+def init_profiling(app):
+    """按环境变量开启性能分析，并注册结果下载路由"""
+    if os.getenv('PROFILE_ENABLED') != '1':
+        return None
+
+    directory = os.path.abspath(os.getenv('PROFILE_DIR', 'profiles'))
+    allowlist = {ip.strip() for ip in os.getenv('PROFILE_ALLOWLIST', '127.0.0.1').split(',') if ip.strip()}
+    middleware = ProfilingMiddleware(
+        app.wsgi_app,
+        directory,
+        allowlist,
+        sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '0')),
+        keep=int(os.getenv('PROFILE_KEEP', '20')),
+    )
+    app.wsgi_app = middleware
+
+    @app.route('/debug/profiles')
+    def list_profiles_api():
+        """列出最慢请求的性能分析结果"""
+        if request.remote_addr not in allowlist:
+            abort(403)
+        profiles = []
+        for name in list_profiles(directory):
+            micros, timestamp, path = name[:-len('.prof')].split('_', 2)
+            profiles.append({
+                'file': name,
+                'duration_ms': int(micros) / 1000,
+                'timestamp': int(timestamp),
+                'path': path
+            })
+        return jsonify({'profiles': profiles})
+
+    @app.route('/debug/profiles/<name>')
+    def download_profile(name):
+        """下载单个性能分析结果"""
+        if request.remote_addr not in allowlist or not _FILENAME.match(name):
+            abort(403)
+        return send_from_directory(directory, name, as_attachment=True)
+
+    logger.info('请求性能分析已开启', extra=fields(directory=directory, allowlist=sorted(allowlist)))
+    return middleware
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+写接口限流
+每个客户端一个令牌桶：以 rate 个/秒的速度补充，最多积攒 burst 个，每个请求消耗一个。
+令牌桶用 GCRA 的形式保存：每个客户端只记录一个“理论到达时间” tat，
+    新 tat = max(tat, now) + 1/rate，新 tat - now 不超过 burst/rate 时放行
+与逐个记录令牌数完全等价，但只需一个数值。
+一个请求同时受设备桶和IP桶限制时，两个桶都放行才各消耗一个令牌，被拒绝的请求不消耗任何令牌。
+
+超限的请求在解析请求体、访问数据库之前直接返回 429 和 Retry-After，
+一台出错循环提交的平板不会占住SQLite写锁影响其他人。
+
+客户端标识: 请求头 X-Device-ID 或查询参数 device（浏览器本地生成的设备ID）+ IP；同时对每个IP另设一个更宽的桶
+（RATE_LIMIT_IP_FACTOR 倍，一个教室的平板通常共用一个出口IP），随意伪造设备ID也绕不过IP限额。
+
+状态存储:
+    默认每个进程一个内存LRU（最多 RATE_LIMIT_MAX_KEYS 个客户端，超出时淘汰最久未访问的）
+    设置 RATE_LIMIT_DB 时使用该SQLite文件，gunicorn的多个worker共享同一份限额
+
+环境变量:
+    RATE_LIMIT_ENABLED: 设为 0 关闭，默认开启
+    RATE_LIMIT_PER_MINUTE: 每个客户端每分钟的请求数，默认 30
+    RATE_LIMIT_BURST: 允许的突发请求数，默认 10
+    RATE_LIMIT_IP_FACTOR: 每个IP的限额是单个客户端的多少倍，默认 30
+    RATE_LIMIT_MAX_KEYS: 内存中最多保存的客户端数，默认 10000
+    RATE_LIMIT_DB: 共享状态的SQLite文件路径，默认不共享
+    RATE_LIMIT_TRUSTED_PROXIES: 可信反向代理的IP（逗号分隔），来自这些地址的请求使用 X-Forwarded-For
+"""
+
+import functools
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+from app_logging import get_logger, fields
+from metrics import RATE_LIMITED
+
+logger = get_logger('ratelimit')
+
+DEVICE_HEADER = 'X-Device-ID'
+_DEVICE_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+# 共享存储每处理这么多次请求清理一次已回满的桶
+PRUNE_EVERY = 1000
+
+
+def _admit(current, buckets, now):
+    """
+    按GCRA检查一组令牌桶
+
+    Args:
+        current: 键 -> 已保存的 tat（没有记录的键不在其中）
+        buckets: [(键, 补充间隔, 容差)]
+    Returns:
+        (需要等待的秒数，0表示全部放行, 放行时各键的新 tat)
+    """
+    wait = 0.0
+    tats = {}
+    for key, interval, tolerance in buckets:
+        tat = max(current.get(key, now), now) + interval
+        wait = max(wait, tat - now - tolerance)
+        tats[key] = tat
+    return wait, tats
+
+
+class MemoryStore:
+    """进程内的令牌桶状态，按最近访问排序的LRU，内存占用有上限"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._tats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets, now):
+        """所有桶都放行时各消耗一个令牌并返回0，否则不消耗任何令牌，返回需要等待的秒数"""
+        with self._lock:
+            wait, tats = _admit({key: self._tats[key] for key, _, _ in buckets if key in self._tats}, buckets, now)
+            if wait > 0:
+                return wait
+            for key, tat in tats.items():
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+            return 0.0
+
+    def __len__(self):
+        return len(self._tats)
+
+
+class SqliteStore:
+    """
+    多进程共享的令牌桶状态，保存在单独的SQLite文件中（不与成绩库争用写锁）
+    每次请求在一个短写事务中读取并更新所有相关的桶；数据库出错时放行，限流不能让正常请求失败
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=0.1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID')
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, buckets, now):
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                keys = [key for key, _, _ in buckets]
+                current = dict(conn.execute(
+                    f'SELECT key, tat FROM rate_limits WHERE key IN ({", ".join("?" * len(keys))})', keys).fetchall())
+                wait, tats = _admit(current, buckets, now)
+                if wait > 0:
+                    conn.rollback()
+                    return wait
+                conn.executemany('''
+                    INSERT INTO rate_limits (key, tat) VALUES (?, ?)
+                    ON CONFLICT (key) DO UPDATE SET tat = excluded.tat
+                ''', list(tats.items()))
+                self._maybe_prune(conn, now)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return 0.0
+        except sqlite3.Error:
+            logger.warning('限流状态读写失败，放行请求', exc_info=True, extra=fields(sample=0.01))
+            return 0.0
+
+    def _maybe_prune(self, conn, now):
+        self._calls += 1
+        if self._calls % PRUNE_EVERY == 0:
+            conn.execute('DELETE FROM rate_limits WHERE tat < ?', (now,))
+
+
+class RateLimiter:
+    """
+    令牌桶限流器
+
+    Args:
+        store: MemoryStore 或 SqliteStore
+        per_minute: 每个客户端每分钟补充的令牌数
+        burst: 桶容量（允许的突发请求数）
+        ip_factor: 每个IP的限额倍数
+        trusted_proxies: 可信反向代理的IP集合
+        enabled: 关闭时 limit 装饰器直接返回原视图
+    """
+
+    def __init__(self, store, per_minute=30, burst=10, ip_factor=30, trusted_proxies=(), enabled=True):
+        self.store = store
+        self.enabled = enabled
+        self.interval = 60.0 / per_minute
+        self.burst = burst
+        self.ip_factor = ip_factor
+        self.trusted_proxies = frozenset(trusted_proxies)
+
+    def client_ip(self):
+        ip = request.remote_addr or ''
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded and ip in self.trusted_proxies:
+            # 最右侧是可信代理直接看到的地址，左侧的内容可以被客户端伪造
+            ip = forwarded.split(',')[-1].strip()
+        return ip
+
+    def check(self, scope):
+        """检查当前请求，放行时返回0，否则返回需要等待的秒数"""
+        now = time.time()
+        ip = self.client_ip()
+        # sendBeacon 无法设置请求头，设备ID也可以放在查询参数 device 中
+        device = request.headers.get(DEVICE_HEADER) or request.args.get('device', '')
+        if _DEVICE_PATTERN.match(device):
+            # 单个设备之外，同一IP上所有设备合计的限额；两个桶都放行时才消耗令牌
+            interval = self.interval / self.ip_factor
+            return self.store.acquire([
+                (f'{scope}:{ip}:{device}', self.interval, self.interval * self.burst),
+                (f'{scope}:{ip}', interval, interval * self.burst * self.ip_factor),
+            ], now)
+        return self.store.acquire([(f'{scope}:{ip}:', self.interval, self.interval * self.burst)], now)
+
+    def limit(self, scope):
+        """视图装饰器：超限时直接返回429，同一 scope 的接口共用限额"""
+        def decorator(view):
+            if not self.enabled:
+                return view
+
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                wait = self.check(scope)
+                if wait > 0:
+                    RATE_LIMITED.inc(scope=scope)
+                    logger.info('请求被限流', extra=fields(sample=0.1, scope=scope, ip=self.client_ip(), wait=round(wait, 2)))
+                    response = jsonify({'error': '请求过于频繁，请稍后再试'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(math.ceil(wait))
+                    return response
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def init_rate_limiter():
+    """按环境变量创建限流器"""
+    if os.getenv('RATE_LIMIT_ENABLED', '1') == '0':
+        return RateLimiter(MemoryStore(0), enabled=False)
+
+    db_path = os.getenv('RATE_LIMIT_DB')
+    store = SqliteStore(db_path) if db_path else MemoryStore(int(os.getenv('RATE_LIMIT_MAX_KEYS', '10000')))
+    proxies = [ip.strip() for ip in os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '').split(',') if ip.strip()]
+    return RateLimiter(
+        store,
+        per_minute=float(os.getenv('RATE_LIMIT_PER_MINUTE', '30')),
+        burst=int(os.getenv('RATE_LIMIT_BURST', '10')),
+        ip_factor=int(os.getenv('RATE_LIMIT_IP_FACTOR', '30')),
+        trusted_proxies=proxies,
+    )
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+分时段、分游戏的排行榜汇总
+每条成绩写入时同步更新 leaderboard_rollups 表：按 日/周/总榜 和 游戏 记录每个昵称的最好成绩。
+查询直接走 (window, period, game, score, total_time) 索引，取前N名只需读取N行，
+不随历史成绩数量增长。
+
+游戏标识:
+    chinese              汉字游戏（随机分类）
+    chinese:<分类>       汉字游戏指定分类，如 chinese:自然与宇宙
+    english:<game_type>  英语字母游戏，如 english:letter_recognition
+    *                    所有游戏合并（写入时自动更新）
+"""
+
+import re
+from datetime import datetime
+
+WINDOWS = ('daily', 'weekly', 'all')
+ALL_GAMES = '*'
+DEFAULT_GAME = 'chinese'
+
+_GAME_PATTERN = re.compile(r'^(chinese(:[^\s:]{1,20})?|english:[a-z_]{1,30})$')
+
+
+def is_valid_game(game):
+    """校验游戏标识"""
+    return isinstance(game, str) and bool(_GAME_PATTERN.match(game))
+
+
+def period_key(window, timestamp):
+    """成绩时间所属的时段，使用服务器本地时间"""
+    if window == 'all':
+        return 'all'
+    moment = datetime.fromtimestamp(timestamp)
+    if window == 'daily':
+        return moment.strftime('%Y-%m-%d')
+    year, week, _ = moment.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def ensure_schema(cursor):
+    """创建汇总表；新建时根据已有成绩回填，返回是否新建"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard_rollups'")
+    exists = cursor.fetchone() is not None
+    # window 是PostgreSQL的保留字，SQL中统一加引号（两个数据库都适用）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leaderboard_rollups (
+            "window" TEXT NOT NULL,
+            period TEXT NOT NULL,
+            game TEXT NOT NULL,
+            nickname TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            total_time INTEGER NOT NULL,
+            average_time INTEGER NOT NULL,
+            play_timestamp INTEGER NOT NULL,
+            PRIMARY KEY ("window", period, game, nickname)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_rollups_rank
+        ON leaderboard_rollups ("window", period, game, score DESC, total_time ASC)
+    ''')
+    if not exists:
+        rebuild(cursor)
+    return not exists
+
+
+def record_score(cursor, game, nickname, score, total_time, average_time, play_timestamp):
+    """在写入成绩的同一事务中更新所有相关榜单，只保留每个昵称的最好成绩"""
+    for window in WINDOWS:
+        period = period_key(window, play_timestamp)
+        for board_game in {game, ALL_GAMES}:
+            cursor.execute('''
+                INSERT INTO leaderboard_rollups
+                    ("window", period, game, nickname, score, total_time, average_time, play_timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT ("window", period, game, nickname) DO UPDATE SET
+                    score = excluded.score,
+                    total_time = excluded.total_time,
+                    average_time = excluded.average_time,
+                    play_timestamp = excluded.play_timestamp
+                WHERE excluded.score > leaderboard_rollups.score
+                   OR (excluded.score = leaderboard_rollups.score
+                       AND excluded.total_time < leaderboard_rollups.total_time)
+            ''', (window, period, board_game, nickname, score, total_time, average_time, play_timestamp))
+
+
+def rebuild(cursor):
+    """根据 scores 表重建全部汇总数据"""
+    cursor.execute('DELETE FROM leaderboard_rollups')
+    cursor.execute('SELECT game, nickname, score, total_time, average_time, play_timestamp FROM scores')
+    for row in cursor.fetchall():
+        record_score(cursor, *row)
+
+
+def get_board(cursor, window, game=ALL_GAMES, limit=20, timestamp=None):
+    """
+    查询榜单
+
+    Args:
+        window: daily / weekly / all
+        game: 游戏标识，默认所有游戏合并
+        limit: 返回条数
+        timestamp: 所查询时段内的任意时间，默认当前时间
+    """
+    if timestamp is None:
+        timestamp = int(datetime.now().timestamp())
+    period = period_key(window, timestamp)
+    cursor.execute('''
+        SELECT nickname, score, total_time, average_time, play_timestamp
+        FROM leaderboard_rollups
+        WHERE "window" = ? AND period = ? AND game = ?
+        ORDER BY score DESC, total_time ASC
+        LIMIT ?
+    ''', (window, period, game, limit))
+
+    board = []
+    for i, row in enumerate(cursor.fetchall(), 1):
+        board.append({
+            'rank': i,
+            'nickname': row[0],
+            'score': row[1],
+            'total_time': row[2],
+            'average_time': row[3],
+            'play_timestamp': row[4]
+        })
+    return {'window': window, 'period': period, 'game': game, 'leaderboard': board}
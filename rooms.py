@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+课堂房间模式
+老师创建房间后，全班学生加入同一个房间：每一轮只生成一局游戏，题目序列化一次后
+所有学生拿到的都是同一份字节（按 catalog_version 分为完整和精简两份），
+本轮题目用到的图片地址同样只计算一次，作为 Link: preload 响应头随题目下发。
+学生提交的成绩进入房间自己的排行榜，通过SSE实时推送给老师和学生。
+
+房间保存在进程内存中，按最后访问时间过期（ROOM_TTL_SECONDS）。
+多个worker进程之间不共享房间，房间模式需要单进程部署（如ASGI单进程）或按房间号的粘性路由。
+
+接口:
+    POST /api/rooms                      创建房间 {category} -> {code, token, round}
+    POST /api/rooms/<code>/round         老师开始新一轮 {token}
+    GET  /api/rooms/<code>/game          本轮题目（支持 catalog_version、ETag）
+    POST /api/rooms/<code>/scores        提交本轮成绩 {nickname, score, total_time, round}
+    GET  /api/rooms/<code>/leaderboard   房间排行榜
+    GET  /api/rooms/<code>/stream        房间实时推送（leaderboard / round / closed 事件）
+"""
+
+import hmac
+import json
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from app_logging import get_logger, fields
+from broadcaster import SUBSCRIBER_BACKLOG, offer
+from metrics import ACTIVE_ROOMS, record_cache
+
+logger = get_logger('rooms')
+
+# 房间号字符集（去掉容易混淆的 I、O、0、1）
+CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+CODE_LENGTH = 5
+
+# 房间排行榜的最大长度（一个班级）
+BOARD_LIMIT = 50
+
+
+def _sse(event, payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f'event: {event}\ndata: {data}\n\n'
+
+
+class Room:
+    """
+    一个课堂房间
+
+    Args:
+        code: 房间号
+        category: 汉字分类（None 表示全部分类）
+        token: 老师令牌，开始新一轮时校验
+    """
+
+    def __init__(self, code, category, token):
+        self.code = code
+        self.category = category
+        self.token = token
+        self.round = 0
+        self.game = None
+        self.expires_at = 0.0
+        self._preload = ''
+        self._bodies = {}
+        self._scores = {}
+        self._board_body = None
+        self._board_message = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def start_round(self, game, image_urls):
+        """换上新一轮题目，清空本轮成绩并通知所有订阅者"""
+        with self._lock:
+            self.round += 1
+            self.game = game
+            # 响应头只能是latin-1，图片文件名中的汉字需要百分号编码
+            self._preload = ', '.join(f'<{quote(url, safe="/?=&")}>; rel=preload; as=image' for url in image_urls)
+            self._bodies = {}
+            self._scores = {}
+            self._board_body = None
+            self._board_message = None
+            subscribers = list(self._subscribers)
+            current = self.round
+        message = _sse('round', {'round': current})
+        for subscriber in subscribers:
+            offer(subscriber, message)
+        return current
+
+    def game_response(self, catalog, serialize, catalog_version=None, if_none_match=None):
+        """
+        本轮题目的响应
+
+        Returns:
+            tuple: (状态码, 响应体字节, [(响应头, 值)])
+        """
+        compact = catalog.accepts(catalog_version)
+        with self._lock:
+            current, game, preload = self.round, self.game, self._preload
+            body = self._bodies.get(compact)
+        etag = f'"{self.code}-{current}-{catalog.version}-{int(compact)}"'
+        headers = [('ETag', etag), ('Cache-Control', 'no-cache')]
+        if preload:
+            headers.append(('Link', preload))
+        if if_none_match == etag:
+            return 304, b'', headers
+
+        record_cache('room_game', body is not None)
+        if body is None:
+            # 共享同一局题目，gameId 置空：学生各自提交成绩时由服务器分配
+            shared = {**game, 'gameId': None, 'room': {'code': self.code, 'round': current, 'category': self.category}}
+            body = serialize(catalog.respond(shared, catalog_version))
+            with self._lock:
+                if self.round == current:
+                    body = self._bodies.setdefault(compact, body)
+        return 200, body, headers
+
+    def submit(self, nickname, score, total_time, round_number):
+        """记录本轮成绩（同一昵称保留最好成绩），返回名次；轮次已结束时返回None"""
+        with self._lock:
+            if round_number != self.round:
+                return None
+            entry = {'nickname': nickname, 'score': score, 'total_time': total_time}
+            best = self._scores.get(nickname)
+            if best is None or (-score, total_time) < (-best['score'], best['total_time']):
+                self._scores[nickname] = entry
+            else:
+                entry = best
+            board = self._ranked()
+            rank = board.index(entry) + 1
+            self._board_body = None
+            self._board_message = message = _sse('leaderboard', self._board_payload(board))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            offer(subscriber, message)
+        return rank
+
+    def board_body(self, serialize):
+        """房间排行榜的JSON字节，成绩变化前重复请求直接返回缓存"""
+        with self._lock:
+            body = self._board_body
+            if body is None:
+                body = self._board_body = serialize(self._board_payload(self._ranked()))
+        return body
+
+    def _ranked(self):
+        return sorted(self._scores.values(), key=lambda e: (-e['score'], e['total_time'], e['nickname']))
+
+    def _board_payload(self, ranked):
+        return {
+            'code': self.code,
+            'round': self.round,
+            'players': len(self._scores),
+            'leaderboard': [{**e, 'rank': i} for i, e in enumerate(ranked[:BOARD_LIMIT], 1)],
+        }
+
+    def subscribe(self, subscriber=None):
+        """注册订阅者（默认新建消息队列），已有榜单时立即放入当前榜单"""
+        if subscriber is None:
+            subscriber = queue.Queue(SUBSCRIBER_BACKLOG)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            message = self._board_message
+        if message is not None:
+            offer(subscriber, message)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def close(self):
+        """房间过期：通知订阅者关闭连接"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        message = _sse('closed', {'code': self.code})
+        for subscriber in subscribers:
+            offer(subscriber, message)
+
+
+class RoomRegistry:
+    """
+    进程内房间表，按最后访问时间排序：访问时移到末尾，过期的房间总在开头，
+    每次创建或查找时从开头清理，不需要后台线程
+
+    Args:
+        builder: 生成一局汉字游戏的函数，签名同 build_game(category)
+        image_urls: 从完整题目中取出图片地址的函数
+        ttl: 房间闲置多久后过期（秒）
+        max_rooms: 同时存在的最大房间数
+    """
+
+    def __init__(self, builder, image_urls, ttl=7200.0, max_rooms=500):
+        self.builder = builder
+        self.image_urls = image_urls
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self._rooms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        expired = []
+        while self._rooms:
+            code, room = next(iter(self._rooms.items()))
+            if room.expires_at > now:
+                break
+            del self._rooms[code]
+            expired.append(room)
+        if expired:
+            ACTIVE_ROOMS.dec(len(expired))
+        return expired
+
+    def _close(self, expired):
+        for room in expired:
+            room.close()
+            logger.info('房间已过期', extra=fields(code=room.code, rounds=room.round))
+
+    def create(self, category=None):
+        """创建房间并生成第一轮题目；房间数已满时返回None"""
+        room = Room(None, category, secrets.token_urlsafe(16))
+        self.next_round(room)
+        now = time.monotonic()
+        with self._lock:
+            expired = self._expire(now)
+            if len(self._rooms) >= self.max_rooms:
+                room = None
+            else:
+                room.code = self._new_code()
+                room.expires_at = now + self.ttl
+                self._rooms[room.code] = room
+                ACTIVE_ROOMS.inc()
+        self._close(expired)
+        if room is not None:
+            logger.info('创建房间', extra=fields(code=room.code, category=category))
+        return room
+
+    def _new_code(self):
+        while True:
+            code = ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+            if code not in self._rooms:
+                return code
+
+    def get(self, code):
+        """按房间号查找房间并延长有效期，不存在或已过期时返回None"""
+        now = time.monotonic()
+        with self._lock:
+            expired = self._expire(now)
+            room = self._rooms.get(code.upper())
+            if room is not None:
+                room.expires_at = now + self.ttl
+                self._rooms.move_to_end(room.code)
+        self._close(expired)
+        return room
+
+    def next_round(self, room):
+        """为房间生成新一轮题目（整个房间只生成一次）"""
+        game = self.builder(room.category)
+        return room.start_round(game, self.image_urls(game))
+
+    @staticmethod
+    def check_token(room, token):
+        return isinstance(token, str) and hmac.compare_digest(room.token, token)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rooms)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+词库搜索
+构建词库时为每个汉字、英语字母和英语单词生成一条搜索文档和倒排索引（词 -> 文档），
+随词库一起写入；服务启动时加载倒排索引并建立前缀树，查询只访问匹配的词，
+不遍历词库，也不需要加载分类分片。
+
+可搜索的内容:
+    汉字            日
+    拼音            rì / ri / ri4（带声调、不带声调、数字声调；ü 可输入 v）
+    英文释义        sun
+    中文释义        太阳（支持释义中的任意片段，如 阳）
+    常用词          生日
+    英语字母/单词   a / apple
+
+多个搜索词用空格分隔，结果需同时匹配所有词；每个词按前缀匹配，完全匹配的得分更高。
+"""
+
+import re
+import unicodedata
+
+# 各字段的权重，决定结果排序
+WEIGHTS = {
+    'character': 10,
+    'letter': 10,
+    'pinyin': 8,
+    'word': 8,
+    'meaning': 5,
+    'chinese_meaning': 4,
+    'common_words': 3,
+    'description': 2,
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+# 声调符号 -> 声调数字
+_TONE_MARKS = {'̄': '1', '́': '2', '̌': '3', '̀': '4'}
+_SPLIT = re.compile(r'[\s,，、;；/()（）.。!！?？]+')
+
+
+def normalize(text):
+    """统一为小写NFC形式"""
+    return unicodedata.normalize('NFC', text.strip().lower())
+
+
+def pinyin_tokens(pinyin):
+    """拼音的三种写法：rì -> rì, ri, ri4；ü 同时生成 v 和 u 的写法"""
+    tokens = set()
+    for syllable in _SPLIT.split(normalize(pinyin)):
+        if not syllable:
+            continue
+        tone = ''
+        plain = []
+        for ch in unicodedata.normalize('NFD', syllable):
+            if ch in _TONE_MARKS:
+                tone = _TONE_MARKS[ch]
+            elif ch == '̈':  # ü 的分音符
+                plain[-1] = 'v'
+            elif not unicodedata.combining(ch):
+                plain.append(ch)
+        plain = ''.join(plain)
+        tokens.update({syllable, plain, plain + tone, plain.replace('v', 'u')})
+    return tokens
+
+
+def text_tokens(text):
+    """英文按单词切分，同时保留完整短语"""
+    text = normalize(text)
+    tokens = {word for word in _SPLIT.split(text) if word}
+    if ' ' in text:
+        tokens.add(text)
+    return tokens
+
+
+def chinese_tokens(text):
+    """中文按标点切分为片段，每个片段取所有后缀，前缀匹配后缀即可匹配片段中的任意位置"""
+    tokens = set()
+    for segment in _SPLIT.split(normalize(text)):
+        for i in range(len(segment)):
+            tokens.add(segment[i:])
+    return tokens
+
+
+def build(categories, letters):
+    """
+    根据词库内容生成搜索数据
+
+    Returns:
+        dict: {'documents': [...], 'postings': {词: [[文档序号, 权重], ...]}}
+    """
+    documents = []
+    postings = {}
+
+    def add(doc, fields):
+        doc_id = len(documents)
+        documents.append(doc)
+        weights = {}
+        for field, tokens in fields:
+            for token in tokens:
+                weights[token] = max(weights.get(token, 0), WEIGHTS[field])
+        for token, weight in weights.items():
+            postings.setdefault(token, []).append([doc_id, weight])
+
+    for cat in categories:
+        for char in cat['characters']:
+            image = char.get('image')
+            add({
+                'type': 'character',
+                'character': char['character'],
+                'pinyin': char['pinyin'],
+                'meaning': char['meaning'],
+                'chinese_meaning': char.get('chinese_meaning', ''),
+                'category': cat['category'],
+                'image': image['url'] if image else None,
+            }, [
+                ('character', {char['character']}),
+                ('pinyin', pinyin_tokens(char['pinyin'])),
+                ('meaning', text_tokens(char['meaning'])),
+                ('chinese_meaning', chinese_tokens(char.get('chinese_meaning', ''))),
+                ('common_words', set().union(*(chinese_tokens(w) for w in char.get('common_words', [])))),
+            ])
+
+    for letter in letters:
+        image = letter.get('image')
+        image_url = image['url'] if image else None
+        add({
+            'type': 'letter',
+            'letter': letter['letter'],
+            'lowercase': letter['lowercase'],
+            'phonetic': letter['phonetic'],
+            'description': letter['description'],
+            'image': image_url,
+        }, [
+            ('letter', {normalize(letter['letter'])}),
+            ('pinyin', {normalize(letter['pronunciation'])}),
+            ('description', text_tokens(letter['description'])),
+        ])
+        for word in letter['words']:
+            add({'type': 'word', 'word': word, 'letter': letter['letter'], 'image': image_url},
+                [('word', text_tokens(word))])
+
+    return {'documents': documents, 'postings': postings}
+
+
+class SearchIndex:
+    """
+    内存中的搜索索引：倒排索引 + 前缀树
+
+    Args:
+        data: build() 生成的搜索数据
+    """
+
+    def __init__(self, data):
+        self.documents = data['documents']
+        self.postings = {token: [tuple(p) for p in plist] for token, plist in data['postings'].items()}
+        # 前缀树：每个节点为 {字符: 子节点}，键 None 存放在该节点结束的词
+        self.trie = {}
+        for token in self.postings:
+            node = self.trie
+            for ch in token:
+                node = node.setdefault(ch, {})
+            node[None] = token
+
+    def _prefix_tokens(self, prefix):
+        """返回以prefix开头的所有词"""
+        node = self.trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        tokens = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    tokens.append(child)
+                else:
+                    stack.append(child)
+        return tokens
+
+    def _match(self, term):
+        """单个搜索词的匹配结果：{文档序号: 得分}，完全匹配得全部权重，前缀匹配得一半"""
+        scores = {}
+        for token in self._prefix_tokens(term):
+            factor = 2 if token == term else 1
+            for doc_id, weight in self.postings[token]:
+                score = weight * factor
+                if score > scores.get(doc_id, 0):
+                    scores[doc_id] = score
+        return scores
+
+    def search(self, query, limit=DEFAULT_LIMIT, doc_type=None):
+        """
+        搜索
+
+        Args:
+            query: 搜索词，多个词用空格分隔
+            limit: 返回条数
+            doc_type: 只返回指定类型（character / letter / word）
+        Returns:
+            tuple: (结果列表, 匹配总数)
+        """
+        terms = [term for term in normalize(query).split() if term]
+        if not terms:
+            return [], 0
+
+        scores = None
+        for term in sorted(terms, key=len, reverse=True):
+            matched = self._match(term)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {doc_id: score + matched[doc_id] for doc_id, score in scores.items() if doc_id in matched}
+            if not scores:
+                return [], 0
+
+        if doc_type:
+            scores = {doc_id: score for doc_id, score in scores.items() if self.documents[doc_id]['type'] == doc_type}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        results = [{**self.documents[doc_id], 'score': score} for doc_id, score in ranked[:limit]]
+        return results, len(ranked)
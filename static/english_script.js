@@ -83,6 +83,56 @@ function initAudioContext() {
     }
 }
 
+// 本机设备ID（保存在localStorage中），服务器按设备对写接口限流
+const DEVICE_ID = loadDeviceId();
+
+function loadDeviceId() {
+    try {
+        let id = localStorage.getItem('syword-device-id');
+        if (!id) {
+            id = window.crypto && crypto.randomUUID ? crypto.randomUUID().replace(/-/g, '')
+                : Math.random().toString(36).slice(2) + Date.now().toString(36);
+            localStorage.setItem('syword-device-id', id);
+        }
+        return id;
+    } catch (error) {
+        return '';
+    }
+}
+
+// 答题事件：记录每次点击选项，游戏结束、开始新游戏或离开页面时批量提交（用于学习分析）
+let answerEvents = [];
+let answerAttempt = 0; // 当前题目第几次尝试
+let answerEventGame = null; // {game, game_id}，本局开始时记录
+
+function recordAnswerEvent(question, chosen) {
+    answerAttempt += 1;
+    answerEvents.push({
+        answer: question.correctAnswer,
+        chosen: chosen,
+        attempt: answerAttempt,
+        latency_ms: questionStartTime > 0 ? Date.now() - questionStartTime : 0
+    });
+}
+
+// 使用sendBeacon在后台发送，不影响游戏和页面跳转
+function flushAnswerEvents() {
+    if (answerEvents.length === 0 || !answerEventGame) {
+        answerEvents = [];
+        return;
+    }
+    const body = JSON.stringify({...answerEventGame, events: answerEvents});
+    answerEvents = [];
+    const blob = new Blob([body], {type: 'application/json'});
+    // sendBeacon 不能设置请求头，设备ID放在查询参数中
+    const eventsUrl = `/api/events/answers?device=${encodeURIComponent(DEVICE_ID)}`;
+    if (!(navigator.sendBeacon && navigator.sendBeacon(eventsUrl, blob))) {
+        fetch(eventsUrl, {method: 'POST', body: blob, keepalive: true}).catch(() => {});
+    }
+}
+
+window.addEventListener('pagehide', flushAnswerEvents);
+
 // 开始题目计时
 function startQuestionTimer() {
     questionStartTime = Date.now();
@@ -221,6 +271,102 @@ function getBestEnglishVoice() {
 }
 
 // 使用浏览器语音合成播放英语
+// 播放预生成的语音；没有音频或播放失败时调用 fallback（浏览器语音合成）
+function playVoiceClip(url, fallback, onEnd) {
+    if (!url) {
+        fallback();
+        return;
+    }
+    const audio = new Audio(url);
+    audio.playbackRate = gameSettings.speechRate;
+    if (onEnd) {
+        audio.onended = onEnd;
+    }
+    audio.play().catch(() => fallback());
+}
+
+// 预取本局所有图片和语音（服务器设置了长期缓存），答题时无需等待网络
+function prefetchGameAssets(questions) {
+    const urls = new Set();
+    questions.forEach(question => {
+        if (question.image) urls.add(question.image);
+        if (question.audio) {
+            [question.audio.prompt, question.audio.answer, ...(question.audio.words || [])]
+                .forEach(url => url && urls.add(url));
+        }
+    });
+    urls.forEach(url => fetch(url).catch(() => {}));
+}
+
+// 题目目录缓存在localStorage中，开始游戏时带上版本号，版本一致时服务器只返回精简题目
+const CATALOG_KEY = 'english-alphabet-catalog';
+let questionCatalog = loadCatalog();
+
+function loadCatalog() {
+    try {
+        return JSON.parse(localStorage.getItem(CATALOG_KEY));
+    } catch (error) {
+        return null;
+    }
+}
+
+// 目录与服务器词库版本不一致时在后台更新，下一局即可使用精简题目
+async function refreshCatalog(version) {
+    if (!version || (questionCatalog && questionCatalog.version === version)) {
+        return;
+    }
+    try {
+        const response = await fetch(`/api/catalog/english?v=${encodeURIComponent(version)}`);
+        questionCatalog = await response.json();
+        localStorage.setItem(CATALOG_KEY, JSON.stringify(questionCatalog));
+    } catch (error) {
+        console.warn('题目目录更新失败:', error);
+    }
+}
+
+// 由目录还原精简题目，结构与完整题目相同
+function expandQuestions(data) {
+    if (!data.compact) {
+        return data.questions;
+    }
+    const type = data.gameType;
+    return data.questions.map(question => {
+        const entry = questionCatalog.letters[question.id];
+        let correctAnswer = question.id;
+        if (type === 'letter_pairing') {
+            correctAnswer = entry.lowercase;
+        } else if (type === 'word_matching') {
+            correctAnswer = question.answer;
+        }
+        let answerAudio = null;
+        if (entry.audio) {
+            if (type === 'word_matching') {
+                answerAudio = entry.audio.words[correctAnswer] || null;
+            } else {
+                answerAudio = type === 'letter_recognition' ? entry.audio.letter : entry.audio.lowercase;
+            }
+        }
+        return {
+            image: entry.image,
+            correctAnswer: correctAnswer,
+            options: question.options,
+            voiceText: questionCatalog.prompts[type]
+                .replace('{letter}', question.id)
+                .replace('{lowercase}', entry.lowercase),
+            pronunciation: entry.pronunciation,
+            phonetic: entry.phonetic,
+            words: entry.words,
+            description: entry.description,
+            letter: question.id,
+            audio: entry.audio ? {
+                prompt: entry.audio.prompts[type],
+                answer: answerAudio,
+                words: entry.words.map(word => entry.audio.words[word] || null)
+            } : null
+        };
+    });
+}
+
 function speakEnglish(text, lang = 'en-US') {
     if ('speechSynthesis' in window) {
         // 停止当前播放
@@ -376,7 +522,7 @@ function speakWordsSequentially(words, callback) {
 }
 
 // 按顺序朗读单词（用于答题正确后）
-function speakWords(words, callback) {
+function speakWords(words, audioUrls, callback) {
     if (!words || words.length === 0) {
         if (callback) callback();
         return;
@@ -401,28 +547,33 @@ function speakWords(words, callback) {
         // 高亮当前单词
         highlightCurrentWord(currentIndex);
         
-        // 创建语音实例
-        const utterance = new SpeechSynthesisUtterance(word);
-        utterance.lang = 'en-US';
-        utterance.rate = gameSettings.speechRate;
-        utterance.pitch = 1.0;
-        utterance.volume = 1.0;
-        
-        // 使用最佳英语声音
-        const bestVoice = getBestEnglishVoice();
-        if (bestVoice) {
-            utterance.voice = bestVoice;
-        }
-        
         // 播放完成后继续下一个
-        utterance.onend = function() {
+        function onWordEnd() {
             currentIndex++;
             // 添加短暂延迟，让单词之间有间隔
             setTimeout(speakNext, 300);
-        };
+        }
+        
+        // 没有预生成语音时使用浏览器语音合成
+        function synthesize() {
+            const utterance = new SpeechSynthesisUtterance(word);
+            utterance.lang = 'en-US';
+            utterance.rate = gameSettings.speechRate;
+            utterance.pitch = 1.0;
+            utterance.volume = 1.0;
+            
+            // 使用最佳英语声音
+            const bestVoice = getBestEnglishVoice();
+            if (bestVoice) {
+                utterance.voice = bestVoice;
+            }
+            
+            utterance.onend = onWordEnd;
+            window.speechSynthesis.speak(utterance);
+        }
         
         // 播放
-        window.speechSynthesis.speak(utterance);
+        playVoiceClip(audioUrls && audioUrls[currentIndex], synthesize, onWordEnd);
     }
     
     speakNext();
@@ -504,6 +655,9 @@ async function initGame() {
     gameType = gameTypeSelect.value;
     difficulty = difficultySelect.value;
     
+    // 提交上一局未提交的答题事件
+    flushAnswerEvents();
+    
     // 从API获取游戏数据
     try {
         const response = await fetch('/api/english/game/start', {
@@ -513,13 +667,17 @@ async function initGame() {
             },
             body: JSON.stringify({
                 game_type: gameType,
-                difficulty: difficulty
+                difficulty: difficulty,
+                catalog_version: questionCatalog ? questionCatalog.version : null
             })
         });
         
         const data = await response.json();
-        gameData = data.questions;
+        gameData = expandQuestions(data);
+        prefetchGameAssets(gameData);
+        answerEventGame = {game: `english:${gameType}`, game_id: data.gameId || null};
         loadQuestion();
+        refreshCatalog(data.catalogVersion);
     } catch (error) {
         console.error('获取游戏数据失败:', error);
         showFeedback('游戏加载失败，请刷新页面重试', 'wrong');
@@ -569,6 +727,7 @@ function loadQuestion() {
     gameActive = true;
     
     // 开始计时
+    answerAttempt = 0;
     startQuestionTimer();
     
     // 启动定时器实时更新时间显示
@@ -581,11 +740,11 @@ function loadQuestion() {
     if (gameSettings.readLetterStart) {
         setTimeout(() => {
             // 先朗读字母
-            speakEnglish(question.correctAnswer);
+            playVoiceClip(question.audio && question.audio.answer, () => speakEnglish(question.correctAnswer));
             
             setTimeout(() => {
                 const firstWord = question.words[0];
-                speakEnglish(firstWord);
+                playVoiceClip(question.audio && question.audio.words[0], () => speakEnglish(firstWord));
 
             }, 1500); // 字母读完后1.5秒开始读单词
         }, 500); // 延迟500毫秒朗读，让图片先显示
@@ -599,6 +758,7 @@ function selectOption(selectedOption, buttonElement) {
     gameActive = false;
     const question = gameData[currentQuestionIndex];
     const isCorrect = selectedOption === question.correctAnswer;
+    recordAnswerEvent(question, selectedOption);
     
     if (isCorrect) {
         // 停止计时并记录
@@ -626,12 +786,12 @@ function selectOption(selectedOption, buttonElement) {
         
         // 延迟播放字母发音，然后朗读相关单词
         setTimeout(() => {
-            speakEnglish(question.correctAnswer);
+            playVoiceClip(question.audio && question.audio.answer, () => speakEnglish(question.correctAnswer));
             
             // 字母读完后朗读相关单词
             setTimeout(() => {
                 if (gameSettings.readWords && question.words && question.words.length > 0) {
-                    speakWords(question.words, () => {
+                    speakWords(question.words, question.audio && question.audio.words, () => {
                         // 所有单词读完后隐藏单词显示区域
                         hideWords();
                         showFeedback('朗读完成！准备下一题...', 'correct');
@@ -718,6 +878,8 @@ function endGame() {
         console.log('游戏结束时停止最后一题计时器，用时:', finalQuestionTime, 'ms');
     }
     
+    flushAnswerEvents();
+    
     // 计算最终时间统计
     const finalTime = totalTime;
     const averageTime = questionTimes.length > 0 ? Math.round(finalTime / questionTimes.length) : 0;
@@ -815,9 +977,9 @@ async function submitFeedback() {
         return;
     }
     
-    // 从图片路径中提取文件名
+    // 从图片路径中提取文件名（去掉内容哈希参数）
     const imagePath = currentQuestion.image;
-    const imageFile = imagePath.split('/').pop();
+    const imageFile = imagePath.split('?')[0].split('/').pop();
     const letter = currentQuestion.correctAnswer;
     
     try {
@@ -825,6 +987,7 @@ async function submitFeedback() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'X-Device-ID': DEVICE_ID,
             },
             body: JSON.stringify({
                 character: letter,
@@ -8,6 +8,16 @@ let gameActive = true;
 let autoNextTimer = null;
 let currentQuestion = null; // 当前题目数据
 let isInSubmissionMode = false; // 是否在提交页面
+let currentGameId = null; // 服务器生成的本局游戏ID，提交成绩时带回
+
+// 课堂房间模式（/?room=房间号）：题目由房间统一下发，成绩提交到房间排行榜
+const roomCode = new URLSearchParams(window.location.search).get('room');
+let roomInfo = null; // {code, round, category}，本轮题目中的房间信息
+let roomEvents = null;
+
+// 固定种子的题目：/?seed=种子 重现同一局题目，每日挑战使用当天的种子（所有人同一局）
+const gameSeed = new URLSearchParams(window.location.search).get('seed');
+let dailyMode = false;
 
 // 最近三次的汉字记录，用于避免重复
 let recentWords = [];
@@ -87,6 +97,56 @@ function updateRecentWords(word) {
     }
 }
 
+// 本机设备ID（保存在localStorage中），服务器按设备对写接口限流
+const DEVICE_ID = loadDeviceId();
+
+function loadDeviceId() {
+    try {
+        let id = localStorage.getItem('syword-device-id');
+        if (!id) {
+            id = window.crypto && crypto.randomUUID ? crypto.randomUUID().replace(/-/g, '')
+                : Math.random().toString(36).slice(2) + Date.now().toString(36);
+            localStorage.setItem('syword-device-id', id);
+        }
+        return id;
+    } catch (error) {
+        return '';
+    }
+}
+
+// 答题事件：记录每次点击选项，游戏结束、开始新游戏或离开页面时批量提交（用于学习分析）
+let answerEvents = [];
+let answerAttempt = 0; // 当前题目第几次尝试
+let answerEventGame = null; // {game, game_id}，本局开始时记录
+
+function recordAnswerEvent(question, chosen) {
+    answerAttempt += 1;
+    answerEvents.push({
+        answer: question.correctAnswer,
+        chosen: chosen,
+        attempt: answerAttempt,
+        latency_ms: questionStartTime > 0 ? Date.now() - questionStartTime : 0
+    });
+}
+
+// 使用sendBeacon在后台发送，不影响游戏和页面跳转
+function flushAnswerEvents() {
+    if (answerEvents.length === 0 || !answerEventGame) {
+        answerEvents = [];
+        return;
+    }
+    const body = JSON.stringify({...answerEventGame, events: answerEvents});
+    answerEvents = [];
+    const blob = new Blob([body], {type: 'application/json'});
+    // sendBeacon 不能设置请求头，设备ID放在查询参数中
+    const eventsUrl = `/api/events/answers?device=${encodeURIComponent(DEVICE_ID)}`;
+    if (!(navigator.sendBeacon && navigator.sendBeacon(eventsUrl, blob))) {
+        fetch(eventsUrl, {method: 'POST', body: blob, keepalive: true}).catch(() => {});
+    }
+}
+
+window.addEventListener('pagehide', flushAnswerEvents);
+
 // 开始题目计时
 function startQuestionTimer() {
     questionStartTime = Date.now();
@@ -215,17 +275,25 @@ async function submitScore() {
     console.log('- 答题次数:', questionTimes.length);
     console.log('- 各题用时:', questionTimes);
     
+    if (roomInfo) {
+        await submitRoomScore(nickname);
+        return;
+    }
+    
     try {
         const response = await fetch('/api/leaderboard/submit', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'X-Device-ID': DEVICE_ID,
             },
             body: JSON.stringify({
                 nickname: nickname,
                 score: score,
                 total_time: totalTime, // 毫秒
-                average_time: averageTime // 毫秒
+                average_time: averageTime, // 毫秒
+                game: categorySelect.value ? `chinese:${categorySelect.value}` : 'chinese',
+                game_id: currentGameId
             })
         });
         
@@ -246,6 +314,53 @@ async function submitScore() {
     }
 }
 
+// 房间模式：成绩只进入房间本轮排行榜，提交后留在页面等待老师开始下一轮
+async function submitRoomScore(nickname) {
+    try {
+        const response = await fetch(`/api/rooms/${encodeURIComponent(roomInfo.code)}/scores`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Device-ID': DEVICE_ID,
+            },
+            body: JSON.stringify({
+                nickname: nickname,
+                score: score,
+                total_time: totalTime,
+                round: roomInfo.round
+            })
+        });
+        const data = await response.json();
+        if (data.success) {
+            showRankResult(data.message, 'success');
+            setTimeout(() => {
+                hideNicknameModal();
+                showGameOverModal();
+            }, 2000);
+        } else {
+            showRankResult(data.error || '提交失败', 'error');
+        }
+    } catch (error) {
+        console.error('提交房间成绩失败:', error);
+        showRankResult('网络错误，请稍后重试', 'error');
+    }
+}
+
+// 订阅房间推送：老师开始新一轮时自动开始（正在提交成绩时除外，提交后再玩一次即为新一轮）
+function joinRoomEvents() {
+    roomEvents = new EventSource(`/api/rooms/${encodeURIComponent(roomCode)}/stream`);
+    roomEvents.addEventListener('round', (event) => {
+        const data = JSON.parse(event.data);
+        if (!isInSubmissionMode && (!roomInfo || data.round !== roomInfo.round)) {
+            initGame();
+        }
+    });
+    roomEvents.addEventListener('closed', () => {
+        roomEvents.close();
+        showFeedback('房间已关闭', 'wrong');
+    });
+}
+
 function showRankResult(message, type) {
     rankResultElement.textContent = message;
     rankResultElement.className = `rank-result ${type}`;
@@ -256,6 +371,84 @@ function showGameOverModal() {
     gameOverModal.classList.add('show');
 }
 
+// 播放预生成的语音；没有音频或播放失败时调用 fallback（浏览器语音合成）
+function playVoiceClip(url, fallback, onEnd) {
+    if (!url) {
+        fallback();
+        return;
+    }
+    const audio = new Audio(url);
+    audio.playbackRate = gameSettings.speechRate;
+    if (onEnd) {
+        audio.onended = onEnd;
+    }
+    audio.play().catch(() => fallback());
+}
+
+// 预取本局所有图片和语音（服务器设置了长期缓存），答题时无需等待网络
+function prefetchGameAssets(questions) {
+    const urls = new Set();
+    questions.forEach(question => {
+        if (question.image) urls.add(question.image);
+        if (question.audio) {
+            [question.audio.prompt, question.audio.answer, ...(question.audio.common_words || [])]
+                .forEach(url => url && urls.add(url));
+        }
+    });
+    urls.forEach(url => fetch(url).catch(() => {}));
+}
+
+// 题目目录缓存在localStorage中，开始游戏时带上版本号，版本一致时服务器只返回精简题目
+const CATALOG_KEY = 'syword-catalog-chinese';
+let questionCatalog = loadCatalog();
+
+function loadCatalog() {
+    try {
+        return JSON.parse(localStorage.getItem(CATALOG_KEY));
+    } catch (error) {
+        return null;
+    }
+}
+
+// 目录与服务器词库版本不一致时在后台更新，下一局即可使用精简题目
+async function refreshCatalog(version) {
+    if (!version || (questionCatalog && questionCatalog.version === version)) {
+        return;
+    }
+    try {
+        const response = await fetch(`/api/catalog/chinese?v=${encodeURIComponent(version)}`);
+        questionCatalog = await response.json();
+        localStorage.setItem(CATALOG_KEY, JSON.stringify(questionCatalog));
+    } catch (error) {
+        console.warn('题目目录更新失败:', error);
+    }
+}
+
+// 由目录还原精简题目，结构与完整题目相同
+function expandQuestions(data) {
+    if (!data.compact) {
+        return data.questions;
+    }
+    return data.questions.map(question => {
+        const entry = questionCatalog.characters[question.id];
+        const commonWords = question.words.map(index => entry.common_words[index]);
+        return {
+            image: entry.image,
+            correctAnswer: question.id,
+            options: question.options,
+            voiceText: questionCatalog.prompt.replace('{character}', question.id),
+            pinyin: entry.pinyin,
+            meaning: entry.meaning,
+            common_words: commonWords,
+            audio: entry.audio ? {
+                prompt: entry.audio.prompt,
+                answer: entry.audio.character,
+                common_words: commonWords.map(word => entry.audio.common_words[word] || null)
+            } : null
+        };
+    });
+}
+
 // 使用浏览器语音合成播放拼音
 function speakPinyin(pinyinText) {
     // 检查浏览器是否支持
@@ -361,7 +554,7 @@ function highlightCurrentWord(index) {
 }
 
 // 按顺序朗读常见词语
-function speakCommonWords(commonWords, callback) {
+function speakCommonWords(commonWords, audioUrls, callback) {
     if (!commonWords || commonWords.length === 0) {
         if (callback) callback();
         return;
@@ -386,38 +579,43 @@ function speakCommonWords(commonWords, callback) {
         // 高亮当前词语
         highlightCurrentWord(currentIndex);
         
-        // 创建语音实例
-        const utterance = new SpeechSynthesisUtterance(word);
-        utterance.lang = 'zh-CN';
-        utterance.rate = gameSettings.speechRate;
-        utterance.pitch = 1.0;
-        utterance.volume = 1;
-        
-        // 设置声音
-        const voices = speechSynthesis.getVoices();
-        const chineseVoice = voices.find(voice => voice.lang === 'zh-CN' || voice.lang === 'zh');
-        if (chineseVoice) {
-            utterance.voice = chineseVoice;
-        }
-        
         // 播放完成后继续下一个
-        utterance.onend = function() {
+        function onWordEnd() {
             currentIndex++;
             // 添加短暂延迟，让词语之间有间隔
             setTimeout(speakNext, 300);
-        };
+        }
+        
+        // 没有预生成语音时使用浏览器语音合成
+        function synthesize() {
+            const utterance = new SpeechSynthesisUtterance(word);
+            utterance.lang = 'zh-CN';
+            utterance.rate = gameSettings.speechRate;
+            utterance.pitch = 1.0;
+            utterance.volume = 1;
+            
+            // 设置声音
+            const voices = speechSynthesis.getVoices();
+            const chineseVoice = voices.find(voice => voice.lang === 'zh-CN' || voice.lang === 'zh');
+            if (chineseVoice) {
+                utterance.voice = chineseVoice;
+            }
+            
+            utterance.onend = onWordEnd;
+            window.speechSynthesis.speak(utterance);
+        }
         
         // 播放
-        window.speechSynthesis.speak(utterance);
+        playVoiceClip(audioUrls && audioUrls[currentIndex], synthesize, onWordEnd);
     }
     
     speakNext();
 }
 
 // 播放完整拼音拼读（使用语音合成）
-function playPinyinPronunciation(pinyin) {
+function playPinyinPronunciation(pinyin, audioUrl) {
     console.log('开始播放拼音拼读:', pinyin);
-    speakPinyin(pinyin);
+    playVoiceClip(audioUrl, () => speakPinyin(pinyin));
 }
 
 // 生成正确音效
@@ -515,27 +713,54 @@ async function initGame() {
         timeUpdateInterval = null;
     }
     
+    // 提交上一局未提交的答题事件
+    flushAnswerEvents();
+    
     // 从API获取游戏数据
     try {
-        const selectedCategory = categorySelect.value;
-        const url = selectedCategory ? `/api/game/start?category=${encodeURIComponent(selectedCategory)}` : '/api/game/start';
-        
-        // 构建请求参数，包含最近三次的汉字
-        const requestData = {
-            recent_words: recentWords
-        };
-        
-        const response = await fetch(url, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(requestData)
-        });
+        let response;
+        if (roomCode) {
+            const version = questionCatalog ? `?catalog_version=${encodeURIComponent(questionCatalog.version)}` : '';
+            response = await fetch(`/api/rooms/${encodeURIComponent(roomCode)}/game${version}`);
+            if (!response.ok) {
+                showFeedback('房间不存在或已过期', 'wrong');
+                return;
+            }
+        } else if (gameSeed || dailyMode) {
+            // 固定种子的题目是GET请求，可以被浏览器和代理缓存
+            const params = new URLSearchParams();
+            if (categorySelect.value) params.set('category', categorySelect.value);
+            if (questionCatalog) params.set('catalog_version', questionCatalog.version);
+            const path = dailyMode ? '/api/game/daily' : `/api/game/seed/${encodeURIComponent(gameSeed)}`;
+            response = await fetch(`${path}?${params}`);
+        } else {
+            const selectedCategory = categorySelect.value;
+            const url = selectedCategory ? `/api/game/start?category=${encodeURIComponent(selectedCategory)}` : '/api/game/start';
+            
+            // 构建请求参数，包含最近三次的汉字
+            const requestData = {
+                recent_words: recentWords,
+                catalog_version: questionCatalog ? questionCatalog.version : null
+            };
+            
+            response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(requestData)
+            });
+        }
         
         const data = await response.json();
-        gameData = data.questions;
+        gameData = expandQuestions(data);
+        currentGameId = data.gameId || null;
+        roomInfo = data.room || null;
+        prefetchGameAssets(gameData);
+        const category = roomInfo ? roomInfo.category : categorySelect.value;
+        answerEventGame = {game: category ? `chinese:${category}` : 'chinese', game_id: currentGameId};
         loadQuestion();
+        refreshCatalog(data.catalogVersion);
     } catch (error) {
         console.error('获取游戏数据失败:', error);
         showFeedback('游戏加载失败，请刷新页面重试', 'wrong');
@@ -590,6 +815,7 @@ function loadQuestion() {
     }
     
     // 开始计时
+    answerAttempt = 0;
     startQuestionTimer();
     
     // 启动定时器实时更新时间显示
@@ -601,7 +827,7 @@ function loadQuestion() {
     // 根据设置决定是否朗读汉字
     if (gameSettings.readWordStart) {
         setTimeout(() => {
-            speakChineseWord(question.correctAnswer);
+            playVoiceClip(question.audio && question.audio.answer, () => speakChineseWord(question.correctAnswer));
         }, 500); // 延迟500毫秒朗读，让图片先显示
     }
 }
@@ -613,6 +839,7 @@ function selectOption(selectedOption, buttonElement) {
     gameActive = false;
     const question = gameData[currentQuestionIndex];
     const isCorrect = selectedOption === question.correctAnswer;
+    recordAnswerEvent(question, selectedOption);
     
     if (isCorrect) {
         // 停止计时并记录
@@ -643,12 +870,12 @@ function selectOption(selectedOption, buttonElement) {
         
         // 延迟播放拼音拼读，然后朗读常见词语
         setTimeout(() => {
-            playPinyinPronunciation(question.pinyin);
+            playPinyinPronunciation(question.pinyin, question.audio && question.audio.answer);
             
             // 拼音读完后朗读常见词语
             setTimeout(() => {
                 if (gameSettings.readCommonWords && question.common_words && question.common_words.length > 0) {
-                    speakCommonWords(question.common_words, () => {
+                    speakCommonWords(question.common_words, question.audio && question.audio.common_words, () => {
                         // 所有词语读完后隐藏词语显示区域
                         hideCommonWords();
                         showFeedback('朗读完成！准备下一题...', 'correct');
@@ -754,6 +981,8 @@ function endGame() {
         console.log('游戏结束时停止最后一题计时器，用时:', finalQuestionTime, 'ms');
     }
     
+    flushAnswerEvents();
+    
     // 计算最终时间统计
     const finalTime = totalTime;
     const averageTime = questionTimes.length > 0 ? Math.round(finalTime / questionTimes.length) : 0;
@@ -787,7 +1016,14 @@ function testPinyinPronunciation() {
 // 事件监听器
 restartBtn.addEventListener('click', restartGame);
 playAgainBtn.addEventListener('click', restartGame);
-newGameBtn.addEventListener('click', initGame);
+newGameBtn.addEventListener('click', () => {
+    dailyMode = false;
+    initGame();
+});
+document.getElementById('daily-game-btn').addEventListener('click', () => {
+    dailyMode = true;
+    initGame();
+});
 
 // 设置相关事件监听器
 settingsBtn.addEventListener('click', showSettings);
@@ -839,6 +1075,11 @@ document.addEventListener('keydown', (e) => {
 document.addEventListener('DOMContentLoaded', async () => {
     loadSettings(); // 加载设置
     await loadCategories();
+    if (roomCode) {
+        // 房间模式由老师选择分类
+        categorySelect.disabled = true;
+        joinRoomEvents();
+    }
     
     // 检查是否有弹窗显示，如果没有才自动开始游戏
     const hasModalOpen = document.querySelector('.modal.show') || 
@@ -871,9 +1112,9 @@ async function submitFeedback() {
         return;
     }
     
-    // 从图片路径中提取文件名
+    // 从图片路径中提取文件名（去掉内容哈希参数）
     const imagePath = currentQuestion.image;
-    const imageFile = imagePath.split('/').pop();
+    const imageFile = imagePath.split('?')[0].split('/').pop();
     const character = currentQuestion.correctAnswer;
     
     try {
@@ -881,6 +1122,7 @@ async function submitFeedback() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'X-Device-ID': DEVICE_ID,
             },
             body: JSON.stringify({
                 character: character,
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态文件服务
+在请求进入Flask之前处理 /static/ 和 /audio/，不经过路由、请求上下文和钩子：
+- 零拷贝发送：通过 wsgi.file_wrapper 交给服务器（gunicorn 使用 os.sendfile），
+  ASGI模式下在事件循环中发送，服务器支持 zerocopysend 扩展时同样零拷贝
+- 条件请求：ETag / Last-Modified，未变化时返回304
+- 范围请求：单个 Range（含 If-Range），音频拖动和断点续传只传所需部分
+- 预压缩：存在较新的 .br / .gz 同名文件且客户端支持时直接发送，不在请求时压缩
+- 缓存头：带内容哈希（?v=）的URL和 /audio/ 下按内容寻址的文件缓存一年且不可变，
+  其他文件默认 no-cache（每次用 ETag / Last-Modified 重新验证，未变化时304）；
+  v= 与文件当前的内容哈希不一致（旧版本或随意构造的值）时按未带哈希处理，不会把新内容长期缓存在旧URL下
+- 模板中的 url_for('static', filename=...) 自动带上文件的内容哈希 ?v=，
+  部署后浏览器立即加载新的JS/CSS，不会用旧脚本调用新接口
+- 交给前置服务器发送：STATIC_OFFLOAD=x-accel（nginx）或 x-sendfile（Apache/lighttpd），
+  应用只返回响应头，图片流量完全不占用worker
+
+nginx 配置示例（STATIC_OFFLOAD=x-accel，STATIC_OFFLOAD_PREFIX 默认 /_internal）:
+    location /_internal/static/ { internal; alias /srv/syword/static/; }
+    location /_internal/audio/  { internal; alias /srv/syword/data/audio/; }
+
+环境变量:
+    STATIC_OFFLOAD: 留空（应用自己发送）/ x-accel / x-sendfile
+    STATIC_OFFLOAD_PREFIX: x-accel 模式下nginx内部location的前缀，默认 /_internal
+    STATIC_MAX_AGE: 未带内容哈希的静态文件缓存秒数，默认 0（no-cache，每次重新验证）
+
+生成预压缩文件（部署时执行，安装 brotli 后同时生成 .br）:
+    python static_files.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import quote
+
+from werkzeug.security import safe_join
+
+from metrics import STATIC_RESPONSES
+
+try:
+    import brotli
+except ImportError:  # 未安装时只使用 .gz
+    brotli = None
+
+# 一年，按内容寻址的文件永不变化
+IMMUTABLE_MAX_AGE = 365 * 86400
+
+# 预压缩的文件类型（图片和音频本身已压缩）
+COMPRESSIBLE = ('.css', '.js', '.html', '.svg', '.json', '.txt', '.ico')
+
+# 内容编码 -> 预压缩文件后缀，按优先级排列
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CHUNK_SIZE = 64 * 1024
+
+# 部分系统的 mime.types 没有 Opus
+mimetypes.add_type('audio/ogg', '.opus')
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_VERSIONED = re.compile(r'(?:^|&)v=([0-9a-f]{6,})(?:&|$)')
+
+
+class Mount:
+    """
+    URL前缀到目录的映射
+
+    Args:
+        prefix: URL前缀，如 /static/
+        directory: 文件目录
+        name: x-accel 模式下nginx内部location的名字
+        immutable: 目录下的文件按内容命名，总是长期缓存
+    """
+
+    def __init__(self, prefix, directory, name, immutable=False):
+        self.prefix = prefix
+        self.directory = os.path.abspath(directory)
+        self.name = name
+        self.immutable = immutable
+
+
+class Plan:
+    """一次静态文件响应：状态码、响应头，以及要发送的文件区间（path为None时没有响应体）"""
+
+    __slots__ = ('status', 'headers', 'path', 'offset', 'length', 'mount')
+
+    def __init__(self, status, headers, path=None, offset=0, length=0, mount=None):
+        self.status = status
+        self.headers = headers
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.mount = mount
+
+
+def _accepted_encodings(header):
+    """解析 Accept-Encoding，返回可接受（q>0）的编码集合"""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+def _etag(stat, suffix=''):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+
+def _not_modified(headers, etag, mtime):
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header, size):
+    """解析单个字节范围，返回 (offset, length)；不支持的格式返回None（发送完整文件），不可满足返回False"""
+    match = _RANGE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if start == '':
+        length = min(int(end), size)
+        return (size - length, length) if length > 0 else False
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end - start + 1
+
+
+class StaticFiles:
+    """
+    静态文件解析，与服务器接口无关，WSGI中间件和ASGI应用共用
+
+    Args:
+        mounts: Mount 列表
+        offload: None / 'x-accel' / 'x-sendfile'
+        offload_prefix: x-accel 模式的内部location前缀
+        max_age: 未带内容哈希的文件的缓存秒数，0 表示 no-cache（每次重新验证）
+    """
+
+    def __init__(self, mounts, offload=None, offload_prefix='/_internal', max_age=0):
+        self.mounts = mounts
+        self.offload = offload
+        self.offload_prefix = offload_prefix.rstrip('/')
+        self.max_age = max_age
+        # 文件路径 -> (修改时间, 大小, 内容哈希)
+        self._versions = {}
+
+    def version(self, mount, filename):
+        """文件内容哈希的前12位（用作URL中的 v=），文件不存在时返回None"""
+        file_path = safe_join(mount.directory, filename)
+        if file_path is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        cached = self._versions.get(file_path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        version = digest.hexdigest()[:12]
+        self._versions[file_path] = (stat.st_mtime_ns, stat.st_size, version)
+        return version
+
+    def _current_version(self, mount, path, query):
+        """查询参数 v= 是否为文件当前的内容哈希"""
+        versioned = _VERSIONED.search(query)
+        return versioned is not None and versioned.group(1) == self.version(mount, path[len(mount.prefix):])
+
+    def match(self, path):
+        for mount in self.mounts:
+            if path.startswith(mount.prefix):
+                return mount
+        return None
+
+    def resolve(self, method, path, query, headers):
+        """
+        根据请求生成响应计划；不是静态文件请求或文件不存在时返回None（交给应用处理）
+
+        Args:
+            path: 已解码的URL路径
+            query: 查询字符串
+            headers: 小写请求头名 -> 值
+        """
+        if method not in ('GET', 'HEAD'):
+            return None
+        mount = self.match(path)
+        if mount is None:
+            return None
+        file_path = safe_join(mount.directory, path[len(mount.prefix):])
+        if file_path is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if not os.path.isfile(file_path):
+            return None
+
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        if mount.immutable or self._current_version(mount, path, query):
+            cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        elif self.max_age:
+            cache_control = f'public, max-age={self.max_age}'
+        else:
+            cache_control = 'no-cache'
+        response_headers = [('Content-Type', content_type), ('Cache-Control', cache_control)]
+
+        if self.offload:
+            return self._offload_plan(mount, path, file_path, response_headers)
+
+        # 选择预压缩文件：必须比原文件新，避免发送过期内容
+        encoding = None
+        if file_path.endswith(COMPRESSIBLE):
+            response_headers.append(('Vary', 'Accept-Encoding'))
+            accepted = _accepted_encodings(headers.get('accept-encoding', ''))
+            for name, suffix in ENCODINGS:
+                if name not in accepted:
+                    continue
+                try:
+                    encoded_stat = os.stat(file_path + suffix)
+                except OSError:
+                    continue
+                if encoded_stat.st_mtime_ns >= stat.st_mtime_ns:
+                    encoding, file_path, stat = name, file_path + suffix, encoded_stat
+                    response_headers.append(('Content-Encoding', name))
+                    break
+
+        etag = _etag(stat, f'-{encoding}' if encoding else '')
+        last_modified = format_datetime(datetime.fromtimestamp(int(stat.st_mtime), timezone.utc), usegmt=True)
+        response_headers += [('ETag', etag), ('Last-Modified', last_modified), ('Accept-Ranges', 'bytes')]
+
+        if _not_modified(headers, etag, stat.st_mtime):
+            return Plan(304, response_headers, mount=mount)
+
+        size = stat.st_size
+        offset, length, status = 0, size, 200
+        range_header = headers.get('range')
+        if range_header and size:
+            if_range = headers.get('if-range')
+            if not if_range or if_range.strip() in (etag, last_modified):
+                byte_range = _parse_range(range_header, size)
+                if byte_range is False:
+                    return Plan(416, response_headers + [('Content-Range', f'bytes */{size}'),
+                                                         ('Content-Length', '0')], mount=mount)
+                if byte_range is not None:
+                    offset, length = byte_range
+                    status = 206
+                    response_headers.append(('Content-Range', f'bytes {offset}-{offset + length - 1}/{size}'))
+
+        response_headers.append(('Content-Length', str(length)))
+        if method == 'HEAD':
+            return Plan(status, response_headers, mount=mount)
+        return Plan(status, response_headers, file_path, offset, length, mount)
+
+    def _offload_plan(self, mount, path, file_path, headers):
+        """只返回响应头，由前置服务器发送文件（同时处理条件请求和范围请求）"""
+        if self.offload == 'x-accel':
+            location = f'{self.offload_prefix}/{mount.name}/{path[len(mount.prefix):]}'
+            headers.append(('X-Accel-Redirect', quote(location)))
+        else:
+            # 响应头只能是latin-1，按UTF-8字节原样传递文件路径
+            headers.append(('X-Sendfile', file_path.encode('utf-8').decode('latin-1')))
+        return Plan(200, headers, mount=mount)
+
+
+def _read_range(f, length):
+    """按块读取文件的指定长度"""
+    try:
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class StaticMiddleware:
+    """WSGI中间件：静态文件请求直接响应，其余请求交给应用"""
+
+    def __init__(self, wsgi_app, static_files):
+        self.wsgi_app = wsgi_app
+        self.static_files = static_files
+
+    def __call__(self, environ, start_response):
+        # PATH_INFO 是按latin-1解码的原始字节，还原为UTF-8路径（图片名为中文）
+        path = environ.get('PATH_INFO', '').encode('latin-1').decode('utf-8', 'replace')
+        if self.static_files.match(path) is None:
+            return self.wsgi_app(environ, start_response)
+
+        headers = {key[5:].replace('_', '-').lower(): value
+                   for key, value in environ.items() if key.startswith('HTTP_')}
+        plan = self.static_files.resolve(environ['REQUEST_METHOD'], path, environ.get('QUERY_STRING', ''), headers)
+        if plan is None:
+            return self.wsgi_app(environ, start_response)
+
+        STATIC_RESPONSES.inc(mount=plan.mount.name, status=plan.status)
+        start_response(f'{plan.status} {_REASONS[plan.status]}', plan.headers)
+        if plan.path is None:
+            return [b'']
+        f = open(plan.path, 'rb')
+        f.seek(plan.offset)
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        # file_wrapper 会发送到文件末尾，只在区间到达文件末尾时使用
+        if file_wrapper is not None and plan.offset + plan.length == os.fstat(f.fileno()).st_size:
+            return file_wrapper(f, CHUNK_SIZE)
+        return _read_range(f, plan.length)
+
+
+_REASONS = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 416: 'Range Not Satisfiable'}
+
+
+def init_static(app, audio_dir):
+    """按环境变量在应用最外层安装静态文件中间件，返回 StaticFiles 供ASGI模式复用"""
+    offload = os.getenv('STATIC_OFFLOAD') or None
+    if offload not in (None, 'x-accel', 'x-sendfile'):
+        raise ValueError(f'STATIC_OFFLOAD 只能是 x-accel 或 x-sendfile: {offload}')
+    static_mount = Mount(app.static_url_path.rstrip('/') + '/', app.static_folder, 'static')
+    static_files = StaticFiles(
+        [
+            static_mount,
+            Mount('/audio/', audio_dir, 'audio', immutable=True),
+        ],
+        offload=offload,
+        offload_prefix=os.getenv('STATIC_OFFLOAD_PREFIX', '/_internal'),
+        max_age=int(os.getenv('STATIC_MAX_AGE', '0')),
+    )
+    app.wsgi_app = StaticMiddleware(app.wsgi_app, static_files)
+
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        """url_for('static', filename=...) 带上内容哈希，文件变化后URL随之变化，可长期缓存"""
+        if endpoint != 'static' or 'v' in values or 'filename' not in values:
+            return
+        version = static_files.version(static_mount, values['filename'])
+        if version is not None:
+            values['v'] = version
+
+    return static_files
+
+
+def compress_directory(directory, min_size=512):
+    """为可压缩的静态文件生成 .gz（以及 .br）预压缩文件，只处理新增或变化的文件"""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            if stat.st_size < min_size:
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            encoders = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+            for suffix, encode in encoders:
+                target = path + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime_ns >= stat.st_mtime_ns:
+                    continue
+                encoded = encode(content)
+                # 压缩后没有明显变小时不生成，直接发送原文件
+                if len(encoded) >= len(content) * 0.9:
+                    continue
+                with open(f'{target}.tmp', 'wb') as f:
+                    f.write(encoded)
+                os.replace(f'{target}.tmp', target)
+                written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为静态文件生成预压缩文件')
+    parser.add_argument('--dir', default='static', help='静态文件目录 (默认: static)')
+    parser.add_argument('--min-size', type=int, default=512, help='小于该字节数的文件不压缩 (默认: 512)')
+    args = parser.parse_args()
+    written = compress_directory(args.dir, args.min_size)
+    print(f"生成预压缩文件: {written} 个{'' if brotli else '（未安装 brotli，只生成 .gz）'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""答题事件汇总和命令行输出"""
+
+import sqlite3
+import sys
+
+import answer_events
+
+
+def run_cli(db_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['answer_events.py', '--db', db_path])
+    answer_events.main()
+    return {line.split()[0]: line for line in capsys.readouterr().out.splitlines()[1:]}
+
+
+def test_cli_prints_dash_for_missing_solve_time(tmp_path, monkeypatch, capsys):
+    db_path = str(tmp_path / 'leaderboard.db')
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    answer_events.ensure_schema(conn.cursor())
+    # 出现过但从未答对：没有平均用时
+    rows = answer_events.parse_events({'game': 'chinese', 'events': [
+        {'answer': '山', 'chosen': '水', 'attempt': 1, 'latency_ms': 900},
+    ]})
+    answer_events._insert_events(conn, rows)
+    conn.close()
+
+    lines = run_cli(db_path, monkeypatch, capsys)
+    assert '第一次答对率   0.0%' in lines['山'] and lines['山'].endswith('平均用时 -')
+
+
+def test_cli_prints_dash_for_missing_accuracy(tmp_path, monkeypatch, capsys):
+    # 只有重试事件的条目：questions 为0，accuracy 为None
+    item = {'answer': '月', 'questions': 0, 'accuracy': None, 'wrong_taps': 1, 'average_solve_ms': 1500}
+    monkeypatch.setattr(answer_events, 'get_item_stats', lambda *args: [item])
+    lines = run_cli(str(tmp_path / 'leaderboard.db'), monkeypatch, capsys)
+    assert '第一次答对率      -' in lines['月'] and lines['月'].endswith('平均用时 1500ms')
+
+
+def test_start_launches_writer_thread_before_first_submit(tmp_path):
+    writer = answer_events.AnswerEventWriter(str(tmp_path / 'leaderboard.db'), flush_interval=0.05)
+    writer.start()
+    try:
+        assert writer._thread is not None and writer._thread.is_alive()
+        thread = writer._thread
+        writer.start()
+        assert writer._thread is thread
+    finally:
+        writer.close()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""导出接口：只有带管理令牌的请求才能导出成绩和反馈"""
+
+import pytest
+
+import export
+from storage import SqliteStorage
+
+TOKEN = 'test-admin-token'
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('GAME_ID_SECRET', 'test-secret')
+    import app as app_module
+    storage = SqliteStorage(str(tmp_path / 'leaderboard.db'))
+    storage.init_schema()
+    storage.save_score('g1', '小明', 8, 30000, 3000)
+    monkeypatch.setattr(app_module, 'storage', storage)
+    monkeypatch.setattr(export, 'ADMIN_TOKEN', TOKEN)
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/api/export/scores', '/api/export/feedback'])
+def test_export_requires_admin_token(client, path):
+    response = client.get(path)
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+
+    response = client.get(path, headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 403
+    assert '小明' not in response.get_data(as_text=True)
+
+
+def test_export_is_closed_without_configured_token(client, monkeypatch):
+    monkeypatch.setattr(export, 'ADMIN_TOKEN', None)
+    response = client.get('/api/export/scores', headers={'Authorization': 'Bearer '})
+    assert response.status_code == 401
+    response = client.get('/api/export/scores', headers={'Authorization': 'Bearer anything'})
+    assert response.status_code == 403
+
+
+def test_admin_token_exports_scores(client):
+    response = client.get('/api/export/scores', headers={'Authorization': f'Bearer {TOKEN}'})
+    assert response.status_code == 200
+    assert '小明' in response.get_data(as_text=True)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""反馈触发的图片替换和图片去重：使用桩实现代替Pixabay搜索和图片下载"""
+
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+from contextlib import closing
+
+import pytest
+import requests
+from PIL import Image
+
+import image_dedup
+from image_replacer import ImageReplacer
+from storage import SqliteStorage
+
+
+def image_bytes(reverse=False, size=(64, 48)):
+    """水平渐变图片；reverse 为真时方向相反（感知哈希完全不同）"""
+    img = Image.new('L', size)
+    img.putdata([(255 - x * 4 if reverse else x * 4) for _ in range(size[1]) for x in range(size[0])])
+    buffer = io.BytesIO()
+    img.convert('RGB').save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class StubSearcher:
+    """按关键词返回固定的图片地址列表，记录搜索次数"""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def search(self, keyword, english=False):
+        self.calls.append(keyword)
+        return self.results.get(keyword, [])
+
+
+class StubFetcher:
+    """按地址返回图片内容；failures 中的地址在前几次下载时抛出网络错误"""
+
+    def __init__(self, images, failures=None):
+        self.images = images
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        if self.failures.get(url, 0) > 0:
+            self.failures[url] -= 1
+            raise requests.ConnectionError(f'stub: {url} unavailable')
+        return self.images[url]
+
+
+@pytest.fixture
+def site(tmp_path):
+    data_dir = tmp_path / 'data'
+    image_dir = tmp_path / 'images'
+    (image_dir / 'english').mkdir(parents=True)
+    data_dir.mkdir()
+    (image_dir / 'sun.jpg').write_bytes(image_bytes())
+    (image_dir / 'moon.jpg').write_bytes(image_bytes(reverse=True))
+    # 与 sun.jpg 内容完全相同
+    shutil.copy(image_dir / 'sun.jpg', image_dir / 'day.jpg')
+    characters = {'basicChineseCharactersForKids': [{'category': '自然', 'characters': [
+        {'character': '日', 'pinyin': 'rì', 'meaning': 'sun', 'image_file': 'sun.jpg'},
+        {'character': '月', 'pinyin': 'yuè', 'meaning': 'moon', 'image_file': 'moon.jpg'},
+        {'character': '昼', 'pinyin': 'zhòu', 'meaning': 'day', 'image_file': 'day.jpg'},
+    ]}]}
+    (data_dir / 'characters.json').write_text(json.dumps(characters, ensure_ascii=False), encoding='utf-8')
+    (data_dir / 'english_alphabet.json').write_text(json.dumps({'englishAlphabet': []}), encoding='utf-8')
+
+    storage = SqliteStorage(str(tmp_path / 'leaderboard.db'))
+    storage.init_schema()
+    return {'data_dir': str(data_dir), 'image_dir': str(image_dir), 'storage': storage}
+
+
+def make_replacer(site, searcher, fetcher):
+    return ImageReplacer(site['storage'].path, searcher, fetcher, data_dir=site['data_dir'],
+                         image_dir=site['image_dir'], threshold=3, delay=0, rebuild=False)
+
+
+def report(site, character, image_file, times=3):
+    for _ in range(times):
+        site['storage'].submit_feedback(character, image_file)
+
+
+def feedback_count(site, character, image_file):
+    with closing(sqlite3.connect(site['storage'].path)) as conn:
+        row = conn.execute('SELECT feedback_count FROM feedback WHERE character = ? AND image_file = ?',
+                           (character, image_file)).fetchone()
+    return row[0] if row else 0
+
+
+def read_sources(site):
+    with open(os.path.join(site['data_dir'], 'characters.json'), encoding='utf-8') as f:
+        chars = json.load(f)['basicChineseCharactersForKids'][0]['characters']
+    return {char['character']: char['image_file'] for char in chars}
+
+
+def test_dedupe_detects_and_merges_identical_images(site):
+    index = image_dedup.open_index(site['data_dir'], site['image_dir'])
+    check = index.check(os.path.join(site['image_dir'], 'day.jpg'))
+    assert check['duplicates'] == ['sun.jpg']
+    assert 'moon.jpg' not in [other for other, _ in check['similar']]
+
+    result = image_dedup.dedupe(site['data_dir'], site['image_dir'], apply=True)
+    assert result['merged'] == [('昼', 'day.jpg', 'sun.jpg')]
+    assert result['removed'] == ['day.jpg']
+    assert not os.path.exists(os.path.join(site['image_dir'], 'day.jpg'))
+    assert read_sources(site) == {'日': 'sun.jpg', '月': 'moon.jpg', '昼': 'sun.jpg'}
+
+    # 共用同一图片的汉字不会同时作为选项
+    index = image_dedup.open_index(site['data_dir'], site['image_dir'])
+    groups = image_dedup.similar_groups(index, [(char, image) for char, image in read_sources(site).items()])
+    assert groups == {'日': ['昼'], '昼': ['日']}
+
+
+def test_failed_download_is_retried_on_next_run(site):
+    original = open(os.path.join(site['image_dir'], 'moon.jpg'), 'rb').read()
+    urls = [f'https://stub/moon-{rank}.jpg' for rank in range(5)]
+    searcher = StubSearcher({'moon': urls})
+    fetcher = StubFetcher({urls[1]: image_bytes(size=(80, 60))}, failures={urls[1]: 1})
+    replacer = make_replacer(site, searcher, fetcher)
+    report(site, '月', 'moon.jpg')
+
+    stats = replacer.run_once()
+    assert stats['failed'] == 1 and stats['replaced'] == 0
+    # 下载失败：原图不变，反馈保留，下一轮重试
+    assert open(os.path.join(site['image_dir'], 'moon.jpg'), 'rb').read() == original
+    assert feedback_count(site, '月', 'moon.jpg') == 3
+
+    stats = replacer.run_once()
+    assert stats['replaced'] == 1
+    assert fetcher.calls == [urls[1], urls[1]]
+    # 新图片写入按内容命名的新文件，原文件不变，运行中的worker在重新加载词库前仍能读取旧地址
+    new_file = read_sources(site)['月']
+    assert re.fullmatch(r'moon-[0-9a-f]{10}\.jpg', new_file)
+    with Image.open(os.path.join(site['image_dir'], new_file)) as img:
+        assert img.size == (80, 60) and img.format == 'JPEG'
+    assert open(os.path.join(site['image_dir'], 'moon.jpg'), 'rb').read() == original
+    assert feedback_count(site, '月', 'moon.jpg') == 0
+
+    # 反馈已处理，不会再次替换
+    assert replacer.run_once()['replaced'] == 0
+    assert len(searcher.calls) == 2
+
+
+def test_shared_image_is_replaced_only_for_reported_entry(site):
+    image_dedup.dedupe(site['data_dir'], site['image_dir'], apply=True)
+    urls = [f'https://stub/day-{rank}.jpg' for rank in range(5)]
+    replacer = make_replacer(site, StubSearcher({'day': urls}), StubFetcher({urls[1]: image_bytes(size=(80, 60))}))
+    report(site, '昼', 'sun.jpg')
+
+    assert replacer.run_once()['replaced'] == 1
+    sources = read_sources(site)
+    # 去重后共用的图片不被覆盖，被反馈的汉字改用自己的新文件
+    assert sources['日'] == 'sun.jpg'
+    assert re.fullmatch(r'昼-[0-9a-f]{10}\.jpg', sources['昼'])
+    assert open(os.path.join(site['image_dir'], 'sun.jpg'), 'rb').read() == image_bytes()
+    index = image_dedup.open_index(site['data_dir'], site['image_dir'])
+    assert index.check(os.path.join(site['image_dir'], sources['昼']))['duplicates'] == []
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""JSON提供器：默认配置走orjson，输出与Flask自带的DefaultJSONProvider逐字节一致"""
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+
+PAYLOADS = [
+    {'character': '月', 'pinyin': 'yuè', 'options': ['想', '月', '床'], 'score': 8, 'ratio': 0.75, 'ok': True},
+    {'nickname': 'Tom', 'rank': 1, 'items': [], 'empty': {}, 'none': None},
+    {'emoji': '学习😀', 'path': 'a\\b', 'del': 'x\x7f', 'quote': '"\n\t'},
+]
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.delenv('JSON_RAW_UTF8', raising=False)
+    app = Flask(__name__)
+    json_provider.init_json_provider(app)
+    return app
+
+
+class CountingOrjson:
+    """记录 dumps 调用的orjson代理"""
+
+    def __init__(self, module):
+        self.module = module
+        self.calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.module, name)
+
+    def dumps(self, obj, **kwargs):
+        self.calls.append(obj)
+        return self.module.dumps(obj, **kwargs)
+
+
+@pytest.fixture
+def orjson_calls(monkeypatch):
+    counting = CountingOrjson(pytest.importorskip('orjson'))
+    monkeypatch.setattr(json_provider, 'orjson', counting)
+    return counting.calls
+
+
+@pytest.mark.parametrize('debug', [False, True])
+def test_default_config_uses_orjson(app, orjson_calls, debug):
+    app.debug = debug
+    baseline = DefaultJSONProvider(app)
+    with app.app_context():
+        body = app.json.response(PAYLOADS[0]).get_data()
+        assert body == baseline.response(PAYLOADS[0]).get_data()
+    assert orjson_calls == [PAYLOADS[0]]
+    assert b'\\u6708' in body and b'yu\\u00e8' in body
+
+
+@pytest.mark.parametrize('payload', PAYLOADS)
+def test_default_output_matches_flask(app, payload):
+    baseline = DefaultJSONProvider(app)
+    assert app.json.dumps(payload) == baseline.dumps(payload, separators=(',', ':'))
+    assert app.json.dumps(payload, indent=2) == baseline.dumps(payload, indent=2)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""成绩归档和汇总清理"""
+
+import gzip
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import maintenance
+from storage import SqliteStorage
+
+
+@pytest.fixture
+def conn(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'leaderboard.db'))
+    storage.init_schema()
+    for i in range(12):
+        storage.save_score(f'g{i}', f'player{i % 3}', i, 30000, 3000)
+    with closing(sqlite3.connect(storage.path)) as setup:
+        setup.execute('UPDATE scores SET play_timestamp = 1000')
+        setup.commit()
+    conn = sqlite3.connect(storage.path, isolation_level=None)
+    yield conn
+    conn.close()
+
+
+def scores(conn):
+    return sorted(row[0] for row in conn.execute('SELECT score FROM scores'))
+
+
+def test_archive_keeps_best_per_nickname_and_top_scores(conn, tmp_path):
+    archive_dir = tmp_path / 'archive'
+    archived = maintenance.archive_scores(conn, 2000, str(archive_dir), keep_top=2, batch_size=2)
+
+    # 每个昵称的最好成绩（9、10、11）和总榜前2名保留
+    assert scores(conn) == [9, 10, 11]
+    assert archived == 9
+    records = []
+    for path in archive_dir.iterdir():
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            records += [json.loads(line) for line in f]
+    assert sorted(record['score'] for record in records) == list(range(9))
+    # 临时表已清理，再次运行不会重复归档
+    assert maintenance.archive_scores(conn, 2000, str(archive_dir), keep_top=2) == 0
+
+
+def test_archive_ranks_outside_write_transaction(conn, tmp_path):
+    statements = []
+    conn.set_trace_callback(lambda sql: statements.append((conn.in_transaction, sql)))
+    maintenance.archive_scores(conn, 2000, str(tmp_path / 'archive'), keep_top=2, batch_size=4)
+    conn.set_trace_callback(None)
+
+    # 排名（全表排序）不在写事务中执行，写事务中只按id读取和删除
+    ranking = [in_transaction for in_transaction, sql in statements if 'ROW_NUMBER' in sql]
+    assert ranking == [False]
+    deletes = [in_transaction for in_transaction, sql in statements if sql.startswith('DELETE FROM scores')]
+    assert deletes and all(deletes)
+
+
+def test_prune_rollups_removes_old_daily_and_weekly_rows(conn):
+    before = conn.execute('''SELECT "window", COUNT(*) FROM leaderboard_rollups GROUP BY "window"''').fetchall()
+    assert {window for window, _ in before} >= {'all', 'daily', 'weekly'}
+    far_future = 4102444800
+    deleted = maintenance.prune_rollups(conn, far_future)
+    remaining = conn.execute('SELECT DISTINCT "window" FROM leaderboard_rollups').fetchall()
+    assert remaining == [('all',)]
+    assert deleted == sum(count for window, count in before if window != 'all')
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""多进程指标：fork后清空、已退出进程的文件合并"""
+
+import os
+
+from metrics import DEAD_FILE, Registry
+
+
+def make_registry(directory):
+    registry = Registry(str(directory))
+    requests = registry.counter('requests_total', '请求数', ('route',))
+    in_flight = registry.gauge('in_flight', '处理中请求数')
+    latency = registry.histogram('latency_seconds', '耗时', buckets=(0.1, 1.0))
+    return registry, requests, in_flight, latency
+
+
+def test_reset_drops_values_recorded_before_fork(tmp_path):
+    registry, requests, in_flight, _ = make_registry(tmp_path)
+    requests.inc(route='/warmup')
+    in_flight.inc()
+    registry.reset()
+    assert registry.snapshot() == {'requests_total': [], 'in_flight': [], 'latency_seconds': []}
+
+
+def test_dead_process_files_are_merged(tmp_path):
+    registry, requests, in_flight, latency = make_registry(tmp_path)
+    requests.inc(route='/a')
+    in_flight.inc()
+    latency.observe(0.05)
+    registry.maybe_flush(force=True)
+    own_file = f'{os.getpid()}.json'
+    # 同一份数据当作两个已退出的worker
+    for pid in (999991, 999992):
+        os.link(tmp_path / own_file, tmp_path / f'{pid}.json')
+        registry.mark_process_dead(pid)
+    registry.mark_process_dead(999993)
+
+    assert sorted(os.listdir(tmp_path)) == sorted([own_file, DEAD_FILE])
+    collected = registry.collect()
+    assert collected['requests_total'] == {('/a',): 3}
+    # 已退出进程的仪表值不计入
+    assert collected['in_flight'] == {(): 1}
+    histogram = collected['latency_seconds'][()]
+    assert histogram[:2] == [3, 0] and histogram[-1] == 3
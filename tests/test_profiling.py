@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""请求性能分析：并发命中的请求不会因分析器冲突失败"""
+
+import threading
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+import profiling
+from profiling import ProfilingMiddleware, list_profiles
+
+
+def make_client(tmp_path, handler):
+    middleware = ProfilingMiddleware(handler, str(tmp_path), {'127.0.0.1'}, sample_rate=1.0)
+    return Client(middleware)
+
+
+def test_overlapping_sampled_requests_all_succeed(tmp_path):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def handler(environ, start_response):
+        # 三个请求同时处于处理中
+        barrier.wait()
+        return Response('ok')(environ, start_response)
+
+    client = make_client(tmp_path, handler)
+    statuses = []
+
+    def request():
+        response = client.get('/slow')
+        statuses.append(response.status_code)
+        response.close()
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200, 200, 200]
+    # 只有一个请求被分析，响应关闭后释放，下一个请求可以再次分析
+    assert len(list_profiles(str(tmp_path))) == 1
+    assert not profiling._profile_lock.locked()
+
+
+def test_body_generated_on_another_thread(tmp_path):
+    def handler(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return iter([b'a', b'b'])
+
+    middleware = ProfilingMiddleware(handler, str(tmp_path), {'127.0.0.1'}, sample_rate=1.0)
+    body = middleware({'PATH_INFO': '/export', 'REQUEST_METHOD': 'GET'}, lambda status, headers, exc_info=None: None)
+    chunks = []
+    # ASGI模式下执行器的其他线程逐块取出响应体并关闭
+    worker = threading.Thread(target=lambda: (chunks.extend(body), body.close()))
+    worker.start()
+    worker.join()
+
+    assert chunks == [b'a', b'b']
+    assert len(list_profiles(str(tmp_path))) == 1
+    assert not profiling._profile_lock.locked()
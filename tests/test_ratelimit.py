@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""限流：设备桶和IP桶都放行时才消耗令牌"""
+
+import pytest
+
+from ratelimit import MemoryStore, SqliteStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    return MemoryStore() if request.param == 'memory' else SqliteStore(str(tmp_path / 'ratelimit.db'))
+
+
+def test_rejected_request_consumes_no_tokens(store):
+    now = 1000.0
+    # 设备桶：容量3；IP桶：容量1，已被同一IP的其他设备用完
+    device = ('scores:1.2.3.4:device-a', 1.0, 3.0)
+    other = ('scores:1.2.3.4:device-b', 1.0, 3.0)
+    ip = ('scores:1.2.3.4', 10.0, 10.0)
+    assert store.acquire([other, ip], now) == 0
+    for _ in range(5):
+        assert store.acquire([device, ip], now) > 0
+
+    # IP桶恢复后，设备桶仍有完整的突发额度
+    later = now + 10.0
+    ip_unlimited = ('scores:1.2.3.4', 0.0, 0.0)
+    for _ in range(3):
+        assert store.acquire([device, ip_unlimited], later) == 0
+    assert store.acquire([device, ip_unlimited], later) > 0
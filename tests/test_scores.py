@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""成绩写入：游戏ID签名校验、重复提交和并发重复提交（多线程、多进程）"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pytest
+
+import rollups
+from game_ids import GameIdSigner, load_secret
+from storage import SqliteStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'leaderboard.db'))
+    storage.init_schema()
+    return storage
+
+
+def fetch(storage, sql, params=()):
+    with closing(sqlite3.connect(storage.path)) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def all_time_board(storage, game):
+    return fetch(storage, '''
+        SELECT nickname, score, total_time FROM leaderboard_rollups
+        WHERE "window" = 'all' AND game = ? ORDER BY score DESC
+    ''', (game,))
+
+
+def test_signer_accepts_only_issued_ids():
+    signer = GameIdSigner('secret')
+    game_id = signer.issue()
+    assert signer.verify(game_id)
+    assert not GameIdSigner('other').verify(game_id)
+    assert not signer.verify(game_id[:-1] + ('0' if game_id[-1] != '0' else '1'))
+    assert not signer.verify('legacy-1')
+    assert not signer.verify(None)
+
+
+def test_load_secret_is_stable(tmp_path):
+    path = str(tmp_path / 'secret')
+    assert load_secret(path) == load_secret(path)
+
+
+def test_duplicate_submit_keeps_first_score(storage):
+    assert storage.save_score('g1', '小明', 8, 30000, 3000) is not None
+    assert storage.save_score('g1', '坏人', 3, 90000, 9000) is None
+
+    assert fetch(storage, 'SELECT nickname, score, total_time FROM scores') == [('小明', 8, 30000)]
+    assert all_time_board(storage, rollups.DEFAULT_GAME) == [('小明', 8, 30000)]
+
+
+def test_parallel_duplicate_submits_write_one_row(storage):
+    threads = 16
+    barrier = threading.Barrier(threads)
+    results = []
+    errors = []
+
+    def submit(i):
+        try:
+            barrier.wait()
+            results.append(storage.save_score('same-game', f'player{i}', i, 10000 + i, 1000))
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=submit, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    assert sum(result is not None for result in results) == 1
+    rows = fetch(storage, 'SELECT nickname, score, total_time FROM scores')
+    assert len(rows) == 1
+    # 汇总榜与成绩表一致：只有写入成功的那一次提交
+    assert all_time_board(storage, rollups.DEFAULT_GAME) == rows
+    assert all_time_board(storage, rollups.ALL_GAMES) == rows
+
+
+def submit_from_process(db_path, game_id, index, barrier, results):
+    """子进程：导入应用，把存储指向同一个数据库文件，与其他进程同时提交同一局成绩"""
+    os.environ['GAME_ID_SECRET'] = 'test-secret'
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+    try:
+        import app as app_module
+        app_module.storage = SqliteStorage(db_path)
+        client = app_module.app.test_client()
+        barrier.wait(timeout=30)
+        response = client.post('/api/leaderboard/submit', json={
+            'nickname': f'player{index}', 'score': index, 'total_time': 10000 + index, 'average_time': 1000,
+            'game_id': game_id,
+        })
+        results.put(response.status_code)
+    except Exception as e:
+        results.put(repr(e))
+
+
+def test_duplicate_submits_from_processes_write_one_row(storage):
+    processes = 6
+    # spawn：子进程各自重新导入应用，与测试进程中已导入的应用和已启动的线程无关
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    game_id = GameIdSigner('test-secret').issue()
+    workers = [context.Process(target=submit_from_process, args=(storage.path, game_id, i, barrier, results))
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    statuses = sorted(results.get(timeout=60) for _ in range(processes))
+    for worker in workers:
+        worker.join()
+
+    assert statuses == [200] + [409] * (processes - 1)
+    rows = fetch(storage, 'SELECT game_id, COUNT(*) FROM scores GROUP BY game_id')
+    assert rows == [(game_id, 1)]
+    assert len(all_time_board(storage, rollups.DEFAULT_GAME)) == 1
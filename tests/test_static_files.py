@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""静态文件缓存头：带内容哈希的URL长期缓存，其他URL每次重新验证"""
+
+from static_files import Mount, StaticFiles
+
+
+def make_static(tmp_path):
+    (tmp_path / 'script.js').write_text('console.log(1);', encoding='utf-8')
+    mount = Mount('/static/', str(tmp_path), 'static')
+    return StaticFiles([mount]), mount
+
+
+def cache_control(plan):
+    return dict(plan.headers)['Cache-Control']
+
+
+def test_unversioned_files_are_revalidated(tmp_path):
+    static, _ = make_static(tmp_path)
+    plan = static.resolve('GET', '/static/script.js', '', {})
+    assert cache_control(plan) == 'no-cache'
+    etag = dict(plan.headers)['ETag']
+    assert static.resolve('GET', '/static/script.js', '', {'if-none-match': etag}).status == 304
+
+
+def test_version_follows_content(tmp_path):
+    static, mount = make_static(tmp_path)
+    version = static.version(mount, 'script.js')
+    plan = static.resolve('GET', '/static/script.js', f'v={version}', {})
+    assert cache_control(plan) == 'public, max-age=31536000, immutable'
+
+    (tmp_path / 'script.js').write_text('console.log(2, 3);', encoding='utf-8')
+    assert static.version(mount, 'script.js') != version
+    assert static.version(mount, 'missing.js') is None
+
+
+def test_stale_or_made_up_version_is_revalidated(tmp_path):
+    static, mount = make_static(tmp_path)
+    old_version = static.version(mount, 'script.js')
+    (tmp_path / 'script.js').write_text('console.log(2, 3);', encoding='utf-8')
+
+    for query in (f'v={old_version}', 'v=abcdef123456', 'v=abcdef'):
+        assert cache_control(static.resolve('GET', '/static/script.js', query, {})) == 'no-cache'
+    current = static.version(mount, 'script.js')
+    plan = static.resolve('GET', '/static/script.js', f'x=1&v={current}', {})
+    assert cache_control(plan) == 'public, max-age=31536000, immutable'
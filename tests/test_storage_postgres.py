@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL后端：默认使用进程内的psycopg替身（SQLite执行、按psycopg的规则解析参数格式、事务提交后投递通知），
+设置 TEST_DATABASE_URL 且安装了 psycopg 时同样的用例也在真实的PostgreSQL上执行
+"""
+
+import os
+import queue
+import re
+import sqlite3
+import threading
+import types
+from contextlib import contextmanager
+
+import pytest
+
+import answer_events
+import storage as storage_module
+from storage import PostgresStorage, SqliteStorage, _pg_sql
+
+# psycopg只接受 %s 和 %%，其他 % 是格式错误
+_PG_PARAM = re.compile(r'%(.?)')
+
+
+def _to_sqlite(query):
+    def convert(match):
+        if match.group(1) == 's':
+            return '?'
+        if match.group(1) == '%':
+            return '%'
+        raise ValueError(f'stand-in: 参数格式错误 {match.group(0)!r}')
+    return _PG_PARAM.sub(convert, query)
+
+
+class StandInCursor:
+    def __init__(self, conn):
+        self._cursor = conn.db.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, query, params=None):
+        if params is None:
+            self._cursor.execute(query.replace('BIGSERIAL', 'INTEGER'))
+        else:
+            self._cursor.execute(_to_sqlite(query).replace('BIGSERIAL', 'INTEGER'), params)
+        return self
+
+    def executemany(self, query, params_seq):
+        self._cursor.executemany(_to_sqlite(query), params_seq)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class StandInConnection:
+    def __init__(self, driver):
+        self.driver = driver
+        self.closed = False
+        self.db = sqlite3.connect(driver.path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.db.create_function('pg_notify', 2, self._notify)
+        self.db.create_function('pg_advisory_xact_lock', 1, lambda key: None)
+        self._pending = []
+        self._notifies = queue.Queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _notify(self, channel, payload):
+        self._pending.append((channel, payload))
+
+    @contextmanager
+    def transaction(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            self._pending.clear()
+            raise
+        self.db.execute('COMMIT')
+        pending, self._pending = self._pending, []
+        for channel, payload in pending:
+            self.driver.deliver(channel, payload)
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def execute(self, query):
+        channel = query.removeprefix('LISTEN ')
+        with self.driver.lock:
+            self.driver.listeners.setdefault(channel, []).append(self._notifies)
+
+    def notifies(self):
+        while not self.closed:
+            yield self._notifies.get()
+
+    def close(self):
+        self.closed = True
+        self.db.close()
+
+
+class StandInPsycopg(types.SimpleNamespace):
+    """storage.py 用到的 psycopg 接口：connect、Error、OperationalError"""
+
+    Error = sqlite3.Error
+    OperationalError = sqlite3.OperationalError
+
+    def __init__(self, path):
+        super().__init__(path=path, lock=threading.Lock(), listeners={})
+
+    def connect(self, dsn, autocommit=False, connect_timeout=None):
+        return StandInConnection(self)
+
+    def deliver(self, channel, payload):
+        with self.lock:
+            targets = list(self.listeners.get(channel, []))
+        for target in targets:
+            target.put(types.SimpleNamespace(channel=channel, payload=payload))
+
+
+@pytest.fixture(params=['stand-in', 'server'])
+def pg(request, tmp_path, monkeypatch):
+    if request.param == 'stand-in':
+        monkeypatch.setattr(storage_module, 'psycopg', StandInPsycopg(str(tmp_path / 'postgres.db')))
+        dsn = 'postgresql://stand-in/syword'
+    else:
+        dsn = os.getenv('TEST_DATABASE_URL')
+        if not dsn or storage_module.psycopg is None:
+            pytest.skip('需要 TEST_DATABASE_URL 和 psycopg')
+        with storage_module.psycopg.connect(dsn, autocommit=True) as conn:
+            conn.execute('DROP TABLE IF EXISTS scores, leaderboard_rollups, feedback')
+    backend = PostgresStorage(dsn, reconnect_delay=0.05, local_path=str(tmp_path / 'leaderboard.db'))
+    backend.init_schema()
+    yield backend
+    backend._close_local()
+
+
+def test_placeholders_inside_literals_are_not_parameters():
+    sql = '''SELECT '?', "a?b", '50%' -- why?
+             FROM t WHERE a = ? /* b = ? */ AND c LIKE ?'''
+    assert _pg_sql(sql) == '''SELECT '?', "a?b", '50%%' -- why?
+             FROM t WHERE a = %s /* b = ? */ AND c LIKE %s'''
+
+
+def test_literal_question_mark_and_percent_reach_the_database(pg):
+    with pg._cursor() as cursor:
+        row = cursor.execute("SELECT '?' || CAST(? AS TEXT), '100%'", ('x',)).fetchone()
+    assert tuple(row) == ('?x', '100%')
+
+
+def test_scores_and_feedback(pg):
+    assert pg.save_score('g1', '小明', 8, 30000, 3000) is not None
+    assert pg.save_score('g1', '坏人', 3, 90000, 9000) is None
+    assert pg.save_score('g2', '小红', 9, 40000, 4000) is not None
+
+    assert [(row['nickname'], row['score']) for row in pg.get_leaderboard()] == [('小红', 9), ('小明', 8)]
+    assert pg.get_user_rank(8, 20000) == 2
+    assert [row['nickname'] for row in pg.get_board('all')['leaderboard']] == ['小红', '小明']
+    assert [row[1] for batch in pg.iter_scores(chunk_size=1) for row in batch] == ['小明', '小红']
+
+    pg.submit_feedback('月', 'moon.jpg')
+    pg.submit_feedback('月', 'moon.jpg')
+    assert [(row['character'], row['feedback_count']) for row in pg.get_feedback_stats()] == [('月', 2)]
+    assert [row[1:4] for batch in pg.iter_feedback() for row in batch] == [('月', 'moon.jpg', 2)]
+    assert pg.ping() is None
+
+
+def test_score_notification_reaches_listeners(pg):
+    changes = queue.Queue()
+    pg.add_listener(changes.put)
+    pg.start_watcher()
+    # 连接建立后先整体失效一次
+    assert changes.get(timeout=5) is None
+
+    pg.save_score('g1', '小明', 8, 30000, 3000)
+    assert changes.get(timeout=5) == (8, 30000)
+    # 重复提交没有写入，不发通知
+    pg.save_score('g1', '坏人', 3, 90000, 9000)
+    with pytest.raises(queue.Empty):
+        changes.get(timeout=0.2)
+
+
+def test_answer_analytics_read_the_local_database(pg):
+    SqliteStorage(pg.local_path).init_schema()
+    conn = sqlite3.connect(pg.local_path, isolation_level=None)
+    answer_events._insert_events(conn, answer_events.parse_events({'game': 'chinese', 'events': [
+        {'answer': '山', 'chosen': '水', 'attempt': 1, 'latency_ms': 900},
+        {'answer': '山', 'chosen': '山', 'attempt': 2, 'latency_ms': 700},
+    ]}))
+    answer_events.rollup(conn)
+    conn.close()
+
+    assert [item['answer'] for item in pg.get_answer_stats('chinese')] == ['山']
+    assert pg.get_answer_detail('山')['answer'] == '山'
+    assert pg.get_answer_detail('水') is None
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""词库分片：多次重建后运行中的进程仍能读取分类数据"""
+
+import os
+
+import wordbank
+
+
+def make_artifact(meaning, version):
+    char = {'character': '日', 'pinyin': 'rì', 'meaning': meaning, 'chinese_meaning': '太阳', 'common_words': []}
+    return {
+        'format': wordbank.FORMAT_VERSION,
+        'version': version,
+        'built_at': 0,
+        'categories': [{'category': '自然', 'characters': [char]}],
+        'english': {'letters': [], 'all_words': []},
+        'similar_images': {},
+    }
+
+
+def shard_files(directory):
+    return set(os.listdir(os.path.join(directory, wordbank.SHARD_DIR)))
+
+
+def test_rebuilds_keep_shards_of_running_workers(tmp_path):
+    directory = str(tmp_path)
+    first = wordbank.write(make_artifact('sun', 'v1'), directory)
+    worker = wordbank.WordBank(first, directory)
+    wordbank.write(make_artifact('day', 'v2'), directory)
+    wordbank.write(make_artifact('sun day', 'v3'), directory)
+
+    # 第一个索引的分片仍在保留期内
+    assert os.path.basename(first['categories'][0]['shard']) in shard_files(directory)
+    assert worker.get_character('日')['meaning'] == 'sun'
+
+
+def test_missing_shard_falls_back_to_current_index(tmp_path):
+    directory = str(tmp_path)
+    first = wordbank.write(make_artifact('sun', 'v1'), directory)
+    worker = wordbank.WordBank(first, directory)
+    wordbank.write(make_artifact('day', 'v2'), directory, retention=0)
+    wordbank.write(make_artifact('sun day', 'v3'), directory, retention=0)
+
+    assert os.path.basename(first['categories'][0]['shard']) not in shard_files(directory)
+    assert worker.get_character('日')['meaning'] == 'sun day'
+
+
+def test_worker_reloads_rebuilt_index(tmp_path):
+    directory = str(tmp_path)
+    worker = wordbank.WordBank(wordbank.write(make_artifact('sun', 'v1'), directory), directory)
+    assert worker.get_character('日')['meaning'] == 'sun'
+    assert not worker.reload()
+
+    wordbank.write(make_artifact('day', 'v2'), directory)
+    index_path = os.path.join(directory, wordbank.INDEX_FILE)
+    os.utime(index_path, ns=(0, os.stat(index_path).st_mtime_ns + 1))
+    assert worker.reload()
+    # 已缓存的旧分片被清空，读取新索引的分片
+    assert worker.version == 'v2'
+    assert worker.get_character('日')['meaning'] == 'day'
+    assert not worker.reload()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预生成语音
+离线用本地TTS引擎把所有提示语、汉字、常用词、字母和英语单词渲染成压缩音频（MP3/Opus），
+按内容寻址保存（文件名为 引擎+声音+文本 的哈希），重复执行只生成新增或变化的文本。
+生成后重新构建词库，题目中即带有音频地址；浏览器优先播放音频，没有音频时仍使用语音合成。
+
+依赖本地命令：TTS引擎（默认 espeak-ng）和 ffmpeg（编码为MP3/Opus）
+
+用法:
+    python tts.py                                   # espeak-ng + MP3
+    python tts.py --format opus                     # 更小的Opus（较旧的Safari不支持）
+    python tts.py --command 'pico2wave -l {voice} -w {output} {text}' --voices zh-CN=zh-CN,en-US=en-US
+    python wordbank.py                              # 重新构建词库，写入音频地址
+
+环境变量:
+    TTS_AUDIO_DIR: 音频目录，默认 data/audio（由 static_files 以 /audio/<文件> 提供，带一年的不可变缓存头）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import wordbank
+
+# 引擎命令模板：{voice} 声音，{output} 输出的wav文件，{text} 朗读文本
+ENGINES = {
+    'espeak-ng': {
+        'command': 'espeak-ng -v {voice} -s 140 -w {output} {text}',
+        'voices': {wordbank.CHINESE_VOICE: 'cmn', wordbank.ENGLISH_VOICE: 'en-us'},
+    },
+}
+
+# 编码参数：单声道、低码率，语音足够清晰
+FORMATS = {
+    'mp3': ['-c:a', 'libmp3lame', '-b:a', '48k'],
+    'opus': ['-c:a', 'libopus', '-b:a', '24k', '-application', 'voip'],
+}
+
+# 音频文件名: <20位哈希>.<格式>
+_FILENAME = re.compile(r'^[0-9a-f]{20}\.(mp3|opus)$')
+
+
+class Renderer:
+    """
+    调用本地TTS引擎和ffmpeg生成单条语音
+
+    Args:
+        command: 引擎命令模板
+        voices: 语言 -> 引擎的声音名
+        audio_format: mp3 / opus
+    """
+
+    def __init__(self, command, voices, audio_format='mp3'):
+        self.command = command
+        self.voices = voices
+        self.audio_format = audio_format
+        # 引擎、声音或编码参数变化时哈希随之变化，旧文件不会被误用
+        self.signature = json.dumps([command, voices, FORMATS[audio_format]], sort_keys=True)
+
+    def filename(self, voice, text):
+        digest = hashlib.sha256(f'{self.signature}\n{voice}\n{text}'.encode('utf-8')).hexdigest()[:20]
+        return f'{digest}.{self.audio_format}'
+
+    def render(self, voice, text, path):
+        with tempfile.TemporaryDirectory() as tmp:
+            wav = os.path.join(tmp, 'speech.wav')
+            args = [part.format(voice=self.voices.get(voice, voice), output=wav, text=text)
+                    for part in shlex.split(self.command)]
+            subprocess.run(args, check=True, capture_output=True, timeout=60)
+
+            encoded = os.path.join(tmp, f'speech.{self.audio_format}')
+            subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', wav, '-ac', '1', '-ar', '24000',
+                            *FORMATS[self.audio_format], encoded],
+                           check=True, capture_output=True, timeout=60)
+            # 先写临时文件再改名，中断时不会留下不完整的音频
+            shutil.copyfile(encoded, f'{path}.tmp')
+            os.replace(f'{path}.tmp', path)
+
+
+def generate(renderer, audio_dir=wordbank.AUDIO_DIR, data_dir=wordbank.DATA_DIR,
+             image_dir=wordbank.IMAGE_DIR, workers=None, prune=False):
+    """
+    为词库中所有需要朗读的文本生成语音并写入清单
+
+    Returns:
+        dict: {'total', 'generated', 'failed', 'pruned'}
+    """
+    artifact = wordbank.build(data_dir, image_dir, audio_dir)
+    clips = wordbank.audio_clips(artifact['categories'], artifact['english']['letters'])
+    os.makedirs(audio_dir, exist_ok=True)
+
+    manifest = {}
+    pending = []
+    for voice, text in clips:
+        name = renderer.filename(voice, text)
+        manifest[wordbank.clip_key(voice, text)] = name
+        if not os.path.exists(os.path.join(audio_dir, name)):
+            pending.append((voice, text, name))
+
+    def render(item):
+        voice, text, name = item
+        try:
+            renderer.render(voice, text, os.path.join(audio_dir, name))
+            return None
+        except subprocess.CalledProcessError as e:
+            detail = (e.stderr or b'').decode('utf-8', 'replace').strip().splitlines()
+            return f'{voice} {text}: {e.cmd[0]} 退出码 {e.returncode} {detail[-1] if detail else ""}'
+        except (OSError, subprocess.SubprocessError) as e:
+            return f'{voice} {text}: {e}'
+
+    with ThreadPoolExecutor(workers or os.cpu_count() or 4) as executor:
+        errors = [error for error in executor.map(render, pending) if error]
+    for error in errors[:10]:
+        print(f'生成失败 {error}', file=sys.stderr)
+    if len(errors) > 10:
+        print(f'... 共 {len(errors)} 条生成失败', file=sys.stderr)
+
+    # 清单只记录生成成功的音频，失败的文本在浏览器中回退到语音合成
+    manifest = {key: name for key, name in manifest.items() if os.path.exists(os.path.join(audio_dir, name))}
+    manifest_path = os.path.join(audio_dir, wordbank.AUDIO_MANIFEST)
+    with open(f'{manifest_path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'format': renderer.audio_format, 'clips': manifest}, f, ensure_ascii=False, indent=2)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+
+    pruned = 0
+    if prune:
+        referenced = set(manifest.values())
+        for name in os.listdir(audio_dir):
+            if _FILENAME.match(name) and name not in referenced:
+                os.remove(os.path.join(audio_dir, name))
+                pruned += 1
+    return {'total': len(clips), 'generated': len(pending) - len(errors), 'failed': len(errors), 'pruned': pruned}
+
+
+def _parse_voices(value):
+    voices = {}
+    for pair in value.split(','):
+        if '=' in pair:
+            language, voice = pair.split('=', 1)
+            voices[language.strip()] = voice.strip()
+    return voices
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为词库预生成语音')
+    parser.add_argument('--engine', default='espeak-ng', choices=sorted(ENGINES), help='TTS引擎 (默认: espeak-ng)')
+    parser.add_argument('--command', help='自定义引擎命令模板，可用 {voice} {output} {text}')
+    parser.add_argument('--voices', help='语言到声音的映射，如 zh-CN=cmn,en-US=en-us')
+    parser.add_argument('--format', default='mp3', choices=sorted(FORMATS), help='音频格式 (默认: mp3)')
+    parser.add_argument('--audio-dir', default=wordbank.AUDIO_DIR, help='音频目录 (默认: data/audio)')
+    parser.add_argument('--workers', type=int, help='并行生成数 (默认: CPU核数)')
+    parser.add_argument('--prune', action='store_true', help='删除清单中不再引用的音频')
+    args = parser.parse_args()
+
+    engine = ENGINES[args.engine]
+    command = args.command or engine['command']
+    # 自定义命令默认直接使用语言标签作为声音名
+    voices = {} if args.command else dict(engine['voices'])
+    if args.voices:
+        voices.update(_parse_voices(args.voices))
+    for tool in (shlex.split(command)[0], 'ffmpeg'):
+        if shutil.which(tool) is None:
+            print(f'未找到命令: {tool}', file=sys.stderr)
+            sys.exit(1)
+
+    try:
+        stats = generate(Renderer(command, voices, args.format), args.audio_dir, workers=args.workers,
+                         prune=args.prune)
+    except wordbank.WordBankError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    print(f"语音条数: {stats['total']}，新生成: {stats['generated']}，失败: {stats['failed']}，清理: {stats['pruned']}")
+    print('请重新构建词库: python wordbank.py')
+    if stats['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+词库构建
+离线校验手工编辑的 data/*.json，并生成包含全部派生数据的词库目录 data/wordbank/：
+- 索引：分类列表、各分类的汉字列表（出题选项和 /api/categories 只需要索引）
+- 分片：每个分类一个文件，包含汉字的完整数据，服务运行时按需加载
+- 英语字母列表和全部单词列表
+- 图片尺寸、文件大小和带内容哈希的图片URL（内容变化后URL随之变化，可长期缓存）
+- 已生成预录语音时（python tts.py），附带每个提示语、汉字、常用词和英语单词的音频地址
+- 图片完全相同或近似的汉字/字母（image_dedup.py），出题时不会同时作为选项
+
+服务启动时只加载生成的索引；数据有问题时构建直接失败，而不是在请求时返回500。
+运行中的worker定期检查索引文件，重新构建后（如 image_replacer.py 替换了图片）自动重新加载，
+不需要重启即可使用新的图片地址（WORDBANK_RELOAD_SECONDS，默认 10，0 表示不检查）。
+
+用法:
+    python wordbank.py              # 校验并生成 data/wordbank/
+    python wordbank.py --check      # 只校验，不写文件
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from app_logging import get_logger, fields
+from metrics import record_cache
+import image_dedup
+import search
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 未安装时不记录图片尺寸
+    Image = None
+
+logger = get_logger('wordbank')
+
+DATA_DIR = 'data'
+IMAGE_DIR = 'static/images'
+IMAGE_URL_PREFIX = '/static/images'
+ARTIFACT_DIR = os.path.join(DATA_DIR, 'wordbank')
+INDEX_FILE = 'index.json'
+SHARD_DIR = 'shards'
+
+# 预生成的语音（python tts.py），manifest.json 记录 语言+文本 -> 音频文件
+AUDIO_DIR = os.getenv('TTS_AUDIO_DIR', os.path.join(DATA_DIR, 'audio'))
+AUDIO_MANIFEST = 'manifest.json'
+AUDIO_URL_PREFIX = '/audio'
+CHINESE_VOICE = 'zh-CN'
+ENGLISH_VOICE = 'en-US'
+
+# 不再被新旧索引引用的分片保留的时间（秒）：长期运行的worker仍持有更早的索引，会按需读取其中的分片
+SHARD_RETENTION_SECONDS = int(os.getenv('WORDBANK_SHARD_RETENTION_HOURS', '168')) * 3600
+
+# worker检查词库索引是否重新构建的间隔（秒），0 表示不检查
+RELOAD_SECONDS = float(os.getenv('WORDBANK_RELOAD_SECONDS', '10'))
+
+# 词库文件格式版本，结构变化时递增
+FORMAT_VERSION = 5
+
+# 题目提示语（voiceText），语音生成和精简题目目录使用同一模板
+CHINESE_PROMPT = '请找出"{character}"字'
+ENGLISH_PROMPTS = {
+    'letter_recognition': '请找出字母"{letter}"',
+    'letter_pairing': '请找出小写字母"{lowercase}"',
+    'word_matching': '请找出以字母"{letter}"开头的单词',
+}
+
+CHARACTER_FIELDS = ('character', 'pinyin', 'meaning', 'chinese_meaning')
+LETTER_FIELDS = ('letter', 'lowercase', 'pronunciation', 'phonetic', 'description')
+
+
+def chinese_prompt(character):
+    return CHINESE_PROMPT.format(character=character)
+
+
+def english_prompt(game_type, letter):
+    return ENGLISH_PROMPTS[game_type].format(letter=letter['letter'], lowercase=letter['lowercase'])
+
+
+def audio_clips(categories, letters):
+    """所有需要朗读的 (语言, 文本)：提示语、汉字、常用词、字母和英语单词"""
+    clips = set()
+    for cat in categories:
+        for char in cat['characters']:
+            clips.add((CHINESE_VOICE, chinese_prompt(char['character'])))
+            clips.add((CHINESE_VOICE, char['character']))
+            clips.update((CHINESE_VOICE, word) for word in char.get('common_words', []))
+    for letter in letters:
+        clips.update((CHINESE_VOICE, english_prompt(game_type, letter)) for game_type in ENGLISH_PROMPTS)
+        clips.add((ENGLISH_VOICE, letter['letter']))
+        clips.add((ENGLISH_VOICE, letter['lowercase']))
+        clips.update((ENGLISH_VOICE, word) for word in letter.get('words', []))
+    return sorted(clips)
+
+
+def clip_key(voice, text):
+    return f'{voice}|{text}'
+
+
+def _attach_audio(categories, letters, audio_dir):
+    """根据语音清单给汉字和字母加上音频地址；没有生成语音时不加"""
+    manifest_path = os.path.join(audio_dir, AUDIO_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return 0
+    files = _read_json(manifest_path)['clips']
+
+    def url(voice, text):
+        name = files.get(clip_key(voice, text))
+        return f'{AUDIO_URL_PREFIX}/{name}' if name else None
+
+    for cat in categories:
+        for char in cat['characters']:
+            char['audio'] = {
+                'prompt': url(CHINESE_VOICE, chinese_prompt(char['character'])),
+                'character': url(CHINESE_VOICE, char['character']),
+                'common_words': {word: url(CHINESE_VOICE, word) for word in char.get('common_words', [])},
+            }
+    for letter in letters:
+        letter['audio'] = {
+            'prompts': {game_type: url(CHINESE_VOICE, english_prompt(game_type, letter)) for game_type in ENGLISH_PROMPTS},
+            'letter': url(ENGLISH_VOICE, letter['letter']),
+            'lowercase': url(ENGLISH_VOICE, letter['lowercase']),
+            'words': {word: url(ENGLISH_VOICE, word) for word in letter.get('words', [])},
+        }
+    return len(files)
+
+
+class WordBankError(ValueError):
+    """词库数据校验失败，problems 为全部问题的列表"""
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__(f'词库校验失败，共 {len(problems)} 个问题:\n' + '\n'.join(f'  - {p}' for p in problems))
+
+
+def _source_paths(data_dir):
+    return (os.path.join(data_dir, 'characters.json'), os.path.join(data_dir, 'english_alphabet.json'))
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _describe_image(image_dir, url_prefix, image_file, problems, owner):
+    """读取图片信息，返回 {url, width, height, bytes}；图片缺失时记录问题并返回None"""
+    path = os.path.join(image_dir, image_file)
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        problems.append(f'{owner}: 图片不存在 {path}')
+        return None
+
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    image = {'url': f'{url_prefix}/{image_file}?v={digest}', 'bytes': len(content), 'width': None, 'height': None}
+    if Image is not None:
+        try:
+            with Image.open(path) as img:
+                image['width'], image['height'] = img.size
+        except OSError:
+            problems.append(f'{owner}: 无法识别的图片 {path}')
+    return image
+
+
+def _build_chinese(raw, image_dir, problems):
+    categories = raw.get('basicChineseCharactersForKids') if isinstance(raw, dict) else None
+    if not isinstance(categories, list) or not categories:
+        problems.append('characters.json: 缺少 basicChineseCharactersForKids 分类列表')
+        return []
+
+    seen = {}  # 汉字 -> 首次出现的分类
+    category_names = set()
+    built = []
+    for cat_pos, cat in enumerate(categories):
+        name = cat.get('category')
+        if not name:
+            problems.append(f'第 {cat_pos + 1} 个分类缺少 category 名称')
+            name = f'#{cat_pos + 1}'
+        elif name in category_names:
+            problems.append(f'分类重复: {name}')
+        category_names.add(name)
+
+        characters = cat.get('characters') or []
+        if not characters:
+            problems.append(f'分类 {name}: 没有汉字')
+
+        built_chars = []
+        for char in characters:
+            character = char.get('character')
+            owner = f'{name}/{character or "?"}'
+            for field in CHARACTER_FIELDS:
+                if not char.get(field):
+                    problems.append(f'{owner}: 缺少 {field}')
+            if character in seen:
+                problems.append(f'{owner}: 汉字重复（已在分类 {seen[character]} 中出现）')
+            if not char.get('common_words'):
+                problems.append(f'{owner}: common_words 为空')
+
+            entry = dict(char)
+            if not char.get('image_file'):
+                problems.append(f'{owner}: 缺少 image_file')
+                entry['image'] = None
+            else:
+                entry['image'] = _describe_image(image_dir, IMAGE_URL_PREFIX, char['image_file'], problems, owner)
+
+            if character and character not in seen:
+                seen[character] = name
+            built_chars.append(entry)
+        built.append({'category': name, 'characters': built_chars})
+    return built
+
+
+def _build_english(raw, image_dir, problems):
+    letters = raw.get('englishAlphabet') if isinstance(raw, dict) else None
+    if not isinstance(letters, list) or not letters:
+        problems.append('english_alphabet.json: 缺少 englishAlphabet 字母列表')
+        return [], []
+
+    seen = set()
+    built = []
+    all_words = []
+    for letter in letters:
+        owner = f'字母 {letter.get("letter") or "?"}'
+        for field in LETTER_FIELDS:
+            if not letter.get(field):
+                problems.append(f'{owner}: 缺少 {field}')
+        if letter.get('letter') in seen:
+            problems.append(f'{owner}: 字母重复')
+        seen.add(letter.get('letter'))
+        if not letter.get('words'):
+            problems.append(f'{owner}: words 为空')
+
+        entry = dict(letter)
+        if not letter.get('image_file'):
+            problems.append(f'{owner}: 缺少 image_file')
+            entry['image'] = None
+        else:
+            entry['image'] = _describe_image(os.path.join(image_dir, 'english'), f'{IMAGE_URL_PREFIX}/english',
+                                             letter['image_file'], problems, owner)
+        all_words.extend(letter.get('words') or [])
+        built.append(entry)
+    return built, all_words
+
+
+def build(data_dir=DATA_DIR, image_dir=IMAGE_DIR, audio_dir=AUDIO_DIR):
+    """
+    校验源数据并计算全部派生数据
+
+    Returns:
+        dict: 完整的词库内容，由 write() 拆分为索引和分片
+    Raises:
+        WordBankError: 数据校验失败
+    """
+    chinese_path, english_path = _source_paths(data_dir)
+    problems = []
+    sources = {}
+    for path in (chinese_path, english_path):
+        try:
+            sources[path] = _read_json(path)
+        except (OSError, ValueError) as e:
+            problems.append(f'{path}: 无法读取 ({e})')
+            sources[path] = None
+    if problems:
+        raise WordBankError(problems)
+
+    categories = _build_chinese(sources[chinese_path], image_dir, problems)
+    letters, all_words = _build_english(sources[english_path], image_dir, problems)
+    if problems:
+        raise WordBankError(problems)
+    _attach_audio(categories, letters, audio_dir)
+
+    # 图片哈希索引是增量的，只为新增或变化的图片计算哈希
+    image_index = image_dedup.open_index(data_dir, image_dir)
+    owners = [(char['character'], char['image_file']) for cat in categories for char in cat['characters']]
+    owners += [(letter['letter'], f"english/{letter['image_file']}") for letter in letters]
+
+    content = {
+        'categories': categories,
+        'english': {'letters': letters, 'all_words': all_words},
+    }
+    # 版本号由内容决定：数据、图片或语音有任何变化都会得到新的版本号
+    version = hashlib.sha256(json.dumps(content, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return {'format': FORMAT_VERSION, 'version': version, 'built_at': int(time.time()), **content,
+            'similar_images': image_dedup.similar_groups(image_index, owners)}
+
+
+def _write_json(path, data):
+    """原子写入JSON文件（临时文件名带进程号，多个进程同时构建时互不干扰）"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _write_shard(directory, name, data):
+    """分片文件名带内容哈希，内容不变时文件不变，新旧索引可以同时引用各自的分片"""
+    body = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    relative = f'{name}-{hashlib.sha256(body.encode("utf-8")).hexdigest()[:12]}.json'
+    path = os.path.join(directory, relative)
+    if os.path.exists(path):
+        # 修改时间记录分片最近一次被索引引用的时间，清理时据此判断
+        os.utime(path)
+    else:
+        _write_json(path, data)
+    return relative
+
+
+def write(artifact, directory=ARTIFACT_DIR, retention=SHARD_RETENTION_SECONDS):
+    """
+    按分类分片写入词库目录
+        index.json                  索引：版本、分类名、各分类的汉字列表和分片文件名
+        shards/category-<哈希>.json  每个分类一个分片，包含该分类汉字的完整数据
+        shards/english-<哈希>.json   英语字母数据
+        shards/search-<哈希>.json    搜索文档和倒排索引
+
+    先写分片再原子替换索引，运行中的进程始终看到一致的数据；
+    新旧两个索引引用的分片始终保留，其余分片在最后一次被引用 retention 秒后删除
+    （运行中的worker最多每 RELOAD_SECONDS 秒才重新加载索引，关闭检查时多次重建之后仍可能读取更早的分片）
+    """
+    shard_dir = os.path.join(directory, SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+    index_path = os.path.join(directory, INDEX_FILE)
+    previous = _read_json(index_path) if os.path.exists(index_path) else None
+
+    index = {
+        'format': artifact['format'],
+        'version': artifact['version'],
+        'built_at': artifact['built_at'],
+        'categories': [],
+        'similar_images': artifact['similar_images'],
+        'english': os.path.join(SHARD_DIR, _write_shard(shard_dir, 'english', artifact['english'])),
+        'search': os.path.join(SHARD_DIR, _write_shard(
+            shard_dir, 'search', search.build(artifact['categories'], artifact['english']['letters']))),
+    }
+    for cat in artifact['categories']:
+        shard = _write_shard(shard_dir, 'category', cat)
+        index['categories'].append({
+            'category': cat['category'],
+            'shard': os.path.join(SHARD_DIR, shard),
+            'characters': [char['character'] for char in cat['characters']],
+        })
+    _write_json(index_path, index)
+
+    keep = set(_index_shards(index))
+    if previous is not None and previous.get('format') == FORMAT_VERSION:
+        keep.update(_index_shards(previous))
+    expired = time.time() - retention
+    for name in os.listdir(shard_dir):
+        path = os.path.join(shard_dir, name)
+        if os.path.join(SHARD_DIR, name) in keep:
+            continue
+        try:
+            if os.path.getmtime(path) < expired:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+    return index
+
+
+def _index_shards(index):
+    return [cat['shard'] for cat in index['categories']] + [index['english'], index['search']]
+
+
+class WordBank:
+    """
+    运行时词库，只读
+
+    启动时只加载索引（分类名和各分类的汉字列表）、很小的英语数据和搜索索引；
+    分类分片在首次用到时加载，最多缓存 shard_cache_size 个，超出时淘汰最久未使用的分片。
+    出题时选项只需要汉字本身，只有正确答案所在的分类需要加载分片。
+    索引文件重新生成后由 reload() 原地切换到新索引，持有本对象的模块（题目目录等）无需更新引用。
+    """
+
+    def __init__(self, index, directory, shard_cache_size=32):
+        self.directory = directory
+        self.shard_cache_size = shard_cache_size
+        self._shards = OrderedDict()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._index_mtime = self._stat_index()
+        self._apply(index)
+
+    def _apply(self, index):
+        """按索引设置词库数据并清空分片缓存"""
+        self.version = index['version']
+        self._index = {cat['category']: cat for cat in index['categories']}
+        self.category_names = [cat['category'] for cat in index['categories']]
+        # 分类名 -> 该分类的汉字列表
+        self.category_characters = {cat['category']: cat['characters'] for cat in index['categories']}
+        self.all_character_names = [char for cat in index['categories'] for char in cat['characters']]
+        # 汉字 -> (所在分类, 在分片中的位置)
+        self.character_positions = {
+            char: (cat['category'], pos)
+            for cat in index['categories'] for pos, char in enumerate(cat['characters'])
+        }
+
+        english = _read_json(os.path.join(self.directory, index['english']))
+        self.letters = english['letters']
+        self.all_words = english['all_words']
+        self.alphabet_data = {'englishAlphabet': self.letters}
+        # 汉字/字母 -> 图片与其相同或近似的其他汉字/字母，出题时不同时作为选项
+        self.similar_images = {owner: frozenset(others) for owner, others in index['similar_images'].items()}
+        self.search_index = search.SearchIndex(_read_json(os.path.join(self.directory, index['search'])))
+        with self._lock:
+            self._shards.clear()
+
+    def _stat_index(self):
+        try:
+            return os.stat(os.path.join(self.directory, INDEX_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def reload(self):
+        """索引文件变化且版本不同时重新加载，返回是否切换了版本"""
+        mtime = self._stat_index()
+        if mtime is None or mtime == self._index_mtime:
+            return False
+        self._index_mtime = mtime
+        index = _read_json(os.path.join(self.directory, INDEX_FILE))
+        if index.get('format') != FORMAT_VERSION or index['version'] == self.version:
+            return False
+        previous = self.version
+        self._apply(index)
+        logger.info('词库已重新加载', extra=fields(previous=previous, version=self.version))
+        return True
+
+    def start_watcher(self, interval=RELOAD_SECONDS):
+        """
+        启动定期检查索引文件的后台线程
+        与存储的写入通知一样在worker进程中启动（gunicorn的 post_fork），预加载应用的主进程中不启动
+        """
+        if interval <= 0:
+            return None
+        if self._watcher is None or not self._watcher.is_alive():
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name='wordbank-watcher',
+                                             daemon=True)
+            self._watcher.start()
+        return self._watcher
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except (OSError, ValueError, KeyError):
+                logger.exception('词库重新加载失败')
+
+    def get_category(self, category):
+        """返回 {category, characters: [...]}，分类不存在时返回None"""
+        meta = self._index.get(category)
+        if meta is None:
+            return None
+        with self._lock:
+            shard = self._shards.get(category)
+            if shard is not None:
+                self._shards.move_to_end(category)
+        record_cache('wordbank_shard', shard is not None)
+        if shard is not None:
+            return shard
+
+        # 在锁外读取文件；并发加载同一分片时结果相同，后写入的覆盖先写入的
+        try:
+            shard = _read_json(os.path.join(self.directory, meta['shard']))
+        except FileNotFoundError:
+            shard = self._load_current_shard(category, meta)
+        with self._lock:
+            self._shards[category] = shard
+            self._shards.move_to_end(category)
+            while len(self._shards) > self.shard_cache_size:
+                self._shards.popitem(last=False)
+        return shard
+
+    def _load_current_shard(self, category, meta):
+        """
+        本进程持有的索引引用的分片已被清理：从当前索引中读取同一分类的分片，
+        按本进程索引中的汉字顺序返回（get_character 按位置取汉字）
+        """
+        index = _read_json(os.path.join(self.directory, INDEX_FILE))
+        current = next((cat for cat in index['categories'] if cat['category'] == category), None)
+        if current is None:
+            raise FileNotFoundError(f'词库分片不存在: {meta["shard"]}')
+        shard = _read_json(os.path.join(self.directory, current['shard']))
+        by_character = {char['character']: char for char in shard['characters']}
+        if any(name not in by_character for name in meta['characters']):
+            raise FileNotFoundError(f'词库分片不存在: {meta["shard"]}')
+        logger.warning('词库分片已被清理，使用当前索引中的分片', extra=fields(category=category, shard=current['shard']))
+        return {**shard, 'characters': [by_character[name] for name in meta['characters']]}
+
+    def get_character(self, character):
+        """返回汉字的完整数据，不存在时返回None"""
+        position = self.character_positions.get(character)
+        if position is None:
+            return None
+        category, pos = position
+        return self.get_category(category)['characters'][pos]
+
+    @property
+    def characters_data(self):
+        """全部汉字数据（原有接口的数据结构），会加载所有分片"""
+        return {'basicChineseCharactersForKids': [self.get_category(name) for name in self.category_names]}
+
+    def image_url(self, entry):
+        image = entry.get('image')
+        return image['url'] if image else None
+
+
+def _is_stale(index_path, data_dir, audio_dir):
+    """源文件或语音清单比词库索引新时视为过期"""
+    built = os.path.getmtime(index_path)
+    sources = (*_source_paths(data_dir), os.path.join(audio_dir, AUDIO_MANIFEST))
+    return any(os.path.getmtime(source) > built for source in sources if os.path.exists(source))
+
+
+def load(directory=ARTIFACT_DIR, data_dir=DATA_DIR, image_dir=IMAGE_DIR, shard_cache_size=32, audio_dir=AUDIO_DIR):
+    """
+    加载词库索引
+    索引不存在、格式版本不符或源数据更新过时，先从源数据重新构建并写入（开发时无需手动执行构建），
+    数据有问题时抛出 WordBankError，使服务启动失败
+    """
+    index_path = os.path.join(directory, INDEX_FILE)
+    index = None
+    if os.path.exists(index_path) and not _is_stale(index_path, data_dir, audio_dir):
+        index = _read_json(index_path)
+        if index.get('format') != FORMAT_VERSION:
+            index = None
+    if index is None:
+        logger.warning('词库文件不存在或已过期，从源数据重新构建', extra=fields(path=directory))
+        index = write(build(data_dir, image_dir, audio_dir), directory)
+    word_bank = WordBank(index, directory, shard_cache_size)
+    logger.info('词库已加载', extra=fields(version=word_bank.version, categories=len(word_bank.category_names),
+                                         characters=len(word_bank.all_character_names),
+                                         letters=len(word_bank.letters)))
+    return word_bank
+
+
+def main():
+    parser = argparse.ArgumentParser(description='校验词库源数据并生成词库文件')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='源数据目录 (默认: data)')
+    parser.add_argument('--image-dir', default=IMAGE_DIR, help='图片目录 (默认: static/images)')
+    parser.add_argument('--audio-dir', default=AUDIO_DIR, help='预生成语音目录 (默认: data/audio)')
+    parser.add_argument('--output', default=ARTIFACT_DIR, help='输出目录 (默认: data/wordbank)')
+    parser.add_argument('--check', action='store_true', help='只校验，不写文件')
+    args = parser.parse_args()
+
+    try:
+        artifact = build(args.data_dir, args.image_dir, args.audio_dir)
+    except WordBankError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    characters = sum(len(cat['characters']) for cat in artifact['categories'])
+    print(f"校验通过: {len(artifact['categories'])} 个分类，{characters} 个汉字，"
+          f"{len(artifact['english']['letters'])} 个字母")
+    if not args.check:
+        write(artifact, args.output)
+        print(f"词库目录: {args.output} (版本 {artifact['version']}，{len(artifact['categories'])} 个分类分片)")
+
+
+if __name__ == '__main__':
+    main()